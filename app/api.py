@@ -0,0 +1,376 @@
+"""
+API de solo lectura para integraciones (contabilidad, tienda online): /api/v1.
+
+Autenticación con token (Authorization: Bearer <token>), creado en
+/admin/api/tokens. Cada recurso se lista en orden (actualizado, id):
+
+    GET /api/v1/ventas?updated_since=2026-10-01T00:00:00Z&fields=id,total,detalles&limit=500
+
+- La respuesta trae next_cursor (opaco y firmado) mientras haya más páginas:
+  se pide la siguiente con ?cursor=...
+- updated_until es la marca hasta la que se leyó; guardarla y mandarla como
+  updated_since en la próxima sincronización trae solo lo que cambió.
+- La marca queda API_MARGEN_S por detrás de la hora actual y antes del inicio
+  de la transacción abierta más vieja que ya escribió, para no saltear filas
+  que todavía no hicieron commit (actualizado es la hora de la escritura, que
+  en una transacción es posterior a su inicio; ver models.SQL_SINCRONIZACION_API).
+  pg_stat_activity solo muestra el inicio de las transacciones del mismo rol
+  de la base (o de todos con pg_read_all_stats): la app y el worker tienen que
+  conectarse con el mismo usuario o uno con ese permiso.
+- Los productos y clientes borrados se informan en /api/v1/bajas.
+- Las respuestas se comprimen como el resto (ver respuestas.py).
+"""
+import datetime
+import decimal
+import hashlib
+import secrets
+from functools import wraps
+
+import click
+from flask import Blueprint, current_app, flash, g, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func, select, text, tuple_, update
+
+from .models import (
+    db, Cliente, CodigoProducto, DetalleVenta, Jornada, MovimientoStock, Producto, RegistroBaja, TokenApi, Venta
+)
+from .decorators import admin_required
+
+api_bp = Blueprint('api', __name__)
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+USO_CADA = datetime.timedelta(minutes=5)  # cada cuánto se actualiza TokenApi.ultimo_uso
+
+# least() ignora el NULL de cuando no hay transacciones abiertas con escrituras
+SQL_HASTA = text("""
+    SELECT least(
+        now() - make_interval(secs => :margen),
+        (SELECT min(xact_start) - interval '1 microsecond' FROM pg_stat_activity
+         WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid())
+    )
+""")
+
+# Recurso -> modelo, columna de orden y campos visibles. Los campos con valor None
+# no son columnas: se cargan aparte para toda la página (ver _ANIDADOS).
+RECURSOS = {
+    'productos': {
+        'modelo': Producto,
+        'actualizado': Producto.actualizado,
+        'campos': {
+            'id': Producto.id, 'nombre': Producto.nombre, 'descripcion': Producto.descripcion,
+            'precio': Producto.precio, 'precio_costo': Producto.precio_costo, 'stock': Producto.stock,
+            'stock_minimo': Producto.stock_minimo, 'alicuota_iva': Producto.alicuota_iva,
+            'actualizado': Producto.actualizado, 'codigos': None,
+        },
+    },
+    'clientes': {
+        'modelo': Cliente,
+        'actualizado': Cliente.actualizado,
+        'campos': {
+            'id': Cliente.id, 'nombre': Cliente.nombre, 'documento_fiscal': Cliente.documento_fiscal,
+            'condicion_iva': Cliente.condicion_iva, 'telefono': Cliente.telefono, 'email': Cliente.email,
+            'actualizado': Cliente.actualizado,
+        },
+    },
+    'ventas': {
+        'modelo': Venta,
+        'actualizado': Venta.actualizado,
+        'campos': {
+            'id': Venta.id, 'fecha': Venta.fecha, 'estado': Venta.estado, 'metodo_pago': Venta.metodo_pago,
+            'total': Venta.total, 'total_neto_gravado': Venta.total_neto_gravado,
+            'total_monto_iva': Venta.total_monto_iva, 'ganancia_bruta_total': Venta.ganancia_bruta_total,
+            'cliente_id': Venta.cliente_id, 'jornada_id': Venta.jornada_id, 'user_id': Venta.user_id,
+            'referencia_externa': Venta.referencia_externa, 'actualizado': Venta.actualizado, 'detalles': None,
+        },
+    },
+    'jornadas': {
+        'modelo': Jornada,
+        'actualizado': Jornada.actualizado,
+        'campos': {
+            'id': Jornada.id, 'hora_inicio': Jornada.hora_inicio, 'hora_fin': Jornada.hora_fin,
+            'activa': Jornada.activa, 'user_id': Jornada.user_id, 'notas_cierre': Jornada.notas_cierre,
+            'actualizado': Jornada.actualizado,
+        },
+    },
+    # El libro de movimientos solo crece: actualizado es la hora del INSERT (fecha es la del
+    # inicio de la transacción, la que usa el inventario)
+    'movimientos_stock': {
+        'modelo': MovimientoStock,
+        'actualizado': MovimientoStock.actualizado,
+        'campos': {
+            'id': MovimientoStock.id, 'fecha': MovimientoStock.fecha, 'producto_id': MovimientoStock.producto_id,
+            'cantidad': MovimientoStock.cantidad, 'tipo': MovimientoStock.tipo, 'user_id': MovimientoStock.user_id,
+            'actualizado': MovimientoStock.actualizado,
+        },
+    },
+    'bajas': {
+        'modelo': RegistroBaja,
+        'actualizado': RegistroBaja.fecha,
+        'campos': {
+            'id': RegistroBaja.id, 'tabla': RegistroBaja.tabla, 'registro_id': RegistroBaja.registro_id,
+            'fecha': RegistroBaja.fecha,
+        },
+    },
+}
+
+
+class ErrorApi(Exception):
+    """Pedido inválido: se responde 400 con el mensaje."""
+    pass
+
+
+# --- Tokens ---
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def crear_token(nombre, user_id=None):
+    """Crea un token y lo devuelve en claro (es la única vez que se puede ver)."""
+    token = 'ws_' + secrets.token_urlsafe(32)
+    db.session.add(TokenApi(nombre=nombre, prefijo=token[:10], hash=hash_token(token), creado_por_id=user_id))
+    return token
+
+
+def token_requerido(f):
+    @wraps(f)
+    def envoltura(*args, **kwargs):
+        tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+        token_api = None
+        if tipo.lower() == 'bearer' and token.strip():
+            token_api = TokenApi.query.filter_by(hash=hash_token(token.strip()), revocado=None).first()
+        if token_api is None:
+            respuesta = jsonify({'success': False, 'error': 'Token inválido o revocado.'})
+            respuesta.headers['WWW-Authenticate'] = 'Bearer'
+            return respuesta, 401
+        ahora = datetime.datetime.now(datetime.timezone.utc)
+        if token_api.ultimo_uso is None or ahora - token_api.ultimo_uso > USO_CADA:
+            # Sin escribir en cada pedido: una integración puede hacer cientos por minuto
+            db.session.execute(update(TokenApi).where(TokenApi.id == token_api.id).values(ultimo_uso=func.now()))
+            db.session.commit()
+        g.token_api = token_api
+        return f(*args, **kwargs)
+    return envoltura
+
+
+# --- Cursores y parámetros ---
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='api-v1-cursor')
+
+
+def _fecha(valor):
+    if valor is None:
+        return None
+    fecha = datetime.datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    return fecha if fecha.tzinfo else fecha.astimezone()
+
+
+def _leer_cursor(recurso, valor):
+    try:
+        nombre, actualizado, ultimo_id, hasta = _serializador().loads(valor)
+    except (BadSignature, ValueError, TypeError):
+        raise ErrorApi('Cursor inválido.')
+    if nombre != recurso:
+        raise ErrorApi('El cursor es de otro recurso.')
+    return _fecha(actualizado), ultimo_id, _fecha(hasta)
+
+
+def _campos(recurso):
+    disponibles = RECURSOS[recurso]['campos']
+    pedidos = request.args.get('fields', '', type=str)
+    if not pedidos:
+        return list(disponibles)
+    campos = ['id'] + [c.strip() for c in pedidos.split(',') if c.strip() and c.strip() != 'id']
+    desconocidos = [c for c in campos if c not in disponibles]
+    if desconocidos:
+        raise ErrorApi(f'Campos desconocidos: {", ".join(desconocidos)}. Disponibles: {", ".join(disponibles)}.')
+    return list(dict.fromkeys(campos))
+
+
+def _valor(valor):
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return valor
+
+
+# --- Datos anidados (una consulta por página, no por fila) ---
+def _codigos(ids):
+    resultado = {i: [] for i in ids}
+    for codigo, producto_id in db.session.query(
+        CodigoProducto.codigo, CodigoProducto.producto_id
+    ).filter(CodigoProducto.producto_id.in_(ids)).order_by(CodigoProducto.id):
+        resultado[producto_id].append(codigo)
+    return resultado
+
+
+def _detalles(ids):
+    resultado = {i: [] for i in ids}
+    for d in db.session.query(
+        DetalleVenta.venta_id, DetalleVenta.producto_id, DetalleVenta.cantidad, DetalleVenta.precio_unitario,
+        DetalleVenta.neto_gravado, DetalleVenta.monto_iva, DetalleVenta.alicuota_iva
+    ).filter(DetalleVenta.venta_id.in_(ids)).order_by(DetalleVenta.id):
+        resultado[d.venta_id].append({
+            'producto_id': d.producto_id, 'cantidad': d.cantidad, 'precio_unitario': str(d.precio_unitario),
+            'neto_gravado': str(d.neto_gravado), 'monto_iva': str(d.monto_iva), 'alicuota_iva': d.alicuota_iva,
+        })
+    return resultado
+
+
+_ANIDADOS = {'codigos': _codigos, 'detalles': _detalles}
+
+
+def _filas(recurso, campos, consulta):
+    """Ejecuta la consulta y arma los dicts con los campos pedidos."""
+    definicion = RECURSOS[recurso]
+    filas = db.session.execute(consulta).all()
+    ids = [f.id for f in filas]
+    anidados = {c: _ANIDADOS[c](ids) for c in campos if definicion['campos'][c] is None and ids}
+    return filas, [
+        {c: anidados[c][f.id] if c in anidados else _valor(getattr(f, c)) for c in campos}
+        for f in filas
+    ]
+
+
+def _consulta(recurso, campos):
+    definicion = RECURSOS[recurso]
+    columnas = [definicion['campos'][c].label(c) for c in campos if definicion['campos'][c] is not None]
+    # id y la columna de orden siempre van: arman el cursor
+    return select(
+        definicion['modelo'].id.label('id'), definicion['actualizado'].label('_orden'),
+        *[c for c in columnas if c.name != 'id']
+    )
+
+
+def listar(recurso):
+    """Una página del recurso: (datos, next_cursor, updated_until)."""
+    definicion = RECURSOS[recurso]
+    campos = _campos(recurso)
+    limite = request.args.get('limit', LIMITE_POR_DEFECTO, type=int)
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ErrorApi(f'limit debe estar entre 1 y {LIMITE_MAXIMO}.')
+    orden, modelo_id = definicion['actualizado'], definicion['modelo'].id
+
+    consulta = _consulta(recurso, campos)
+    if request.args.get('cursor'):
+        desde, ultimo_id, hasta = _leer_cursor(recurso, request.args['cursor'])
+        consulta = consulta.where(tuple_(orden, modelo_id) > tuple_(desde, ultimo_id))
+    else:
+        try:
+            desde = _fecha(request.args.get('updated_since'))
+        except ValueError:
+            raise ErrorApi('updated_since debe ser una fecha ISO 8601 (ej: 2026-10-01T00:00:00Z).')
+        hasta = db.session.scalar(SQL_HASTA, {'margen': current_app.config['API_MARGEN_S']})
+        if desde is not None:
+            consulta = consulta.where(orden > desde)
+    consulta = consulta.where(orden <= hasta).order_by(orden, modelo_id).limit(limite + 1)
+
+    filas, datos = _filas(recurso, campos, consulta)
+    siguiente = None
+    if len(filas) > limite:
+        filas, datos = filas[:limite], datos[:limite]
+        ultima = filas[-1]
+        siguiente = _serializador().dumps([recurso, ultima._orden.isoformat(), ultima.id, hasta.isoformat()])
+    return datos, siguiente, hasta
+
+
+# -----------------------------------------------
+# RUTA: API v1 - ÍNDICE DE RECURSOS
+# -----------------------------------------------
+@api_bp.route('/api/v1')
+@token_requerido
+def indice():
+    """Recursos disponibles y sus campos (para fields=)."""
+    return jsonify(success=True, recursos={
+        nombre: list(definicion['campos']) for nombre, definicion in RECURSOS.items()
+    })
+
+
+# -----------------------------------------------
+# RUTA: API v1 - LISTADO INCREMENTAL
+# -----------------------------------------------
+@api_bp.route('/api/v1/<recurso>')
+@token_requerido
+def listado(recurso):
+    """Página de un recurso en orden (actualizado, id); ver el docstring del módulo."""
+    if recurso not in RECURSOS:
+        return jsonify({'success': False, 'error': f'Recurso desconocido: {recurso}.'}), 404
+    try:
+        datos, siguiente, hasta = listar(recurso)
+    except ErrorApi as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(success=True, data=datos, next_cursor=siguiente, updated_until=hasta.isoformat())
+
+
+# -----------------------------------------------
+# RUTA: API v1 - UN REGISTRO
+# -----------------------------------------------
+@api_bp.route('/api/v1/<recurso>/<int:registro_id>')
+@token_requerido
+def detalle(recurso, registro_id):
+    if recurso not in RECURSOS:
+        return jsonify({'success': False, 'error': f'Recurso desconocido: {recurso}.'}), 404
+    try:
+        campos = _campos(recurso)
+    except ErrorApi as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    consulta = _consulta(recurso, campos).where(RECURSOS[recurso]['modelo'].id == registro_id)
+    _, datos = _filas(recurso, campos, consulta)
+    if not datos:
+        return jsonify({'success': False, 'error': 'No existe.'}), 404
+    return jsonify(success=True, data=datos[0])
+
+
+# -----------------------------------------------
+# RUTA: TOKENS DE API (Admin)
+# -----------------------------------------------
+@api_bp.route('/admin/api/tokens', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def tokens():
+    """Crea y lista los tokens de las integraciones."""
+    if request.method == 'POST':
+        nombre = request.form.get('nombre', '').strip()
+        if not nombre:
+            flash('Error: el token necesita un nombre (ej: "Contabilidad").', 'danger')
+            return redirect(url_for('api.tokens'))
+        try:
+            token = crear_token(nombre[:100], current_user.id)
+            db.session.commit()
+            flash(f'Token "{nombre}" creado. Cópielo ahora, no se vuelve a mostrar: {token}', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al crear el token: {str(e)}', 'danger')
+        return redirect(url_for('api.tokens'))
+
+    lista = TokenApi.query.options(db.joinedload(TokenApi.creado_por)).order_by(TokenApi.id.desc()).all()
+    return render_template('api_tokens.html', tokens=lista, recursos=RECURSOS)
+
+
+@api_bp.route('/admin/api/tokens/<int:token_id>/revocar', methods=['POST'])
+@login_required
+@admin_required
+def revocar_token(token_id):
+    token_api = TokenApi.query.get_or_404(token_id)
+    try:
+        token_api.revocado = func.now()
+        db.session.commit()
+        flash(f'Token "{token_api.nombre}" revocado.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al revocar el token: {str(e)}', 'danger')
+    return redirect(url_for('api.tokens'))
+
+
+# -----------------------------------------------
+# COMANDOS CLI
+# -----------------------------------------------
+@api_bp.cli.command('crear-token')
+@click.argument('nombre')
+def crear_token_command(nombre):
+    """Crea un token de API y lo muestra (una sola vez)."""
+    token = crear_token(nombre)
+    db.session.commit()
+    click.echo(token)
@@ -0,0 +1,300 @@
+"""
+Assets estáticos: bundles minificados, con huella en el nombre y precomprimidos.
+
+    flask assets vendorizar   # vuelve a bajar las dependencias que venían de CDNs (al cambiar de versión)
+    flask assets construir    # arma static/dist/ y su manifest.json (en cada deploy)
+
+Los templates piden los bundles con asset_urls('app.css'). Si hay manifest,
+devuelve la URL del bundle con huella (se sirve desde /static/dist con caché
+inmutable de un año y en brotli/gzip si el navegador lo acepta); si no hay
+manifest o ASSETS_DEBUG está activo, devuelve los archivos originales uno por uno.
+
+Los archivos de VENDORIZADOS están en el repositorio (static/vendor). Si falta
+alguno, se sigue pidiendo a su CDN, con la misma versión fija, y el build lo deja
+afuera. Los JS se minifican con rjsmin (los .min.js ya vienen minificados).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.parse
+import urllib.request
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # opcional: sin rjsmin los JS van tal cual
+    rjsmin = None
+
+assets_bp = Blueprint('assets', __name__)
+
+DIRECTORIO_DIST = 'dist'
+MANIFIESTO = 'manifest.json'
+UN_ANIO = 365 * 24 * 3600
+
+# Solo lo que usan los templates, en el orden en que se cargan
+BUNDLES = {
+    'app.css': [
+        'vendor/fontawesome-free/css/all.min.css',
+        'vendor/nunito/nunito.css',
+        'css/sb-admin-2.min.css',
+    ],
+    'app.js': [
+        'vendor/jquery/jquery.min.js',
+        'vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'vendor/jquery-easing/jquery.easing.min.js',
+        'js/sb-admin-2.min.js',
+    ],
+    'recibo.css': [
+        'vendor/bootstrap5/bootstrap.min.css',
+        'vendor/fontawesome-free/css/all.min.css',
+    ],
+    'reportes.js': [
+        'vendor/chartjs/chart.umd.js',
+    ],
+    'pos.js': [
+        'js/pos.js',
+    ],
+}
+
+# Lo que antes se cargaba de CDNs: destino en static/ -> URL con versión fija
+VENDORIZADOS = {
+    'vendor/nunito/nunito.css':
+        'https://fonts.googleapis.com/css2?family=Nunito:ital,wght@0,200..900;1,200..900&display=swap',
+    'vendor/bootstrap5/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/bootstrap.min.css',
+    'vendor/chartjs/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.js',
+}
+# Google Fonts devuelve woff2 solo a navegadores que lo soportan
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+RE_URL_CSS = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+RE_SOURCEMAP = re.compile(r'^\s*(//|/\*)# sourceMappingURL=.*$', re.MULTILINE)
+
+_manifiesto = {'mtime': None, 'datos': {}}
+
+
+# --- Uso desde los templates ---
+def _directorio_dist():
+    return os.path.join(current_app.static_folder, DIRECTORIO_DIST)
+
+
+def leer_manifiesto():
+    """Manifest de static/dist (se relee solo si cambió el archivo)."""
+    ruta = os.path.join(_directorio_dist(), MANIFIESTO)
+    try:
+        mtime = os.path.getmtime(ruta)
+    except OSError:
+        return {}
+    if mtime != _manifiesto['mtime']:
+        with open(ruta, encoding='utf-8') as archivo:
+            _manifiesto['datos'] = json.load(archivo)
+        _manifiesto['mtime'] = mtime
+    return _manifiesto['datos']
+
+
+def faltantes(static, archivos):
+    """Archivos vendorizados de la lista que todavía no se bajaron."""
+    return [a for a in archivos if a in VENDORIZADOS and not os.path.isfile(os.path.join(static, a))]
+
+
+@assets_bp.app_template_global()
+def asset_urls(bundle):
+    """URLs a incluir para un bundle: el archivo construido o, si no hay, los originales."""
+    manifiesto = leer_manifiesto()
+    if bundle in manifiesto and not current_app.config['ASSETS_DEBUG']:
+        construido = manifiesto[bundle]
+        locales = [url_for('assets.servir_asset', nombre=construido['archivo'])] if construido['archivo'] else []
+        return construido['externos'] + locales
+    sin_bajar = faltantes(current_app.static_folder, BUNDLES[bundle])
+    return [
+        VENDORIZADOS[archivo] if archivo in sin_bajar else url_for('static', filename=archivo)
+        for archivo in BUNDLES[bundle]
+    ]
+
+
+# -----------------------------------------------
+# RUTA: ASSETS CONSTRUIDOS (caché inmutable, precomprimidos)
+# -----------------------------------------------
+@assets_bp.route('/static/dist/<path:nombre>')
+def servir_asset(nombre):
+    """Sirve un bundle con huella; elige .br o .gz según Accept-Encoding."""
+    directorio = _directorio_dist()
+    mimetype = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+    aceptadas = request.headers.get('Accept-Encoding', '')
+
+    for codificacion, extension in (('br', '.br'), ('gzip', '.gz')):
+        if codificacion in aceptadas and os.path.isfile(os.path.join(directorio, nombre + extension)):
+            respuesta = send_from_directory(directorio, nombre + extension, mimetype=mimetype, max_age=UN_ANIO)
+            respuesta.headers['Content-Encoding'] = codificacion
+            break
+    else:
+        respuesta = send_from_directory(directorio, nombre, mimetype=mimetype, max_age=UN_ANIO)
+
+    respuesta.headers['Cache-Control'] = f'public, max-age={UN_ANIO}, immutable'
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+
+# --- Construcción ---
+def minificar_css(css):
+    css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.DOTALL)  # conserva los /*! de licencias
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minificar_js(js):
+    if rjsmin is None:
+        return js
+    return rjsmin.jsmin(js, keep_bang_comments=True)  # conserva los /*! de licencias
+
+
+def _reubicar_urls(css, origen):
+    """Las url() relativas de un CSS pasan a ser relativas a static/dist/."""
+    def reemplazar(m):
+        comilla, url = m.group(1), m.group(2)
+        if not url or url.startswith(('data:', 'http:', 'https:', '/', '#')):
+            return m.group(0)
+        corte = re.search(r'[?#]', url)
+        ruta, sufijo = (url[:corte.start()], url[corte.start():]) if corte else (url, '')
+        destino = posixpath.normpath(posixpath.join(posixpath.dirname(origen), ruta))
+        relativa = posixpath.relpath(destino, DIRECTORIO_DIST)
+        return f'url({comilla}{relativa}{sufijo}{comilla})'
+    return RE_URL_CSS.sub(reemplazar, css)
+
+
+def armar_bundle(static, nombre, archivos):
+    partes = []
+    for archivo in archivos:
+        ruta = os.path.join(static, archivo)
+        if not os.path.isfile(ruta):
+            raise click.ClickException(f'Falta {archivo}.')
+        with open(ruta, encoding='utf-8') as f:
+            contenido = RE_SOURCEMAP.sub('', f.read())
+        if nombre.endswith('.css'):
+            partes.append(minificar_css(_reubicar_urls(contenido, archivo)))
+        elif archivo.endswith('.min.js'):
+            partes.append(contenido.strip())
+        else:
+            partes.append(minificar_js(contenido).strip())
+    # Los JS se separan con ';' por si alguno no termina en punto y coma
+    return ('\n' if nombre.endswith('.css') else '\n;\n').join(partes).encode('utf-8')
+
+
+def construir(static):
+    """Arma los bundles en static/dist y devuelve el manifest."""
+    dist = os.path.join(static, DIRECTORIO_DIST)
+    os.makedirs(dist, exist_ok=True)
+
+    manifiesto = {}
+    for nombre, archivos in BUNDLES.items():
+        sin_bajar = faltantes(static, archivos)
+        externos = [VENDORIZADOS[a] for a in sin_bajar]
+        locales = [a for a in archivos if a not in sin_bajar]
+        if not locales:
+            manifiesto[nombre] = {'archivo': None, 'externos': externos}
+            continue
+        datos = armar_bundle(static, nombre, locales)
+        base, extension = os.path.splitext(nombre)
+        final = f'{base}.{hashlib.sha256(datos).hexdigest()[:12]}{extension}'
+        with open(os.path.join(dist, final), 'wb') as f:
+            f.write(datos)
+        with open(os.path.join(dist, final + '.gz'), 'wb') as f:
+            f.write(gzip.compress(datos, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(os.path.join(dist, final + '.br'), 'wb') as f:
+                f.write(brotli.compress(datos, quality=11))
+        manifiesto[nombre] = {'archivo': final, 'externos': externos}
+
+    # Borrar bundles de construcciones anteriores
+    vigentes = {construido['archivo'] for construido in manifiesto.values()}
+    for archivo in os.listdir(dist):
+        if archivo != MANIFIESTO and archivo.split('.gz')[0].split('.br')[0] not in vigentes:
+            os.remove(os.path.join(dist, archivo))
+
+    with open(os.path.join(dist, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2)
+    return manifiesto
+
+
+def _descargar(url):
+    pedido = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(pedido, timeout=30) as respuesta:
+        return respuesta.read()
+
+
+def vendorizar(static, destino, url):
+    """Baja un archivo y, si es CSS, también las fuentes que referencia (reescribiendo las url())."""
+    datos = _descargar(url)
+    ruta = os.path.join(static, destino)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    if not destino.endswith('.css'):
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        return [destino]
+
+    descargados = [destino]
+
+    def reemplazar(m):
+        comilla, referencia = m.group(1), m.group(2)
+        if not referencia or referencia.startswith(('data:', '#')):
+            return m.group(0)
+        absoluta = urllib.parse.urljoin(url, referencia)
+        camino = urllib.parse.urlsplit(absoluta).path
+        if referencia.startswith(('http:', 'https:', '//')):
+            local = posixpath.basename(camino)  # de otro host: al lado del CSS
+        else:
+            local = referencia.split('?')[0].split('#')[0]
+        archivo = posixpath.normpath(posixpath.join(posixpath.dirname(destino), local))
+        if archivo not in descargados:
+            os.makedirs(os.path.dirname(os.path.join(static, archivo)), exist_ok=True)
+            with open(os.path.join(static, archivo), 'wb') as f:
+                f.write(_descargar(absoluta))
+            descargados.append(archivo)
+        return f'url({comilla}{local}{comilla})'
+
+    css = RE_URL_CSS.sub(reemplazar, datos.decode('utf-8'))
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(css)
+    return descargados
+
+
+@assets_bp.cli.command('construir')
+def construir_cmd():
+    """Arma los bundles minificados, con huella y precomprimidos en static/dist."""
+    if brotli is None:
+        click.echo('Aviso: el módulo brotli no está instalado; solo se genera gzip.')
+    if rjsmin is None:
+        click.echo('Aviso: el módulo rjsmin no está instalado; los JS no se minifican.')
+    manifiesto = construir(current_app.static_folder)
+    dist = os.path.join(current_app.static_folder, DIRECTORIO_DIST)
+    for nombre, construido in manifiesto.items():
+        final = construido['archivo']
+        if final is None:
+            click.echo(f'{nombre:12} -> (sin archivos locales)')
+        else:
+            tamanos = [os.path.getsize(os.path.join(dist, final))]
+            for extension in ('.gz', '.br'):
+                if os.path.exists(os.path.join(dist, final + extension)):
+                    tamanos.append(os.path.getsize(os.path.join(dist, final + extension)))
+            click.echo(f'{nombre:12} -> {final:28} ' + ' / '.join(f'{t / 1024:.1f} KB' for t in tamanos))
+        for url in construido['externos']:
+            click.echo(f'{"":12}    sin vendorizar, desde {url}')
+
+
+@assets_bp.cli.command('vendorizar')
+def vendorizar_cmd():
+    """Descarga a static/vendor las dependencias que antes venían de CDNs."""
+    for destino, url in VENDORIZADOS.items():
+        archivos = vendorizar(current_app.static_folder, destino, url)
+        click.echo(f'{destino}: {len(archivos)} archivos')
@@ -0,0 +1,211 @@
+"""
+Códigos de barras / SKU y el índice en memoria que usa el lector del POS.
+
+Cada proceso guarda {código: producto_id} y {producto_id: (nombre, precio,
+stock)} en diccionarios, así que resolver un escaneo no consulta la base.
+El índice se mantiene al día con los triggers de producto y codigo_producto
+(ver models.py), que en cada commit avisan por NOTIFY 'catalogo' qué
+productos cambiaron: un hilo por proceso escucha y recarga solo esas filas.
+Si no se puede escuchar, el índice se recarga entero cada CODIGOS_RECARGA_S.
+
+    /api/pos/escanear?codigo=7790001234567
+"""
+import os
+import select
+import threading
+import time
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, request, url_for
+from flask_login import login_required
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, CodigoProducto, Producto
+from .decorators import admin_required
+
+codigos_bp = Blueprint('codigos', __name__)
+
+CANAL = 'catalogo'
+LARGO_MAXIMO = 64
+
+
+def normalizar(codigo):
+    return ''.join((codigo or '').split())[:LARGO_MAXIMO]
+
+
+def variantes(codigo):
+    """El mismo producto leído como UPC-A (12 dígitos) o como EAN-13 con un 0 adelante."""
+    yield codigo
+    if codigo.isdigit():
+        if len(codigo) == 12:
+            yield '0' + codigo
+        elif len(codigo) == 13 and codigo.startswith('0'):
+            yield codigo[1:]
+
+
+class IndiceCodigos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_codigo = {}     # código -> producto_id
+        self._codigos_de = {}     # producto_id -> {códigos}
+        self._productos = {}      # producto_id -> (nombre, precio, stock)
+        self._pid = None
+        self._cargado = 0.0
+        self._escuchando = False
+
+    # --- Lectura (lo que corre en cada escaneo) ---
+    def buscar(self, codigo):
+        self._asegurar()
+        for variante in variantes(normalizar(codigo)):
+            producto_id = self._por_codigo.get(variante)
+            datos = self._productos.get(producto_id)
+            if datos is not None:
+                nombre, precio, stock = datos
+                return {'id': producto_id, 'nombre': nombre, 'precio': str(precio), 'stock': stock, 'codigo': variante}
+        return None
+
+    def _asegurar(self):
+        # Después de un fork (gunicorn) el hilo de escucha no existe en el proceso hijo
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._cargar()
+                    self._pid = os.getpid()
+                    app = current_app._get_current_object()
+                    threading.Thread(target=self._escuchar, args=(app,), name='indice-codigos', daemon=True).start()
+        elif not self._escuchando and time.monotonic() - self._cargado > current_app.config['CODIGOS_RECARGA_S']:
+            with self._lock:
+                self._cargar()
+
+    # --- Carga ---
+    def _cargar(self):
+        productos = db.session.query(Producto.id, Producto.nombre, Producto.precio, Producto.stock).all()
+        codigos = db.session.query(CodigoProducto.codigo, CodigoProducto.producto_id).all()
+        db.session.rollback()  # no dejar abierta la transacción de lectura del request
+        codigos_de = {}
+        for codigo, producto_id in codigos:
+            codigos_de.setdefault(producto_id, set()).add(codigo)
+        # Se reemplazan los diccionarios enteros: las lecturas concurrentes ven el viejo o el nuevo
+        self._productos = {p.id: (p.nombre, p.precio, p.stock) for p in productos}
+        self._por_codigo = dict(codigos)
+        self._codigos_de = codigos_de
+        self._cargado = time.monotonic()
+
+    def _refrescar(self, producto_ids):
+        productos = db.session.query(
+            Producto.id, Producto.nombre, Producto.precio, Producto.stock
+        ).filter(Producto.id.in_(producto_ids)).all()
+        codigos = db.session.query(
+            CodigoProducto.codigo, CodigoProducto.producto_id
+        ).filter(CodigoProducto.producto_id.in_(producto_ids)).all()
+        db.session.rollback()
+        with self._lock:
+            for producto_id in producto_ids:
+                self._productos.pop(producto_id, None)
+                for codigo in self._codigos_de.pop(producto_id, ()):
+                    if self._por_codigo.get(codigo) == producto_id:
+                        del self._por_codigo[codigo]
+            for p in productos:
+                self._productos[p.id] = (p.nombre, p.precio, p.stock)
+            for codigo, producto_id in codigos:
+                self._por_codigo[codigo] = producto_id
+                self._codigos_de.setdefault(producto_id, set()).add(codigo)
+
+    # --- Hilo de escucha ---
+    def _escuchar(self, app):
+        while True:
+            crudo = None
+            try:
+                with app.app_context():
+                    crudo = db.engine.raw_connection()
+                    crudo.detach()  # fuera del pool, en autocommit mientras viva el proceso
+                    conexion = crudo.driver_connection
+                    conexion.autocommit = True
+                    with conexion.cursor() as cursor:
+                        cursor.execute(f'LISTEN {CANAL}')
+                    # Lo que cambió antes del LISTEN no llegó como aviso
+                    with self._lock:
+                        self._cargar()
+                    self._escuchando = True
+                    while True:
+                        if not select.select([conexion], [], [], 60)[0]:
+                            continue
+                        conexion.poll()
+                        cargas = [n.payload for n in conexion.notifies]
+                        conexion.notifies.clear()
+                        if '*' in cargas:
+                            with self._lock:
+                                self._cargar()
+                        elif cargas:
+                            self._refrescar({int(i) for carga in cargas for i in carga.split(',')})
+            except Exception as e:
+                self._escuchando = False
+                app.logger.warning('Índice de códigos sin LISTEN (se recarga cada %s s): %s',
+                                   app.config['CODIGOS_RECARGA_S'], e)
+                time.sleep(5)
+            finally:
+                if crudo is not None:
+                    try:
+                        crudo.close()
+                    except Exception:
+                        pass
+
+
+indice = IndiceCodigos()
+
+
+def codigos_por_producto():
+    """{producto_id: [códigos]} para el catálogo del POS."""
+    resultado = {}
+    for codigo, producto_id in db.session.query(CodigoProducto.codigo, CodigoProducto.producto_id).order_by(CodigoProducto.id):
+        resultado.setdefault(producto_id, []).append(codigo)
+    return resultado
+
+
+# -----------------------------------------------
+# RUTA: API - ESCANEO DE CÓDIGOS (POS)
+# -----------------------------------------------
+@codigos_bp.route('/api/pos/escanear')
+@login_required
+def escanear():
+    """Resuelve un código de barras o SKU a producto, precio y stock desde el índice en memoria."""
+    producto = indice.buscar(request.args.get('codigo', '', type=str))
+    if producto is None:
+        return jsonify({'success': False, 'error': 'Código no encontrado.'}), 404
+    return jsonify(success=True, producto=producto)
+
+
+# -----------------------------------------------
+# RUTA: CÓDIGOS DE UN PRODUCTO (Admin)
+# -----------------------------------------------
+@codigos_bp.route('/producto/<int:producto_id>/codigos', methods=['POST'])
+@login_required
+@admin_required
+def guardar_codigos(producto_id):
+    """Reemplaza los códigos de un producto (uno por línea en el formulario)."""
+    producto = Producto.query.get_or_404(producto_id)
+    nuevos = []
+    for linea in request.form.get('codigos', '').splitlines():
+        codigo = normalizar(linea)
+        if codigo and codigo not in nuevos:
+            nuevos.append(codigo)
+    try:
+        actuales = {c.codigo: c for c in producto.codigos}
+        for codigo, objeto in actuales.items():
+            if codigo not in nuevos:
+                db.session.delete(objeto)
+        for codigo in nuevos:
+            if codigo not in actuales:
+                db.session.add(CodigoProducto(codigo=codigo, producto_id=producto.id))
+        db.session.commit()
+        flash(f'Códigos de "{producto.nombre}" guardados ({len(nuevos)}).', 'success')
+    except IntegrityError:
+        db.session.rollback()
+        en_uso = CodigoProducto.query.filter(
+            CodigoProducto.codigo.in_(nuevos), CodigoProducto.producto_id != producto.id
+        ).first()
+        detalle = f'"{en_uso.codigo}" ya es de {en_uso.producto.nombre}' if en_uso else 'hay un código repetido'
+        flash(f'Error: {detalle}.', 'danger')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al guardar los códigos: {str(e)}', 'danger')
+    return redirect(url_for('main.editar_producto', producto_id=producto.id))
@@ -0,0 +1,175 @@
+"""
+Configuración de la aplicación.
+
+Los valores se leen de variables de entorno y después se pueden pisar con un
+archivo `instance/config.py` (ver create_app). DATABASE_URL y SECRET_KEY no
+tienen valor por defecto: fuera de DEBUG/TESTING la app no arranca sin ellas
+(ver validar). Ejemplo de instance/config.py:
+
+    SQLALCHEMY_DATABASE_URI = 'postgresql://negocio:clave@db:5432/negocio_db'
+    SECRET_KEY = '...'
+    DB_POOL_SIZE = 20
+"""
+import os
+import secrets
+
+from .metricas import PoolMedido
+
+
+def _env_int(nombre, defecto):
+    valor = os.environ.get(nombre)
+    return int(valor) if valor not in (None, '') else defecto
+
+
+def _env_bool(nombre, defecto):
+    valor = os.environ.get(nombre)
+    if valor in (None, ''):
+        return defecto
+    return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+class Config:
+    # --- Base de datos y seguridad ---
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', '')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', '')
+
+    # --- Pool de conexiones ---
+    # Cada worker tiene su propio pool: pool_size + max_overflow por worker
+    # no debe superar (max_connections de PostgreSQL / cantidad de workers).
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 5)
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 10)         # segundos esperando una conexión libre
+    DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 1800)       # segundos antes de reciclar una conexión
+    DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING', True)
+    DB_STATEMENT_TIMEOUT_MS = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)  # 0 = sin límite
+    DB_STATEMENT_TIMEOUT_LARGO_MS = _env_int('DB_STATEMENT_TIMEOUT_LARGO_MS', 0)  # importaciones, conciliación y reposición (ver trabajos.timeout_largo)
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'mi-negocio')
+
+    # --- Réplica de lectura (ver replicas.py); vacío = todo va al primario ---
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL', '')
+    REPLICA_MAX_LAG_S = _env_int('REPLICA_MAX_LAG_S', 5)                # atraso máximo tolerado
+    REPLICA_CHECK_INTERVAL_S = _env_int('REPLICA_CHECK_INTERVAL_S', 2)  # cada cuánto se mide el atraso
+    REPLICA_CONNECT_TIMEOUT_S = _env_int('REPLICA_CONNECT_TIMEOUT_S', 2)  # libpq no acepta menos de 2
+    # Rutas de solo lectura que pueden ir a la réplica
+    REPLICA_ENDPOINTS = {
+        'main.ver_ventas',
+        'main.historial_jornadas',
+        'main.reporte_inventario',
+        'main.perfil_cliente',
+    }
+    REPLICA_PREFIJOS = ('/api/reporte/',)
+
+    # --- Métricas (/admin/metricas); con token, Prometheus puede leerlas sin sesión ---
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+    # --- Perfilador (se activa desde /admin/perfilador) ---
+    PERFILADOR_DIRECTORIO = os.environ.get('PERFILADOR_DIRECTORIO', '')  # vacío = instance/perfiles
+    PERFILADOR_MAX_ARCHIVOS = _env_int('PERFILADOR_MAX_ARCHIVOS', 200)
+
+    # --- Consultas lentas (/admin/consultas_lentas); umbral 0 = desactivado ---
+    CONSULTAS_LENTAS_UMBRAL_MS = _env_int('CONSULTAS_LENTAS_UMBRAL_MS', 200)
+    CONSULTAS_LENTAS_MAX = _env_int('CONSULTAS_LENTAS_MAX', 5000)          # filas que se conservan
+    CONSULTAS_LENTAS_EXPLAIN = _env_bool('CONSULTAS_LENTAS_EXPLAIN', True)
+
+    # Assets: con ASSETS_DEBUG se sirven los archivos originales aunque exista static/dist
+    ASSETS_DEBUG = _env_bool('ASSETS_DEBUG', False)
+
+    # --- Compresión de HTML/JSON (0 = desactivada) ---
+    COMPRESION_MINIMO_BYTES = _env_int('COMPRESION_MINIMO_BYTES', 1024)
+    COMPRESION_NIVEL_GZIP = _env_int('COMPRESION_NIVEL_GZIP', 6)
+    COMPRESION_NIVEL_BROTLI = _env_int('COMPRESION_NIVEL_BROTLI', 5)
+
+    # --- Recibos PDF / ESC/POS (por defecto en instance/recibos) ---
+    RECIBOS_DIRECTORIO = os.environ.get('RECIBOS_DIRECTORIO')
+    RECIBOS_HILOS = _env_int('RECIBOS_HILOS', 2)
+    RECIBOS_ANCHO = _env_int('RECIBOS_ANCHO', 48)           # columnas: 48 en rollo de 80 mm, 32 en 58 mm
+    RECIBOS_PRECALENTAR = _env_bool('RECIBOS_PRECALENTAR', True)
+
+    # --- Cola de trabajos (worker.py) ---
+    TRABAJOS_DIRECTORIO = os.environ.get('TRABAJOS_DIRECTORIO')  # archivos subidos; por defecto instance/trabajos
+    TRABAJOS_INTERVALO_S = _env_int('TRABAJOS_INTERVALO_S', 2)   # sondeo si no hay LISTEN/NOTIFY
+    TRABAJOS_TIMEOUT_S = _env_int('TRABAJOS_TIMEOUT_S', 300)     # sin latido: el trabajo vuelve a la cola
+    TRABAJOS_MAX_INTENTOS = _env_int('TRABAJOS_MAX_INTENTOS', 3)
+    TRABAJOS_BACKOFF_S = _env_int('TRABAJOS_BACKOFF_S', 10)
+    TRABAJOS_BACKOFF_MAX_S = _env_int('TRABAJOS_BACKOFF_MAX_S', 3600)
+
+    # --- Facturación electrónica (fiscal.py); los envíos los hace worker.py ---
+    FISCAL_HABILITADO = _env_bool('FISCAL_HABILITADO', False)
+    FISCAL_PUNTO_VENTA = _env_int('FISCAL_PUNTO_VENTA', 1)
+    FISCAL_CLIENTE = os.environ.get('FISCAL_CLIENTE', '')           # 'modulo:Clase'; en desarrollo: app.fiscal:ClienteSimulado
+    FISCAL_LOTE = _env_int('FISCAL_LOTE', 50)                    # comprobantes por pedido de CAE
+    FISCAL_DEMORA_LOTE_S = _env_int('FISCAL_DEMORA_LOTE_S', 5)   # espera para juntar ventas en un lote
+    FISCAL_SIMULADO_ARCHIVO = os.environ.get('FISCAL_SIMULADO_ARCHIVO')  # por defecto instance/fiscal_simulado.json
+    FISCAL_SIMULADO_DEMORA_MS = _env_int('FISCAL_SIMULADO_DEMORA_MS', 300)
+    FISCAL_SIMULADO_FALLAS = float(os.environ.get('FISCAL_SIMULADO_FALLAS') or 0)  # 0 a 1
+
+    # --- Índice de códigos de barras (codigos.py) ---
+    CODIGOS_RECARGA_S = _env_int('CODIGOS_RECARGA_S', 60)  # recarga completa si no hay LISTEN/NOTIFY
+
+    # --- Punto de pedido y sugerencia de compra (reposicion.py) ---
+    REPOSICION_DIAS_HISTORIAL = _env_int('REPOSICION_DIAS_HISTORIAL', 365)
+    REPOSICION_DIAS_ENTREGA = _env_int('REPOSICION_DIAS_ENTREGA', 7)     # del pedido al proveedor a la góndola
+    REPOSICION_DIAS_REVISION = _env_int('REPOSICION_DIAS_REVISION', 14)  # cada cuánto se hace un pedido
+    REPOSICION_NIVEL_SERVICIO = float(os.environ.get('REPOSICION_NIVEL_SERVICIO') or 0.95)  # 0 a 1
+
+    # --- API v1 para integraciones (api.py) ---
+    API_MARGEN_S = _env_int('API_MARGEN_S', 60)  # updated_until queda así de atrás de now() (transacciones en curso)
+
+    # --- Libro IVA Ventas (libro_iva.py) ---
+    LIBRO_IVA_ZONA_HORARIA = os.environ.get('LIBRO_IVA_ZONA_HORARIA', 'America/Argentina/Buenos_Aires')  # días y meses del libro
+
+    # --- Cachés de templates (plantillas.py) ---
+    PLANTILLAS_BYTECODE = os.environ.get('PLANTILLAS_BYTECODE')              # directorio; por defecto instance/jinja
+    PLANTILLAS_FRAGMENTOS_KB = _env_int('PLANTILLAS_FRAGMENTOS_KB', 8192)  # {% cache %} por worker; 0 lo desactiva
+
+
+def engine_options(config):
+    """Arma SQLALCHEMY_ENGINE_OPTIONS a partir de las claves DB_* de la configuración."""
+    connect_args = {'application_name': config['DB_APPLICATION_NAME']}
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        connect_args['options'] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+
+    return {
+        'poolclass': PoolMedido,  # mide la espera de checkout (ver metricas.py)
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'connect_args': connect_args,
+    }
+
+
+# Solo en DEBUG/TESTING: base local sin contraseña (autenticación trust/peer)
+BASE_DESARROLLO = 'postgresql://postgres@localhost:5432/negocio_db'
+
+
+def validar(config):
+    """
+    Falla al arrancar con una configuración que no puede funcionar. En DEBUG o
+    TESTING completa la base y la clave de sesión con valores de desarrollo.
+    """
+    if config['FISCAL_HABILITADO'] and not config['FISCAL_CLIENTE']:
+        raise RuntimeError('FISCAL_HABILITADO requiere FISCAL_CLIENTE (ej: app.fiscal:ClienteSimulado).')
+    if config.get('DEBUG') or config.get('TESTING'):
+        config['SQLALCHEMY_DATABASE_URI'] = config['SQLALCHEMY_DATABASE_URI'] or BASE_DESARROLLO
+        # Distinta en cada arranque: las sesiones no sobreviven un reinicio
+        config['SECRET_KEY'] = config['SECRET_KEY'] or secrets.token_hex(32)
+        return
+    faltan = [nombre for nombre, clave in (('DATABASE_URL', 'SQLALCHEMY_DATABASE_URI'), ('SECRET_KEY', 'SECRET_KEY'))
+              if not config.get(clave)]
+    if faltan:
+        raise RuntimeError(f'Falta configurar {", ".join(faltan)} (variable de entorno o instance/config.py).')
+
+
+def binds(config):
+    """
+    Arma SQLALCHEMY_BINDS: la réplica (si hay) usa las mismas opciones de pool y un
+    connect_timeout corto, para que una réplica caída no frene los requests.
+    """
+    if not config['REPLICA_DATABASE_URL']:
+        return {}
+    opciones = engine_options(config)
+    opciones['connect_args'] = {**opciones['connect_args'], 'connect_timeout': config['REPLICA_CONNECT_TIMEOUT_S']}
+    return {'replica': {'url': config['REPLICA_DATABASE_URL'], **opciones}}
@@ -0,0 +1,238 @@
+"""
+Registro de consultas lentas.
+
+Toda sentencia SQL que tarda más de CONSULTAS_LENTAS_UMBRAL_MS se pone en una
+cola; un hilo aparte la normaliza (sin literales, listas IN colapsadas), le
+calcula una huella, oculta los parámetros sensibles y, si es un SELECT de solo
+lectura, vuelve a ejecutarla con EXPLAIN (ANALYZE, BUFFERS) para guardar el
+plan. Todo se guarda en la tabla consulta_lenta, que se recorta a las últimas
+CONSULTAS_LENTAS_MAX filas.
+
+/admin/consultas_lentas agrupa por huella con cantidad y percentiles.
+"""
+import hashlib
+import json
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Blueprint, render_template, request, current_app, has_request_context
+from flask_login import login_required
+from sqlalchemy import event, text, func
+from sqlalchemy.engine import Engine
+
+from .models import db, ConsultaLenta
+from .decorators import admin_required
+
+consultas_lentas_bp = Blueprint('consultas_lentas', __name__)
+
+TAMANO_COLA = 1000
+LARGO_MAX_PARAMETRO = 50
+TIMEOUT_EXPLAIN_MS = 30000
+
+# Parámetros cuyo valor no se guarda
+RE_SENSIBLE = re.compile(r'pass|hash|token|secret|clave|email|documento|telefono|cuit', re.IGNORECASE)
+
+# Normalización: placeholders y literales -> ?, listas -> (...), espacios colapsados
+RE_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+RE_STRING = re.compile(r"'(?:[^']|'')*'")
+RE_NUMERO = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+RE_ESPACIOS = re.compile(r'\s+')
+
+# Solo se re-ejecutan con EXPLAIN ANALYZE los SELECT que no bloquean ni escriben
+RE_SELECT = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+RE_NO_EXPLICAR = re.compile(
+    r'\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b|\b(INSERT|UPDATE|DELETE|MERGE)\b|nextval|setval|pg_advisory',
+    re.IGNORECASE
+)
+
+_cola = queue.Queue(maxsize=TAMANO_COLA)
+_hilo = None
+_lock = threading.Lock()
+_estado = {'app': None, 'umbral_ms': 0}
+_local = threading.local()  # marca el hilo del registrador para no registrarse a sí mismo
+
+
+def normalizar(sql):
+    sql = RE_STRING.sub('?', sql)
+    sql = RE_PLACEHOLDER.sub('?', sql)
+    sql = RE_NUMERO.sub('?', sql)
+    sql = RE_LISTA.sub('(...)', sql)
+    return RE_ESPACIOS.sub(' ', sql).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.md5(sql_normalizado.encode('utf-8')).hexdigest()
+
+
+def redactar(parametros):
+    """Parámetros como JSON, ocultando los sensibles y recortando los largos."""
+    def valor(clave, v):
+        if clave is not None and RE_SENSIBLE.search(str(clave)):
+            return '***'
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            return f'<{len(v)} bytes>'
+        v = str(v) if not isinstance(v, (int, float, bool, type(None))) else v
+        if isinstance(v, str) and len(v) > LARGO_MAX_PARAMETRO:
+            return v[:LARGO_MAX_PARAMETRO] + '...'
+        return v
+
+    if isinstance(parametros, dict):
+        return json.dumps({k: valor(k, v) for k, v in parametros.items()}, ensure_ascii=False, default=str)
+    if isinstance(parametros, (list, tuple)):
+        if parametros and isinstance(parametros[0], (dict, list, tuple)):
+            return json.dumps({'executemany': len(parametros)})
+        return json.dumps([valor(None, v) for v in parametros], ensure_ascii=False, default=str)
+    return None
+
+
+def _se_puede_explicar(sql, parametros):
+    if isinstance(parametros, (list, tuple)) and parametros and isinstance(parametros[0], (dict, list, tuple)):
+        return False
+    return bool(RE_SELECT.match(sql)) and not RE_NO_EXPLICAR.search(sql)
+
+
+# --- Captura (en el hilo del request) ---
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info['lenta_inicio'] = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop('lenta_inicio', None)
+    if inicio is None or getattr(_local, 'registrando', False):
+        return
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    if duracion_ms < _estado['umbral_ms']:
+        return
+    endpoint = (request.endpoint or 'sin_ruta') if has_request_context() else 'fuera_de_request'
+    try:
+        _cola.put_nowait((
+            datetime.now(timezone.utc), statement, None if executemany else parameters,
+            duracion_ms, endpoint, conn.engine
+        ))
+    except queue.Full:
+        return  # Se descarta: registrar nunca debe frenar al request
+    _iniciar_hilo()
+
+
+# --- Registro (en un hilo aparte) ---
+def _iniciar_hilo():
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(
+                target=_registrar, args=(_estado['app'],), name='consultas_lentas', daemon=True
+            )
+            _hilo.start()
+
+
+def _registrar(app):
+    _local.registrando = True
+    while True:
+        item = _cola.get()
+        with app.app_context():
+            try:
+                guardar(*item)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning('No se pudo registrar la consulta lenta: %s', e)
+
+
+def explicar(engine, sql, parametros, timeout_ms):
+    """Vuelve a ejecutar el SELECT con EXPLAIN (ANALYZE, BUFFERS) en una transacción que se descarta."""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+            explain = 'EXPLAIN (ANALYZE, BUFFERS) ' + sql
+            resultado = conn.exec_driver_sql(explain, parametros) if parametros else conn.exec_driver_sql(explain)
+            filas = resultado.all()
+            return '\n'.join(f[0] for f in filas)
+        finally:
+            trans.rollback()
+
+
+def guardar(fecha, sql, parametros, duracion_ms, endpoint, engine):
+    config = current_app.config
+    plan = None
+    if config['CONSULTAS_LENTAS_EXPLAIN'] and _se_puede_explicar(sql, parametros):
+        try:
+            plan = explicar(engine, sql, parametros, min(duracion_ms * 10, TIMEOUT_EXPLAIN_MS))
+        except Exception as e:
+            plan = f'(No se pudo obtener el plan: {e})'
+
+    sql_normalizado = normalizar(sql)
+    db.session.add(ConsultaLenta(
+        fecha=fecha,
+        huella=huella(sql_normalizado),
+        sql=sql_normalizado,
+        parametros=redactar(parametros),
+        duracion_ms=round(duracion_ms, 2),
+        endpoint=endpoint[:100],
+        plan=plan
+    ))
+    db.session.flush()
+    # Tabla acotada: se borran las más viejas
+    db.session.execute(text("""
+        DELETE FROM consulta_lenta
+        WHERE id <= (SELECT id FROM consulta_lenta ORDER BY id DESC OFFSET :maximo LIMIT 1)
+    """), {'maximo': config['CONSULTAS_LENTAS_MAX']})
+    db.session.commit()
+
+
+@consultas_lentas_bp.record_once
+def _activar(state):
+    """Engancha los eventos de SQLAlchemy si hay umbral configurado."""
+    app = state.app
+    umbral_ms = app.config['CONSULTAS_LENTAS_UMBRAL_MS']
+    if not umbral_ms:
+        return
+    _estado['umbral_ms'] = umbral_ms
+    _estado['app'] = app
+    event.listen(Engine, 'before_cursor_execute', _antes)
+    event.listen(Engine, 'after_cursor_execute', _despues)
+
+
+# -----------------------------------------------
+# RUTA: CONSULTAS LENTAS (Admin)
+# -----------------------------------------------
+@consultas_lentas_bp.route('/admin/consultas_lentas')
+@login_required
+@admin_required
+def consultas_lentas():
+    """Consultas lentas agrupadas por huella, o el detalle de una huella."""
+    huella_sel = request.args.get('huella', '', type=str)
+    if huella_sel:
+        muestras = ConsultaLenta.query.filter_by(
+            huella=huella_sel
+        ).order_by(ConsultaLenta.id.desc()).limit(20).all()
+        return render_template('consultas_lentas.html', muestras=muestras, huella=huella_sel, grupos=None)
+
+    grupos = db.session.query(
+        ConsultaLenta.huella,
+        func.count(ConsultaLenta.id).label('cantidad'),
+        func.percentile_cont(0.5).within_group(ConsultaLenta.duracion_ms).label('p50'),
+        func.percentile_cont(0.95).within_group(ConsultaLenta.duracion_ms).label('p95'),
+        func.max(ConsultaLenta.duracion_ms).label('maximo'),
+        func.sum(ConsultaLenta.duracion_ms).label('total'),
+        func.max(ConsultaLenta.fecha).label('ultima'),
+        func.string_agg(ConsultaLenta.endpoint.distinct(), ', ').label('endpoints'),
+        func.min(ConsultaLenta.sql).label('sql')
+    ).group_by(
+        ConsultaLenta.huella
+    ).order_by(
+        func.sum(ConsultaLenta.duracion_ms).desc()
+    ).limit(100).all()
+
+    return render_template(
+        'consultas_lentas.html',
+        grupos=grupos,
+        muestras=None,
+        huella=None,
+        umbral_ms=current_app.config['CONSULTAS_LENTAS_UMBRAL_MS']
+    )
@@ -0,0 +1,501 @@
+"""
+Facturación electrónica (AFIP) en segundo plano.
+
+Cada venta deja su ComprobanteFiscal 'pendiente' en la misma transacción y
+encola un trabajo 'fiscal_enviar' para dentro de FISCAL_DEMORA_LOTE_S segundos:
+el cobro no espera a AFIP y las ventas de ese lapso viajan en un solo lote. Si
+ya hay un envío esperando, la venta no encola otro (ux_trabajo_fiscal_enviar).
+
+Por cada punto de venta y tipo de comprobante, el worker:
+  1. toma un advisory lock (AFIP exige números correlativos: un envío a la vez);
+     si otro envío ya lo tiene, no espera: deja un envío para más tarde y sigue,
+  2. pregunta el último número autorizado; los comprobantes 'numerado' de un
+     intento que se cortó y que AFIP ya autorizó se completan con consultar(),
+     los demás vuelven a numerarse,
+  3. numera hasta FISCAL_LOTE pendientes desde NumeradorFiscal y los guarda
+     antes de enviar (si se pierde la respuesta, el paso 2 los recupera),
+  4. pide los CAE del lote. Un rechazo no consume número: el rechazado queda
+     para revisar en /admin/fiscal y los siguientes vuelven a 'pendiente'.
+Si el servicio no responde, el trabajo se reintenta con espera exponencial.
+
+Al anular una venta su comprobante pasa a 'anulado' y no se envía. Si ya tiene
+CAE (o puede tenerlo, mientras está 'numerado') la venta no se anula: AFIP solo
+acepta cancelarlo con una nota de crédito.
+
+El cliente se elige con FISCAL_CLIENTE ('modulo:Clase', recibe la config de la
+app); no hay uno por defecto y la app no arranca con FISCAL_HABILITADO sin él.
+ClienteSimulado reemplaza a AFIP en desarrollo y pruebas.
+"""
+import datetime
+import fcntl
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import click
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import login_required
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from werkzeug.utils import import_string
+
+from .models import db, Cliente, ComprobanteFiscal, Configuracion, NumeradorFiscal, Trabajo, Venta
+from .decorators import admin_required
+from .trabajos import CANAL, TAREAS, tarea
+
+fiscal_bp = Blueprint('fiscal', __name__)
+
+FACTURA_A, FACTURA_B, FACTURA_C = 1, 6, 11
+TIPOS = {FACTURA_A: 'Factura A', FACTURA_B: 'Factura B', FACTURA_C: 'Factura C'}
+DOC_CUIT, DOC_DNI, DOC_SIN_IDENTIFICAR = 80, 96, 99
+ESTADOS = ('pendiente', 'numerado', 'aprobado', 'rechazado', 'anulado')
+POR_ENVIAR = ('pendiente', 'numerado')
+BLOQUEO = 1179210563  # clase del advisory lock ('FISC'); la clave es punto_venta * 100 + tipo
+
+
+class ErrorComunicacion(Exception):
+    """El servicio fiscal no respondió: el lote se reintenta más tarde."""
+    pass
+
+
+class AnulacionFiscal(Exception):
+    """La venta no se puede anular sin pasar por AFIP."""
+    pass
+
+
+# --- Datos del comprobante ---
+def cuit_valido(cuit):
+    """Verifica el dígito verificador de un CUIT/CUIL."""
+    digitos = ''.join(c for c in str(cuit or '') if c.isdigit())
+    if len(digitos) != 11:
+        return False
+    suma = sum(int(d) * p for d, p in zip(digitos, (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)))
+    verificador = {11: 0, 10: 9}.get(11 - suma % 11, 11 - suma % 11)
+    return verificador == int(digitos[10])
+
+
+def tipo_comprobante(condicion_tienda, condicion_cliente):
+    """Un Responsable Inscripto emite A a otro inscripto y B al resto; monotributo y exento emiten C."""
+    if condicion_tienda != 'Responsable Inscripto':
+        return FACTURA_C
+    return FACTURA_A if condicion_cliente == 'Responsable Inscripto' else FACTURA_B
+
+
+def documento(cliente):
+    """(tipo, número) de documento del receptor según lo cargado en el cliente."""
+    digitos = ''.join(c for c in (cliente.documento_fiscal or '') if c.isdigit()) if cliente else ''
+    if len(digitos) == 11:
+        return DOC_CUIT, int(digitos)
+    if 7 <= len(digitos) <= 8:
+        return DOC_DNI, int(digitos)
+    return DOC_SIN_IDENTIFICAR, 0
+
+
+def encolar_factura(venta):
+    """
+    Agrega a la sesión el comprobante de una venta recién creada (ya con id).
+    Se confirma con el commit de la venta; a AFIP lo envía el worker.
+    """
+    config = current_app.config
+    if not config['FISCAL_HABILITADO']:
+        return None
+    condicion_tienda = db.session.query(Configuracion.valor).filter_by(clave='condicion_iva_tienda').scalar()
+    cliente = db.session.get(Cliente, venta.cliente_id) if venta.cliente_id else None
+    tipo = tipo_comprobante(condicion_tienda, cliente.condicion_iva if cliente else None)
+    doc_tipo, doc_nro = documento(cliente)
+
+    # La factura C no discrimina IVA: todo el importe es neto. En A y B lo que no es neto ni IVA es exento
+    if tipo == FACTURA_C:
+        neto, iva, exento = venta.total, Decimal('0.00'), Decimal('0.00')
+    else:
+        neto, iva = venta.total_neto_gravado, venta.total_monto_iva
+        exento = venta.total - neto - iva
+    comprobante = ComprobanteFiscal(
+        venta_id=venta.id,
+        punto_venta=config['FISCAL_PUNTO_VENTA'],
+        tipo_comprobante=tipo,
+        fecha=datetime.date.today(),
+        doc_tipo=doc_tipo,
+        doc_nro=doc_nro,
+        importe_total=venta.total,
+        importe_neto=neto,
+        importe_iva=iva,
+        importe_exento=exento
+    )
+    db.session.add(comprobante)
+    encolar_envio(config['FISCAL_DEMORA_LOTE_S'])
+    return comprobante
+
+
+def encolar_envio(demora=0):
+    """Encola un 'fiscal_enviar' dentro de `demora` segundos, salvo que ya haya uno esperando."""
+    definicion = TAREAS['fiscal_enviar']
+    # ux_trabajo_fiscal_enviar: un solo envío sin empezar; el que ya está se lleva también esta venta
+    trabajo_id = db.session.execute(
+        insert(Trabajo).values(
+            tipo='fiscal_enviar', parametros={}, estado='pendiente', prioridad=definicion['prioridad'],
+            intentos=0, max_intentos=definicion['max_intentos'], progreso=0,
+            disponible_desde=func.now() + timedelta(seconds=demora)
+        ).on_conflict_do_nothing(
+            index_elements=['tipo'],
+            index_where=text("tipo = 'fiscal_enviar' AND estado = 'pendiente' AND intentos = 0")
+        ).returning(Trabajo.id)
+    ).scalar()
+    if trabajo_id is not None:
+        db.session.execute(text('SELECT pg_notify(:canal, :id)'), {'canal': CANAL, 'id': str(trabajo_id)})
+    return trabajo_id
+
+
+def anular_comprobantes(venta_ids):
+    """
+    Saca de la cola fiscal los comprobantes de ventas que se están anulando
+    (con las ventas ya bloqueadas); se confirma con el commit de la anulación.
+    Falla con AnulacionFiscal si alguno tiene o puede tener CAE.
+    """
+    comprobantes = ComprobanteFiscal.query.filter(
+        ComprobanteFiscal.venta_id.in_(venta_ids), ComprobanteFiscal.estado != 'anulado'
+    ).order_by(ComprobanteFiscal.id).with_for_update().all()
+    for comprobante in comprobantes:
+        if comprobante.estado == 'aprobado':
+            raise AnulacionFiscal(f'La venta #{comprobante.venta_id} ya tiene CAE: se anula con una nota de crédito.')
+        if comprobante.estado == 'numerado':
+            raise AnulacionFiscal(f'La venta #{comprobante.venta_id} está esperando la respuesta de AFIP: reintentar en unos minutos.')
+
+    # El mismo bloqueo que el envío, hasta el commit: el worker no los numera mientras tanto
+    series = sorted({(c.punto_venta, c.tipo_comprobante) for c in comprobantes if c.estado == 'pendiente'})
+    for punto_venta, tipo in series:
+        tomado = db.session.execute(
+            text('SELECT pg_try_advisory_xact_lock(:clase, :clave)'), {'clase': BLOQUEO, 'clave': punto_venta * 100 + tipo}
+        ).scalar()
+        if not tomado:
+            raise AnulacionFiscal('Se están enviando a AFIP comprobantes de estas ventas: reintentar en unos segundos.')
+    for comprobante in comprobantes:
+        comprobante.estado = 'anulado'
+    return len(comprobantes)
+
+
+# --- Clientes del servicio fiscal ---
+class ClienteFiscal(ABC):
+    """
+    Lo que el pipeline necesita del servicio (en AFIP: FECompUltimoAutorizado,
+    FECAESolicitar y FECompConsultar de WSFEv1). Los errores de red o de
+    autenticación se informan con ErrorComunicacion.
+
+    Cada comprobante enviado es un dict con numero, fecha, doc_tipo, doc_nro,
+    importe_total, importe_neto, importe_iva e importe_exento. Cada respuesta es un dict con
+    numero, resultado ('A' aprobado / 'R' rechazado), cae, cae_vencimiento
+    (date) y observaciones.
+    """
+    def __init__(self, config):
+        self.config = config
+
+    @abstractmethod
+    def ultimo_autorizado(self, punto_venta, tipo):
+        """Último número autorizado de la serie (0 si no hay ninguno)."""
+
+    @abstractmethod
+    def solicitar_cae(self, punto_venta, tipo, comprobantes):
+        """Respuestas en el mismo orden que los comprobantes."""
+
+    @abstractmethod
+    def consultar(self, punto_venta, tipo, numero):
+        """Respuesta de un comprobante ya autorizado, o None si no existe."""
+
+
+class ClienteSimulado(ClienteFiscal):
+    """
+    Servicio fiscal local: guarda lo autorizado en un JSON (por defecto
+    instance/fiscal_simulado.json) y valida como WSFEv1 la correlatividad, el
+    CUIT del receptor de Factura A y que total = neto + IVA + exento. Con
+    FISCAL_SIMULADO_DEMORA_MS y FISCAL_SIMULADO_FALLAS (probabilidad de 0 a 1)
+    imita la latencia y los cortes, incluida la respuesta que se pierde
+    después de autorizar.
+    """
+    def __init__(self, config):
+        super().__init__(config)
+        self.ruta = config.get('FISCAL_SIMULADO_ARCHIVO') or os.path.join(current_app.instance_path, 'fiscal_simulado.json')
+        self.demora = config['FISCAL_SIMULADO_DEMORA_MS'] / 1000
+        self.fallas = config['FISCAL_SIMULADO_FALLAS']
+
+    def _red(self, mensaje):
+        if random.random() < self.fallas:
+            raise ErrorComunicacion(f'Simulador: {mensaje}')
+
+    @contextmanager
+    def _estado(self):
+        """Estado compartido entre procesos (los workers), bloqueado mientras se usa."""
+        os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+        with open(self.ruta + '.lock', 'w') as cerrojo:
+            fcntl.flock(cerrojo, fcntl.LOCK_EX)
+            estado = {}
+            if os.path.exists(self.ruta):
+                with open(self.ruta, encoding='utf-8') as archivo:
+                    estado = json.load(archivo)
+            yield estado
+            with open(self.ruta + '.tmp', 'w', encoding='utf-8') as archivo:
+                json.dump(estado, archivo)
+            os.replace(self.ruta + '.tmp', self.ruta)
+
+    @staticmethod
+    def _respuesta(guardado):
+        return {**guardado, 'cae_vencimiento': datetime.date.fromisoformat(guardado['cae_vencimiento'])}
+
+    def ultimo_autorizado(self, punto_venta, tipo):
+        time.sleep(self.demora)
+        self._red('el servicio no respondió.')
+        with self._estado() as estado:
+            return estado.get(f'{punto_venta}-{tipo}', {}).get('ultimo', 0)
+
+    def consultar(self, punto_venta, tipo, numero):
+        time.sleep(self.demora)
+        self._red('el servicio no respondió.')
+        with self._estado() as estado:
+            guardado = estado.get(f'{punto_venta}-{tipo}', {}).get('comprobantes', {}).get(str(numero))
+        return self._respuesta(guardado) if guardado else None
+
+    def solicitar_cae(self, punto_venta, tipo, comprobantes):
+        time.sleep(self.demora)
+        self._red('el servicio no respondió.')
+        respuestas = []
+        with self._estado() as estado:
+            serie = estado.setdefault(f'{punto_venta}-{tipo}', {'ultimo': 0, 'comprobantes': {}})
+            for c in comprobantes:
+                error = None
+                if c['numero'] != serie['ultimo'] + 1:
+                    error = f'El número no es correlativo: el último autorizado es {serie["ultimo"]}.'
+                elif tipo == FACTURA_A and (c['doc_tipo'] != DOC_CUIT or not cuit_valido(c['doc_nro'])):
+                    error = 'La Factura A requiere un CUIT válido del receptor.'
+                elif abs(Decimal(c['importe_total']) - Decimal(c['importe_neto']) - Decimal(c['importe_iva'])
+                         - Decimal(c['importe_exento'])) > Decimal('0.01'):
+                    error = 'El importe total no coincide con neto + IVA + exento.'
+                if error:
+                    respuestas.append({'numero': c['numero'], 'resultado': 'R', 'cae': None,
+                                       'cae_vencimiento': None, 'observaciones': error})
+                    continue
+                huella = hashlib.sha256(f'{punto_venta}-{tipo}-{c["numero"]}'.encode()).hexdigest()
+                guardado = {
+                    'numero': c['numero'], 'resultado': 'A', 'cae': str(int(huella, 16))[:14],
+                    'cae_vencimiento': (c['fecha'] + timedelta(days=10)).isoformat(), 'observaciones': None
+                }
+                serie['comprobantes'][str(c['numero'])] = guardado
+                serie['ultimo'] = c['numero']
+                respuestas.append(self._respuesta(guardado))
+        self._red('se perdió la respuesta (el lote quedó autorizado).')
+        return respuestas
+
+
+def cliente_fiscal():
+    return import_string(current_app.config['FISCAL_CLIENTE'])(current_app.config)
+
+
+# --- Envío ---
+@contextmanager
+def _bloqueo(punto_venta, tipo):
+    """
+    Advisory lock en una conexión propia: sobrevive a los commits de la sesión.
+    No espera: da False si otro envío ya lo tiene.
+    """
+    conexion = db.engine.connect()
+    parametros = {'clase': BLOQUEO, 'clave': punto_venta * 100 + tipo}
+    tomado = False
+    try:
+        tomado = conexion.execute(text('SELECT pg_try_advisory_lock(:clase, :clave)'), parametros).scalar()
+        conexion.commit()
+        yield tomado
+    finally:
+        if tomado:
+            conexion.execute(text('SELECT pg_advisory_unlock(:clase, :clave)'), parametros)
+            conexion.commit()
+        conexion.close()
+
+
+def _numerador(punto_venta, tipo):
+    db.session.execute(text("""
+        INSERT INTO numerador_fiscal (punto_venta, tipo_comprobante, ultimo_numero)
+        VALUES (:pv, :tipo, 0) ON CONFLICT DO NOTHING
+    """), {'pv': punto_venta, 'tipo': tipo})
+    return NumeradorFiscal.query.filter_by(punto_venta=punto_venta, tipo_comprobante=tipo).with_for_update().one()
+
+
+def _registrar(comprobante, respuesta):
+    comprobante.estado = 'aprobado'
+    comprobante.cae = respuesta['cae']
+    comprobante.cae_vencimiento = respuesta['cae_vencimiento']
+    comprobante.observaciones = respuesta.get('observaciones')
+    comprobante.aprobado = func.now()
+
+
+def _datos(comprobante):
+    return {
+        'numero': comprobante.numero,
+        'fecha': comprobante.fecha,
+        'doc_tipo': comprobante.doc_tipo,
+        'doc_nro': comprobante.doc_nro,
+        'importe_total': comprobante.importe_total,
+        'importe_neto': comprobante.importe_neto,
+        'importe_iva': comprobante.importe_iva,
+        'importe_exento': comprobante.importe_exento,
+    }
+
+
+def _por_enviar(punto_venta, tipo, estado):
+    return ComprobanteFiscal.query.filter_by(punto_venta=punto_venta, tipo_comprobante=tipo, estado=estado)
+
+
+def _enviar_lote(cliente, punto_venta, tipo):
+    """Envía un lote de un punto de venta y tipo (con el bloqueo tomado). Devuelve (aprobados, rechazados)."""
+    ultimo = cliente.ultimo_autorizado(punto_venta, tipo)
+    numerador = _numerador(punto_venta, tipo)
+
+    # 1. Intentos anteriores cortados: lo autorizado se consulta, el resto se vuelve a numerar
+    for comprobante in _por_enviar(punto_venta, tipo, 'numerado').order_by(ComprobanteFiscal.numero).all():
+        if comprobante.numero <= ultimo:
+            respuesta = cliente.consultar(punto_venta, tipo, comprobante.numero)
+            if respuesta is None or respuesta['resultado'] != 'A':
+                raise ErrorComunicacion(f'AFIP informa autorizado el número {comprobante.numero} pero no lo devuelve.')
+            _registrar(comprobante, respuesta)
+        else:
+            comprobante.estado = 'anulado' if comprobante.venta.estado == 'anulada' else 'pendiente'
+            comprobante.numero = None
+    db.session.flush()
+    numerador.ultimo_numero = ultimo  # AFIP manda: cualquier número mayor no fue autorizado
+
+    # 2. Numerar y guardar antes de enviar (lo de ventas ya anuladas no se envía)
+    pendientes = _por_enviar(punto_venta, tipo, 'pendiente').join(ComprobanteFiscal.venta)
+    for comprobante in pendientes.filter(Venta.estado == 'anulada').all():
+        comprobante.estado = 'anulado'
+    lote = pendientes.filter(Venta.estado != 'anulada').order_by(ComprobanteFiscal.id).limit(
+        current_app.config['FISCAL_LOTE']
+    ).all()
+    for i, comprobante in enumerate(lote, start=1):
+        comprobante.numero = ultimo + i
+        comprobante.estado = 'numerado'
+        comprobante.intentos += 1
+    numerador.ultimo_numero = ultimo + len(lote)
+    datos = [_datos(c) for c in lote]
+    ids = [c.id for c in lote]
+    db.session.commit()
+    if not lote:
+        return 0, 0
+
+    # 3. Pedir los CAE (un ErrorComunicacion deja el lote 'numerado' para el próximo intento)
+    respuestas = {r['numero']: r for r in cliente.solicitar_cae(punto_venta, tipo, datos)}
+    numerador = _numerador(punto_venta, tipo)
+    lote = ComprobanteFiscal.query.filter(ComprobanteFiscal.id.in_(ids)).order_by(ComprobanteFiscal.numero).all()
+    aprobados, rechazado = 0, None
+    for comprobante in lote:
+        respuesta = respuestas.get(comprobante.numero)
+        if rechazado is None and respuesta and respuesta['resultado'] == 'A':
+            _registrar(comprobante, respuesta)
+            aprobados += 1
+            continue
+        if rechazado is None:
+            # El rechazado no consume número; los que siguen se renumeran en el próximo lote
+            rechazado = comprobante.numero
+            comprobante.estado = 'rechazado'
+            comprobante.observaciones = (respuesta or {}).get('observaciones') or 'Sin respuesta para este comprobante.'
+        else:
+            comprobante.estado = 'pendiente'
+        comprobante.numero = None
+    if rechazado is not None:
+        numerador.ultimo_numero = rechazado - 1
+    db.session.commit()
+    return aprobados, 1 if rechazado is not None else 0
+
+
+def enviar_pendientes(cliente=None):
+    """Envía todo lo pendiente, lote por lote. Devuelve los totales."""
+    cliente = cliente or cliente_fiscal()
+    grupos = db.session.query(
+        ComprobanteFiscal.punto_venta, ComprobanteFiscal.tipo_comprobante
+    ).filter(ComprobanteFiscal.estado.in_(POR_ENVIAR)).distinct().all()
+    db.session.commit()
+
+    totales = {'aprobados': 0, 'rechazados': 0}
+    ocupados = 0
+    for punto_venta, tipo in grupos:
+        with _bloqueo(punto_venta, tipo) as tomado:
+            if not tomado:
+                ocupados += 1
+                continue
+            while True:
+                aprobados, rechazados = _enviar_lote(cliente, punto_venta, tipo)
+                totales['aprobados'] += aprobados
+                totales['rechazados'] += rechazados
+                if not aprobados and not rechazados:
+                    break
+    if ocupados:
+        # El otro envío sigue hasta vaciar la serie; por si termina justo antes
+        # de ver los últimos comprobantes, queda uno para después
+        encolar_envio(current_app.config['FISCAL_DEMORA_LOTE_S'])
+        db.session.commit()
+    return totales
+
+
+@tarea('fiscal_enviar', max_intentos=10)
+def _tarea_enviar(trabajo):
+    return enviar_pendientes()
+
+
+# -----------------------------------------------
+# RUTA: COMPROBANTES FISCALES (Admin)
+# -----------------------------------------------
+@fiscal_bp.route('/admin/fiscal')
+@login_required
+@admin_required
+def comprobantes():
+    """Últimos comprobantes electrónicos, con filtro por estado."""
+    estado = request.args.get('estado', '', type=str)
+    query = ComprobanteFiscal.query
+    if estado in ESTADOS:
+        query = query.filter(ComprobanteFiscal.estado == estado)
+    lista = query.order_by(ComprobanteFiscal.id.desc()).limit(100).all()
+    resumen = dict(db.session.query(
+        ComprobanteFiscal.estado, func.count(ComprobanteFiscal.id)
+    ).group_by(ComprobanteFiscal.estado).all())
+    return render_template(
+        'fiscal.html', comprobantes=lista, resumen=resumen, estados=ESTADOS, estado_filtro=estado,
+        tipos=TIPOS, habilitado=current_app.config['FISCAL_HABILITADO']
+    )
+
+
+@fiscal_bp.route('/admin/fiscal/<int:comprobante_id>/reintentar', methods=['POST'])
+@login_required
+@admin_required
+def reintentar_comprobante(comprobante_id):
+    """Vuelve a encolar un comprobante rechazado (ej: después de corregir el CUIT del cliente)."""
+    try:
+        comprobante = ComprobanteFiscal.query.filter_by(id=comprobante_id).with_for_update().first_or_404()
+        if comprobante.estado != 'rechazado':
+            flash('Solo se pueden reintentar comprobantes rechazados.', 'warning')
+        else:
+            cliente = comprobante.venta.cliente
+            comprobante.doc_tipo, comprobante.doc_nro = documento(cliente)
+            comprobante.estado = 'pendiente'
+            comprobante.observaciones = None
+            encolar_envio()
+            flash(f'Comprobante de la venta #{comprobante.venta_id} encolado de nuevo.', 'success')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al reintentar el comprobante: {str(e)}', 'danger')
+    return redirect(url_for('fiscal.comprobantes'))
+
+
+# -----------------------------------------------
+# COMANDOS CLI
+# -----------------------------------------------
+@fiscal_bp.cli.command('enviar')
+def enviar_cmd():
+    """Envía ahora los comprobantes pendientes (sin pasar por el worker)."""
+    try:
+        totales = enviar_pendientes()
+    except ErrorComunicacion as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{totales["aprobados"]} aprobados, {totales["rechazados"]} rechazados.')
@@ -0,0 +1,463 @@
+"""
+Importaciones masivas con COPY.
+
+El archivo se vuelca tal cual a una tabla temporal (staging) con COPY, se valida
+con UPDATEs sobre todo el lote y recién después se pasa a las tablas reales con
+INSERT ... SELECT. Todo ocurre en una sola transacción.
+"""
+import csv
+import io
+
+from sqlalchemy import text
+from sqlalchemy.exc import DataError
+
+from .models import db
+from .impuestos import SQL_ALICUOTAS
+from .trabajos import timeout_largo
+from .versiones import marcar
+
+COLUMNAS_PRODUCTO = ['nombre', 'descripcion', 'precio', 'precio_costo', 'stock', 'stock_minimo']
+TIPO_MOV_IMPORTACION = 'Importación CSV'
+TIPO_MOV_STOCK_INICIAL = 'Stock Inicial'
+MAX_ERRORES_MOSTRADOS = 500
+
+# Importe con hasta 2 decimales (la coma ya se reemplazó por punto) y entero, los dos
+# con signo opcional: el signo se valida aparte en cada importación, con su propio mensaje
+REGEX_IMPORTE = r'^-?\d{1,8}([.]\d{1,2})?$'
+REGEX_ENTERO = r'^-?\d{1,9}$'
+
+
+class ErrorImportacion(Exception):
+    """Error que invalida el archivo completo (ej: encabezado incorrecto)."""
+    pass
+
+
+def _abrir_csv(archivo):
+    """Devuelve un stream de texto (acepta archivos binarios, ej: el de un upload)."""
+    if isinstance(archivo, io.TextIOBase):
+        return archivo
+    return io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+
+
+def _leer_encabezado(stream, columnas_validas):
+    """Lee la primera línea del CSV y valida que estén todas las columnas."""
+    encabezado = next(csv.reader([stream.readline()]), [])
+    encabezado = [c.strip().lower() for c in encabezado]
+    faltantes = [c for c in columnas_validas if c not in encabezado]
+    sobrantes = [c for c in encabezado if c not in columnas_validas]
+    if faltantes or sobrantes or len(set(encabezado)) != len(encabezado):
+        raise ErrorImportacion(
+            f'Encabezado inválido. Se esperaban las columnas: {", ".join(columnas_validas)}.'
+        )
+    return encabezado
+
+
+def _copy(stream, tabla, columnas):
+    """Vuelca el resto del stream en la tabla temporal con COPY (psycopg2)."""
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {tabla} ({", ".join(columnas)}) FROM STDIN WITH (FORMAT csv)',
+            stream
+        )
+    finally:
+        cursor.close()
+
+
+def importar_productos_csv(archivo, user_id, solo_validar=False):
+    """
+    Importa (crea o actualiza por nombre) productos desde un CSV con las columnas
+    nombre, descripcion, precio, precio_costo, stock, stock_minimo.
+    Las filas con errores se informan y no se importan; el resto sí.
+    Los cambios de stock quedan registrados en MovimientoStock y los de precio
+    en HistorialPrecio.
+    Devuelve un dict con totales y la lista de errores por fila.
+    """
+    stream = _abrir_csv(archivo)
+    encabezado = _leer_encabezado(stream, COLUMNAS_PRODUCTO)
+
+    timeout_largo()  # el COPY y los UPDATE de un catálogo grande superan el límite de los requests
+    db.session.execute(text("""
+        CREATE TEMP TABLE stg_producto (
+            fila serial,
+            nombre text, descripcion text, precio text, precio_costo text,
+            stock text, stock_minimo text,
+            error text
+        ) ON COMMIT DROP
+    """))
+    _copy(stream, 'stg_producto', encabezado)
+
+    # 1. Normalizar: espacios, vacíos como NULL y coma decimal
+    db.session.execute(text("""
+        UPDATE stg_producto SET
+            nombre = NULLIF(btrim(nombre), ''),
+            descripcion = NULLIF(btrim(descripcion), ''),
+            precio = replace(NULLIF(btrim(precio), ''), ',', '.'),
+            precio_costo = replace(NULLIF(btrim(precio_costo), ''), ',', '.'),
+            stock = NULLIF(btrim(stock), ''),
+            stock_minimo = NULLIF(btrim(stock_minimo), '')
+    """))
+
+    # 2. Validaciones de cada fila (se guarda el primer error encontrado)
+    db.session.execute(text("""
+        UPDATE stg_producto SET error = CASE
+            WHEN nombre IS NULL THEN 'Falta el nombre.'
+            WHEN length(nombre) > 100 THEN 'El nombre supera los 100 caracteres.'
+            WHEN precio IS NULL OR precio !~ :importe THEN 'Precio de venta inválido.'
+            WHEN precio_costo IS NULL OR precio_costo !~ :importe THEN 'Precio de costo inválido.'
+            WHEN stock IS NULL OR stock !~ :entero THEN 'Stock inválido.'
+            WHEN stock_minimo IS NULL OR stock_minimo !~ :entero THEN 'Stock mínimo inválido.'
+            WHEN precio::numeric <= 0 THEN 'El precio de venta debe ser mayor a cero.'
+            WHEN precio_costo::numeric < 0 OR stock::integer < 0 OR stock_minimo::integer < 0
+                THEN 'No se permiten valores negativos.'
+            WHEN precio_costo::numeric > precio::numeric
+                THEN 'El precio de costo no puede ser mayor al precio de venta.'
+        END
+    """), {'importe': REGEX_IMPORTE, 'entero': REGEX_ENTERO})
+
+    # 3. Nombres repetidos dentro del archivo (vale la primera aparición)
+    db.session.execute(text("""
+        UPDATE stg_producto s
+        SET error = 'Nombre repetido en el archivo (ver fila ' || d.primera || ').'
+        FROM (
+            SELECT fila, min(fila) OVER (PARTITION BY nombre) AS primera
+            FROM stg_producto
+            WHERE error IS NULL
+        ) d
+        WHERE s.fila = d.fila AND d.fila <> d.primera
+    """))
+
+    errores = db.session.execute(text("""
+        SELECT fila, nombre, error FROM stg_producto
+        WHERE error IS NOT NULL ORDER BY fila
+    """)).all()
+    total_filas = db.session.execute(text('SELECT count(*) FROM stg_producto')).scalar()
+
+    resultado = {
+        'total_filas': total_filas,
+        'creados': 0,
+        'actualizados': 0,
+        'errores': errores
+    }
+    if solo_validar:
+        db.session.rollback()
+        return resultado
+
+    # 4. Bloquear los productos existentes (en orden de id, igual que las ventas)
+    #    y registrar la diferencia de stock como movimiento
+    db.session.execute(text("""
+        SELECT p.id FROM producto p
+        JOIN stg_producto s ON s.nombre = p.nombre AND s.error IS NULL
+        ORDER BY p.id
+        FOR UPDATE OF p
+    """))
+    db.session.execute(text("""
+        INSERT INTO movimiento_stock (cantidad, tipo, producto_id, user_id)
+        SELECT s.stock::integer - p.stock, :tipo, p.id, :user_id
+        FROM stg_producto s
+        JOIN producto p ON p.nombre = s.nombre
+        WHERE s.error IS NULL AND s.stock::integer <> p.stock
+    """), {'tipo': TIPO_MOV_IMPORTACION, 'user_id': user_id})
+
+    # 5. Cambios de precio de los productos existentes al historial
+    db.session.execute(text("""
+        INSERT INTO historial_precio (
+            fecha, producto_id, precio_anterior, precio_nuevo,
+            precio_costo_anterior, precio_costo_nuevo, origen, user_id
+        )
+        SELECT now(), p.id, p.precio, s.precio::numeric(10, 2),
+               p.precio_costo, s.precio_costo::numeric(10, 2), :origen, :user_id
+        FROM stg_producto s
+        JOIN producto p ON p.nombre = s.nombre
+        WHERE s.error IS NULL
+          AND (p.precio <> s.precio::numeric(10, 2) OR p.precio_costo <> s.precio_costo::numeric(10, 2))
+    """), {'origen': TIPO_MOV_IMPORTACION, 'user_id': user_id})
+
+    # 6. Upsert por nombre + movimiento de stock inicial para los productos nuevos
+    totales = db.session.execute(text("""
+        WITH upsert AS (
+            INSERT INTO producto (nombre, descripcion, precio, precio_costo, stock, stock_minimo)
+            SELECT nombre, descripcion, precio::numeric(10, 2), precio_costo::numeric(10, 2),
+                   stock::integer, stock_minimo::integer
+            FROM stg_producto
+            WHERE error IS NULL
+            ORDER BY fila
+            ON CONFLICT (nombre) DO UPDATE SET
+                descripcion = COALESCE(EXCLUDED.descripcion, producto.descripcion),
+                precio = EXCLUDED.precio,
+                precio_costo = EXCLUDED.precio_costo,
+                stock = EXCLUDED.stock,
+                stock_minimo = EXCLUDED.stock_minimo
+            RETURNING id, stock, (xmax = 0) AS creado
+        ),
+        movimientos AS (
+            INSERT INTO movimiento_stock (cantidad, tipo, producto_id, user_id)
+            SELECT stock, :tipo, id, :user_id FROM upsert
+            WHERE creado AND stock <> 0
+        )
+        SELECT count(*) FILTER (WHERE creado) AS creados,
+               count(*) FILTER (WHERE NOT creado) AS actualizados
+        FROM upsert
+    """), {'tipo': TIPO_MOV_STOCK_INICIAL, 'user_id': user_id}).one()
+
+    marcar(db.session, 'producto', 'movimiento_stock', 'historial_precio')  # los INSERT con text() no los ve el ORM
+    db.session.commit()
+    resultado['creados'] = totales.creados
+    resultado['actualizados'] = totales.actualizados
+    return resultado
+
+
+# --- Ventas históricas (migración desde el sistema anterior) ---
+COLUMNAS_VENTA = ['referencia', 'fecha', 'metodo_pago', 'cliente', 'estado']
+COLUMNAS_DETALLE = ['referencia', 'producto', 'cantidad', 'precio_unitario', 'precio_costo_unitario']
+TIPO_MOV_IMPORTACION_VENTAS = 'Importación Ventas'
+REGEX_FECHA = r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])([ T]([01]\d|2[0-3]):[0-5]\d(:[0-5]\d)?)?$'
+
+
+def _crear_stg_venta():
+    """Ventas normalizadas, con el cliente resuelto y el primer error de cada fila."""
+    db.session.execute(text("""
+        CREATE TEMP TABLE stg_venta ON COMMIT DROP AS
+        SELECT v.*, c.id AS cliente_id, NULL::integer AS venta_id,
+            CASE
+                WHEN v.referencia IS NULL THEN 'Falta la referencia.'
+                WHEN length(v.referencia) > 64 THEN 'La referencia supera los 64 caracteres.'
+                WHEN v.fecha IS NULL OR v.fecha !~ :fecha THEN 'Fecha inválida (AAAA-MM-DD o AAAA-MM-DD HH:MM).'
+                WHEN CAST(v.fecha AS timestamptz) > now() THEN 'La fecha es futura.'
+                WHEN p.id IS NOT NULL THEN 'El mes de esa fecha está cerrado en el Libro IVA.'
+                WHEN v.metodo_pago IS NULL THEN 'Falta el método de pago.'
+                WHEN length(v.metodo_pago) > 50 THEN 'El método de pago supera los 50 caracteres.'
+                WHEN v.estado NOT IN ('completada', 'anulada') THEN 'Estado inválido (completada o anulada).'
+                WHEN v.cliente IS NOT NULL AND c.id IS NULL THEN 'No hay un cliente con ese documento.'
+                WHEN e.id IS NOT NULL THEN 'La venta ya fue importada.'
+                WHEN count(*) OVER (PARTITION BY v.referencia) > 1 THEN 'Referencia repetida en el archivo.'
+            END AS error
+        FROM (
+            SELECT fila,
+                   NULLIF(btrim(referencia), '') AS referencia,
+                   NULLIF(btrim(fecha), '') AS fecha,
+                   NULLIF(btrim(metodo_pago), '') AS metodo_pago,
+                   NULLIF(btrim(cliente), '') AS cliente,
+                   COALESCE(lower(NULLIF(btrim(estado), '')), 'completada') AS estado
+            FROM stg_venta_csv
+        ) v
+        LEFT JOIN cliente c ON c.documento_fiscal = v.cliente
+        LEFT JOIN venta e ON e.referencia_externa = v.referencia
+        LEFT JOIN periodo_iva p
+            ON p.periodo = CASE WHEN v.fecha ~ :fecha THEN CAST(left(v.fecha, 7) || '-01' AS date) END
+    """), {'fecha': REGEX_FECHA})
+
+
+def importar_ventas_csv(archivo_ventas, archivo_detalles, user_id, descontar_stock=False, solo_validar=False):
+    """
+    Importa ventas históricas desde dos CSV unidos por la referencia de la
+    venta en el sistema anterior:
+      ventas:   referencia, fecha, metodo_pago, cliente (documento), estado
+      detalles: referencia, producto (nombre o código), cantidad,
+                precio_unitario, precio_costo_unitario (vacío = costo actual)
+    Neto, IVA (con la alícuota actual de cada producto) y ganancia se calculan
+    igual que en nueva_venta. Una venta con
+    alguna línea inválida no se importa; las referencias ya importadas se
+    rechazan, así que el mismo archivo se puede volver a pasar. Tampoco entran
+    ventas de meses cerrados en el Libro IVA (ver libro_iva.py). El stock actual
+    no se toca salvo con descontar_stock (un movimiento por producto).
+    Devuelve un dict con totales y los primeros errores.
+    """
+    ventas = _abrir_csv(archivo_ventas)
+    encabezado_ventas = _leer_encabezado(ventas, COLUMNAS_VENTA)
+    detalles = _abrir_csv(archivo_detalles)
+    encabezado_detalles = _leer_encabezado(detalles, COLUMNAS_DETALLE)
+
+    # Los joins y agregados sobre millones de líneas se hacen en memoria, no en disco,
+    # y sin el límite de tiempo de los requests
+    db.session.execute(text("SET LOCAL work_mem = '256MB'"))
+    timeout_largo()
+    db.session.execute(text("""
+        CREATE TEMP TABLE stg_venta_csv (
+            fila serial, referencia text, fecha text, metodo_pago text, cliente text, estado text
+        ) ON COMMIT DROP
+    """))
+    db.session.execute(text("""
+        CREATE TEMP TABLE stg_detalle_csv (
+            fila serial, referencia text, producto text, cantidad text,
+            precio_unitario text, precio_costo_unitario text
+        ) ON COMMIT DROP
+    """))
+    _copy(ventas, 'stg_venta_csv', encabezado_ventas)
+    _copy(detalles, 'stg_detalle_csv', encabezado_detalles)
+
+    # 1. Ventas: normalizar, resolver el cliente y validar en una sola pasada
+    #    (crear la tabla con SELECT es mucho más barato que varios UPDATE sobre millones de filas)
+    try:
+        _crear_stg_venta()
+    except DataError:
+        db.session.rollback()
+        raise ErrorImportacion('Hay una fecha que no existe en el calendario (ej: 2024-02-30).')
+    db.session.execute(text('CREATE INDEX ON stg_venta (referencia)'))
+    db.session.execute(text('ANALYZE stg_venta'))  # autovacuum no analiza tablas temporales
+
+    # 2. Líneas: resolver producto (por nombre o código) y venta, y validar
+    db.session.execute(text("""
+        CREATE TEMP TABLE stg_detalle ON COMMIT DROP AS
+        SELECT d.*, COALESCE(pn.id, pc.id) AS producto_id,
+               COALESCE(pn.precio_costo, pc.precio_costo) AS costo_actual,
+               COALESCE(pn.alicuota_iva, pc.alicuota_iva) AS alicuota_iva,
+               v.fila AS venta_fila,
+            CASE
+                WHEN d.referencia IS NULL THEN 'Falta la referencia.'
+                WHEN v.fila IS NULL THEN 'No hay una venta con esa referencia.'
+                WHEN d.producto IS NULL THEN 'Falta el producto.'
+                WHEN pn.id IS NULL AND pc.id IS NULL THEN 'No hay un producto con ese nombre o código.'
+                WHEN d.cantidad IS NULL OR d.cantidad !~ :entero OR CAST(d.cantidad AS integer) <= 0
+                    THEN 'Cantidad inválida.'
+                WHEN d.precio_unitario IS NULL OR d.precio_unitario !~ :importe
+                     OR CAST(d.precio_unitario AS numeric) <= 0 THEN 'Precio unitario inválido.'
+                WHEN d.precio_costo_unitario IS NOT NULL AND (d.precio_costo_unitario !~ :importe
+                     OR CAST(d.precio_costo_unitario AS numeric) < 0) THEN 'Precio de costo inválido.'
+            END AS error
+        FROM (
+            SELECT fila,
+                   NULLIF(btrim(referencia), '') AS referencia,
+                   NULLIF(btrim(producto), '') AS producto,
+                   NULLIF(btrim(cantidad), '') AS cantidad,
+                   replace(NULLIF(btrim(precio_unitario), ''), ',', '.') AS precio_unitario,
+                   replace(NULLIF(btrim(precio_costo_unitario), ''), ',', '.') AS precio_costo_unitario
+            FROM stg_detalle_csv
+        ) d
+        LEFT JOIN (SELECT referencia, min(fila) AS fila FROM stg_venta GROUP BY referencia) v
+            ON v.referencia = d.referencia
+        LEFT JOIN producto pn ON pn.nombre = d.producto
+        LEFT JOIN codigo_producto cp ON pn.id IS NULL AND cp.codigo = d.producto
+        LEFT JOIN producto pc ON pc.id = cp.producto_id
+    """), {'entero': REGEX_ENTERO, 'importe': REGEX_IMPORTE})
+    db.session.execute(text('CREATE INDEX ON stg_detalle (venta_fila)'))
+    db.session.execute(text('ANALYZE stg_detalle'))
+
+    # 3. Una venta se importa entera o no se importa (solo se tocan las filas con error)
+    db.session.execute(text("""
+        UPDATE stg_venta v SET error = 'Tiene líneas con errores (ver el archivo de detalles).'
+        WHERE v.error IS NULL
+          AND EXISTS (SELECT 1 FROM stg_detalle d WHERE d.venta_fila = v.fila AND d.error IS NOT NULL)
+    """))
+    db.session.execute(text("""
+        UPDATE stg_venta v SET error = 'La venta no tiene líneas.'
+        WHERE v.error IS NULL AND NOT EXISTS (SELECT 1 FROM stg_detalle d WHERE d.venta_fila = v.fila)
+    """))
+    db.session.execute(text("""
+        UPDATE stg_detalle d SET error = 'La venta tiene errores (ver el archivo de ventas).'
+        FROM stg_venta v
+        WHERE d.venta_fila = v.fila AND d.error IS NULL AND v.error IS NOT NULL
+    """))
+
+    totales = db.session.execute(text("""
+        SELECT (SELECT count(*) FROM stg_venta) AS ventas,
+               (SELECT count(*) FROM stg_venta WHERE error IS NOT NULL) AS ventas_con_errores,
+               (SELECT count(*) FROM stg_detalle) AS lineas,
+               (SELECT count(*) FROM stg_detalle WHERE error IS NOT NULL) AS lineas_con_errores
+    """)).one()
+    errores = db.session.execute(text("""
+        (SELECT 'ventas' AS archivo, fila, referencia, error FROM stg_venta
+         WHERE error IS NOT NULL ORDER BY fila LIMIT :limite)
+        UNION ALL
+        (SELECT 'detalles', fila, referencia, error FROM stg_detalle
+         WHERE error IS NOT NULL AND error NOT LIKE 'La venta tiene errores%' ORDER BY fila LIMIT :limite)
+    """), {'limite': MAX_ERRORES_MOSTRADOS}).all()
+
+    resultado = {
+        'total_ventas': totales.ventas,
+        'total_lineas': totales.lineas,
+        'ventas_con_errores': totales.ventas_con_errores,
+        'lineas_con_errores': totales.lineas_con_errores,
+        'importadas': 0,
+        'lineas_importadas': 0,
+        'errores': errores
+    }
+    if solo_validar:
+        db.session.rollback()
+        return resultado
+
+    # 4. Ids de venta tomados de la secuencia de antemano: las líneas se insertan
+    #    con un INSERT ... SELECT, sin tener que leer los ids generados
+    db.session.execute(text("""
+        UPDATE stg_venta SET venta_id = nextval(pg_get_serial_sequence('venta', 'id'))
+        WHERE error IS NULL
+    """))
+    # Mismo redondeo que impuestos.liquidar: round() de PostgreSQL redondea la mitad para arriba
+    db.session.execute(text(f"""
+        CREATE TEMP TABLE stg_linea ON COMMIT DROP AS
+        SELECT v.venta_id, v.estado, d.fila, d.producto_id, d.alicuota_iva, t.cantidad, t.precio, t.costo, t.linea,
+               n.neto, CASE WHEN alicuota.gravada THEN t.linea - n.neto ELSE 0 END AS iva
+        FROM stg_detalle d
+        JOIN stg_venta v ON v.fila = d.venta_fila AND v.error IS NULL
+        JOIN {SQL_ALICUOTAS} ON alicuota.codigo = d.alicuota_iva
+        CROSS JOIN LATERAL (
+            SELECT CAST(d.cantidad AS integer) AS cantidad,
+                   CAST(d.precio_unitario AS numeric(10, 2)) AS precio,
+                   COALESCE(CAST(d.precio_costo_unitario AS numeric(10, 2)), d.costo_actual) AS costo,
+                   CAST(d.cantidad AS integer) * CAST(d.precio_unitario AS numeric(10, 2)) AS linea
+        ) t
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN alicuota.gravada THEN round(t.linea / alicuota.divisor, 2) ELSE 0 END AS neto
+        ) n
+    """))
+
+    # 5. Ventas con los totales de sus líneas, y después las líneas (en orden de venta)
+    importadas = db.session.execute(text("""
+        INSERT INTO venta (
+            id, fecha, total, ganancia_bruta_total, total_neto_gravado, total_monto_iva,
+            estado, metodo_pago, user_id, cliente_id, referencia_externa
+        )
+        SELECT v.venta_id, CAST(v.fecha AS timestamptz), l.total, l.ganancia, l.neto, l.iva,
+               v.estado, v.metodo_pago, :user_id, v.cliente_id, v.referencia
+        FROM stg_venta v
+        JOIN (
+            SELECT venta_id, sum(linea) AS total, sum(linea - costo * cantidad) AS ganancia,
+                   sum(neto) AS neto, sum(iva) AS iva
+            FROM stg_linea GROUP BY venta_id
+        ) l ON l.venta_id = v.venta_id
+        ORDER BY v.venta_id
+    """), {'user_id': user_id}).rowcount
+    lineas = db.session.execute(text("""
+        INSERT INTO detalle_venta (
+            venta_id, producto_id, cantidad, precio_unitario, precio_costo_unitario, neto_gravado, monto_iva,
+            alicuota_iva
+        )
+        SELECT venta_id, producto_id, cantidad, precio, costo, neto, iva, alicuota_iva
+        FROM stg_linea
+        ORDER BY venta_id, fila
+    """)).rowcount
+    tablas = ['venta', 'detalle_venta']
+
+    # 6. Stock (opcional): un movimiento por producto con lo vendido en las ventas completadas,
+    #    con los productos bloqueados en orden de id como en el resto de las escrituras de stock
+    if descontar_stock:
+        db.session.execute(text("""
+            CREATE TEMP TABLE stg_vendido ON COMMIT DROP AS
+            SELECT producto_id, sum(cantidad) AS cantidad FROM stg_linea
+            WHERE estado = 'completada' GROUP BY producto_id
+        """))
+        db.session.execute(text("""
+            SELECT p.id FROM producto p JOIN stg_vendido s ON s.producto_id = p.id
+            ORDER BY p.id FOR UPDATE OF p
+        """))
+        db.session.execute(text("""
+            UPDATE producto p SET stock = p.stock - s.cantidad
+            FROM stg_vendido s WHERE p.id = s.producto_id
+        """))
+        db.session.execute(text("""
+            INSERT INTO movimiento_stock (cantidad, tipo, producto_id, user_id)
+            SELECT -cantidad, :tipo, producto_id, :user_id FROM stg_vendido ORDER BY producto_id
+        """), {'tipo': TIPO_MOV_IMPORTACION_VENTAS, 'user_id': user_id})
+        tablas += ['producto', 'movimiento_stock']
+
+    marcar(db.session, *tablas)  # los INSERT con text() no los ve el ORM
+    db.session.commit()
+
+    # 7. Estadísticas al día para el planificador: la carga puede duplicar las tablas
+    timeout_largo()  # el commit anterior lo volvió al de los requests
+    db.session.execute(text('ANALYZE venta, detalle_venta'))
+    db.session.commit()
+
+    resultado['importadas'] = importadas
+    resultado['lineas_importadas'] = lineas
+    return resultado
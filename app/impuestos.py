@@ -0,0 +1,100 @@
+"""
+IVA de las ventas: las alícuotas y el redondeo en un solo lugar.
+
+Los precios de venta incluyen IVA. Cada producto tiene su categoría
+(Producto.alicuota_iva: '21', '10.5', '27' o 'exento') y cada línea se
+liquida así:
+
+    neto = precio de la línea / (1 + alícuota), al centavo (mitad para arriba)
+    IVA  = precio de la línea - neto
+
+Así neto + IVA da siempre lo cobrado, y los totales de la venta (y del
+comprobante fiscal) son la suma de sus líneas. Las líneas exentas no tienen
+neto gravado ni IVA: quedan en el total como importe exento.
+
+Lo usan nueva_venta y el POS (liquidar), la importación de ventas (la misma
+cuenta en SQL con SQL_ALICUOTAS) y el Libro IVA (códigos de AFIP). Las tasas
+y divisores se arman una sola vez al importar el módulo, como Decimal exactos.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+
+CENTAVO = Decimal('0.01')
+CERO = Decimal('0.00')
+
+
+class Alicuota(NamedTuple):
+    codigo: str
+    nombre: str
+    tasa: Decimal
+    divisor: Decimal     # 1 + tasa
+    codigo_afip: int
+
+
+class Linea(NamedTuple):
+    neto: Decimal
+    iva: Decimal
+
+
+class Liquidacion(NamedTuple):
+    lineas: list         # Linea de cada línea, en el orden recibido
+    total: Decimal
+    neto: Decimal        # neto gravado
+    iva: Decimal
+    exento: Decimal
+    por_alicuota: dict   # {código: Linea con la suma de neto e IVA}
+
+
+def _alicuota(codigo, nombre, tasa, codigo_afip):
+    tasa = Decimal(tasa)
+    return Alicuota(codigo, nombre, tasa, 1 + tasa, codigo_afip)
+
+
+GENERAL = '21'
+EXENTO = 'exento'
+ALICUOTAS = {a.codigo: a for a in (
+    _alicuota('21', '21 %', '0.21', 5),
+    _alicuota('10.5', '10,5 %', '0.105', 4),
+    _alicuota('27', '27 %', '0.27', 6),
+    _alicuota(EXENTO, 'Exento', '0', 2),
+)}
+
+# Las mismas alícuotas como tabla para los INSERT ... SELECT (ej: importación de ventas)
+SQL_ALICUOTAS = '(VALUES {}) AS alicuota(codigo, divisor, gravada)'.format(', '.join(
+    f"('{a.codigo}', {a.divisor}, {'true' if a.tasa else 'false'})" for a in ALICUOTAS.values()
+))
+
+
+def alicuota(codigo):
+    """Alicuota de un código (ValueError si no existe)."""
+    try:
+        return ALICUOTAS[codigo]
+    except KeyError:
+        raise ValueError(f'Alícuota de IVA desconocida: {codigo}')
+
+
+def desglosar(importe, codigo=GENERAL):
+    """Neto gravado e IVA de un importe con IVA incluido."""
+    a = alicuota(codigo)
+    if not a.tasa:
+        return Linea(CERO, CERO)
+    neto = (importe / a.divisor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    return Linea(neto, importe - neto)
+
+
+def liquidar(lineas):
+    """
+    Liquida un carrito entero: lineas = [(importe con IVA, código de alícuota), ...].
+    Cada línea se redondea por separado y los totales son la suma de las líneas.
+    """
+    resultado, por_alicuota = [], {}
+    total = neto = iva = CERO
+    for importe, codigo in lineas:
+        linea = desglosar(importe, codigo)
+        resultado.append(linea)
+        total += importe
+        neto += linea.neto
+        iva += linea.iva
+        suma = por_alicuota.get(codigo, Linea(CERO, CERO))
+        por_alicuota[codigo] = Linea(suma.neto + linea.neto, suma.iva + linea.iva)
+    return Liquidacion(resultado, total, neto, iva, total - neto - iva, por_alicuota)
@@ -0,0 +1,461 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import func, select, insert, update, literal, text
+import click
+import csv
+import datetime
+import decimal
+import os
+import uuid
+
+from .models import db, Producto, MovimientoStock, CorteStock, SnapshotStock, User, Trabajo
+from .decorators import admin_required
+from .respuestas import condicional
+from .importacion import importar_productos_csv, ErrorImportacion, MAX_ERRORES_MOSTRADOS
+from .precios import precios_al
+from .trabajos import tarea, encolar, directorio_trabajos, timeout_largo, ErrorDefinitivo
+
+inventario_bp = Blueprint('inventario', __name__)
+
+TIPO_AJUSTE_CONCILIACION = 'Ajuste Conciliación'
+
+
+# --- Funciones Helper ---
+def tomar_corte_stock(user_id=None):
+    """
+    Guarda el stock actual de todos los productos en un nuevo CorteStock.
+    La tabla de movimientos se bloquea en modo SHARE mientras dura la foto,
+    así ninguna venta en curso queda a medias entre el stock y su movimiento.
+    """
+    db.session.execute(text('LOCK TABLE movimiento_stock IN SHARE MODE'))
+    ultimo_id = db.session.query(func.coalesce(func.max(MovimientoStock.id), 0)).scalar()
+
+    corte = CorteStock(ultimo_movimiento_id=ultimo_id, user_id=user_id)
+    db.session.add(corte)
+    db.session.flush()
+
+    # Un solo INSERT ... SELECT para todo el catálogo
+    db.session.execute(
+        insert(SnapshotStock).from_select(
+            ['corte_id', 'producto_id', 'stock'],
+            select(literal(corte.id), Producto.id, Producto.stock)
+        )
+    )
+    db.session.commit()
+    return corte
+
+
+def get_ultimo_corte():
+    """Devuelve el CorteStock más reciente (o None)."""
+    return CorteStock.query.order_by(CorteStock.ultimo_movimiento_id.desc()).first()
+
+
+def consulta_stock_libro(corte=None):
+    """
+    Arma la consulta (producto_id, nombre, stock, stock_libro) para todo el catálogo.
+    stock_libro = stock del corte + suma de movimientos posteriores al corte.
+    Solo se recorren los movimientos nuevos (id > marca de agua), no toda la historia.
+    """
+    corte_id = corte.id if corte else 0
+    ultimo_mov_id = corte.ultimo_movimiento_id if corte else 0
+
+    base = select(
+        SnapshotStock.producto_id, SnapshotStock.stock
+    ).where(
+        SnapshotStock.corte_id == corte_id
+    ).subquery()
+
+    delta = select(
+        MovimientoStock.producto_id,
+        func.sum(MovimientoStock.cantidad).label('delta')
+    ).where(
+        MovimientoStock.id > ultimo_mov_id
+    ).group_by(
+        MovimientoStock.producto_id
+    ).subquery()
+
+    stock_libro = func.coalesce(base.c.stock, 0) + func.coalesce(delta.c.delta, 0)
+
+    return select(
+        Producto.id.label('producto_id'),
+        Producto.nombre,
+        Producto.stock,
+        stock_libro.label('stock_libro')
+    ).outerjoin(
+        base, base.c.producto_id == Producto.id
+    ).outerjoin(
+        delta, delta.c.producto_id == Producto.id
+    )
+
+
+def conciliar_stock(corregir=False, fuente='stock', user_id=None):
+    """
+    Compara Producto.stock con el stock según el libro de movimientos.
+    Devuelve la lista de diferencias. Si corregir=True:
+      - fuente='stock': registra un MovimientoStock compensatorio (el stock físico manda).
+      - fuente='libro': pisa Producto.stock con el valor del libro.
+    En el worker y por CLI se llama después de timeout_largo(); en la página
+    vale el límite de los requests.
+    """
+    corte = get_ultimo_corte()
+    diferencias_q = consulta_stock_libro(corte).subquery()
+    diferencias_q = select(diferencias_q).where(
+        diferencias_q.c.stock != diferencias_q.c.stock_libro
+    ).subquery()
+
+    diferencias = db.session.execute(
+        select(diferencias_q).order_by(diferencias_q.c.nombre)
+    ).all()
+
+    if corregir and diferencias:
+        if fuente == 'libro':
+            db.session.execute(
+                update(Producto).where(
+                    Producto.id == diferencias_q.c.producto_id
+                ).values(stock=diferencias_q.c.stock_libro)
+            )
+        else:
+            if user_id is None:
+                raise ValueError('Se requiere un usuario para registrar los ajustes.')
+            db.session.execute(
+                insert(MovimientoStock).from_select(
+                    ['producto_id', 'cantidad', 'tipo', 'user_id'],
+                    select(
+                        diferencias_q.c.producto_id,
+                        diferencias_q.c.stock - diferencias_q.c.stock_libro,
+                        literal(TIPO_AJUSTE_CONCILIACION),
+                        literal(user_id)
+                    )
+                )
+            )
+        db.session.commit()
+
+    return corte, diferencias
+
+
+# --- Trabajos en segundo plano (ver trabajos.py) ---
+@tarea('corte_stock', api=True)
+def _tarea_corte_stock(trabajo):
+    corte = tomar_corte_stock(user_id=trabajo.user_id)
+    return {'corte_id': corte.id, 'ultimo_movimiento_id': corte.ultimo_movimiento_id}
+
+
+@tarea('conciliar_stock', api=True)
+def _tarea_conciliar_stock(trabajo, fuente='stock'):
+    if fuente not in ('stock', 'libro'):
+        raise ErrorDefinitivo(f'Fuente inválida: {fuente}')
+    trabajo.avance(10, 'Comparando el stock con el libro de movimientos.')
+    timeout_largo()
+    _, diferencias = conciliar_stock(corregir=True, fuente=fuente, user_id=trabajo.user_id)
+    return {'corregidos': len(diferencias)}
+
+
+@tarea('importar_productos')
+def _tarea_importar_productos(trabajo, archivo, solo_validar=False):
+    ruta = os.path.join(directorio_trabajos(), os.path.basename(archivo))
+    trabajo.avance(10, 'Leyendo y validando el archivo.')
+    try:
+        with open(ruta, 'rb') as f:
+            resultado = importar_productos_csv(f, trabajo.user_id, solo_validar=solo_validar)
+    except ErrorImportacion as e:
+        os.remove(ruta)
+        raise ErrorDefinitivo(str(e))
+    os.remove(ruta)
+    resultado['errores'] = [dict(e._mapping) for e in resultado['errores']]
+    return resultado
+
+
+def parse_fecha_hora(valor):
+    """
+    Convierte 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM' en un datetime con zona horaria.
+    Una fecha sola se toma como el cierre de ese día (23:59:59.999999).
+    """
+    fecha = datetime.datetime.fromisoformat(valor)
+    if len(valor) <= 10:
+        fecha = datetime.datetime.combine(fecha.date(), datetime.time.max)
+    if fecha.tzinfo is None:
+        fecha = fecha.astimezone()  # Hora local del servidor
+    return fecha
+
+
+def consulta_stock_al(fecha, producto_id=None):
+    """
+    Arma la consulta (producto_id, nombre, precio_costo, stock) con el stock a una fecha.
+    Parte del punto conocido más cercano (un corte anterior, uno posterior o el
+    stock actual) y solo recorre los movimientos entre ese punto y la fecha.
+    Devuelve (consulta, corte_usado) — corte_usado es None si se partió del stock actual.
+    """
+    ahora = datetime.datetime.now(datetime.timezone.utc)
+    antes = CorteStock.query.filter(CorteStock.fecha <= fecha).order_by(CorteStock.fecha.desc()).first()
+    despues = CorteStock.query.filter(CorteStock.fecha > fecha).order_by(CorteStock.fecha.asc()).first()
+
+    # (distancia en el tiempo, corte, ¿se avanza hacia adelante?)
+    candidatos = [(max(ahora - fecha, datetime.timedelta(0)), None, False)]
+    if antes:
+        candidatos.append((fecha - antes.fecha, antes, True))
+    if despues:
+        candidatos.append((despues.fecha - fecha, despues, False))
+    _, corte, hacia_adelante = min(candidatos, key=lambda c: c[0])
+
+    delta = select(
+        MovimientoStock.producto_id,
+        func.sum(MovimientoStock.cantidad).label('delta')
+    )
+    if producto_id:
+        delta = delta.where(MovimientoStock.producto_id == producto_id)
+
+    if corte is None:
+        # Desde el stock actual hacia atrás: se deshacen los movimientos posteriores
+        delta = delta.where(MovimientoStock.fecha > fecha)
+        stock_base = Producto.stock
+    elif hacia_adelante:
+        delta = delta.where(
+            MovimientoStock.id > corte.ultimo_movimiento_id,
+            MovimientoStock.fecha <= fecha
+        )
+    else:
+        delta = delta.where(
+            MovimientoStock.id <= corte.ultimo_movimiento_id,
+            MovimientoStock.fecha > fecha
+        )
+    delta = delta.group_by(MovimientoStock.producto_id).subquery()
+
+    # Costo vigente a esa fecha (según el historial de precios)
+    precios = precios_al(fecha)
+
+    signo = 1 if hacia_adelante else -1
+    consulta = select(
+        Producto.id.label('producto_id'),
+        Producto.nombre,
+        precios.c.precio_costo
+    ).join(
+        precios, precios.c.producto_id == Producto.id
+    ).outerjoin(
+        delta, delta.c.producto_id == Producto.id
+    )
+
+    if corte is not None:
+        base = select(
+            SnapshotStock.producto_id, SnapshotStock.stock
+        ).where(
+            SnapshotStock.corte_id == corte.id
+        ).subquery()
+        consulta = consulta.outerjoin(base, base.c.producto_id == Producto.id)
+        stock_base = func.coalesce(base.c.stock, 0)
+
+    consulta = consulta.add_columns(
+        (stock_base + signo * func.coalesce(delta.c.delta, 0)).label('stock')
+    )
+    if producto_id:
+        consulta = consulta.where(Producto.id == producto_id)
+
+    return consulta.order_by(Producto.nombre), corte
+
+
+def stock_al(fecha, producto_id=None):
+    """Devuelve (filas, valor_total, corte_usado) con el stock y su valuación al costo de esa fecha."""
+    consulta, corte = consulta_stock_al(fecha, producto_id)
+    filas = []
+    valor_total = decimal.Decimal(0)
+    for fila in db.session.execute(consulta):
+        valor = fila.precio_costo * fila.stock if fila.stock > 0 else decimal.Decimal(0)
+        valor_total += valor
+        filas.append({
+            'producto_id': fila.producto_id,
+            'nombre': fila.nombre,
+            'stock': fila.stock,
+            'precio_costo': fila.precio_costo,
+            'valor': valor
+        })
+    return filas, valor_total, corte
+
+
+# -----------------------------------------------
+# RUTA: CONCILIACIÓN DE STOCK
+# -----------------------------------------------
+@inventario_bp.route('/inventario/conciliacion', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def conciliacion_stock():
+    """Muestra las diferencias entre el stock y el libro de movimientos."""
+
+    if request.method == 'POST':
+        accion = request.form.get('accion')
+        try:
+            # Corte y corrección corren en el worker: la página responde enseguida
+            if accion == 'corte':
+                trabajo = encolar('corte_stock', user_id=current_user.id)
+                db.session.commit()
+                flash(f'Corte de stock encolado (trabajo #{trabajo.id}).', 'info')
+            elif accion == 'corregir':
+                fuente = request.form.get('fuente', 'stock')
+                trabajo = encolar('conciliar_stock', {'fuente': fuente}, user_id=current_user.id)
+                db.session.commit()
+                flash(f'Corrección de diferencias encolada (trabajo #{trabajo.id}).', 'info')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error en la conciliación: {str(e)}', 'danger')
+        return redirect(url_for('inventario.conciliacion_stock'))
+
+    corte, diferencias = conciliar_stock()
+    return render_template('conciliacion_stock.html', corte=corte, diferencias=diferencias)
+
+
+# -----------------------------------------------
+# RUTA: STOCK A UNA FECHA (Reporte)
+# -----------------------------------------------
+@inventario_bp.route('/reportes/inventario/stock_al')
+@login_required
+@admin_required
+@condicional('movimiento_stock', 'corte_stock', 'producto', 'user')
+def reporte_stock_al():
+    """Muestra el stock y la valuación al costo de todo el catálogo a una fecha."""
+    fecha_str = request.args.get('fecha', '', type=str)
+    filas, valor_total, corte = [], decimal.Decimal(0), None
+
+    if fecha_str:
+        try:
+            filas, valor_total, corte = stock_al(parse_fecha_hora(fecha_str))
+        except ValueError:
+            flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'danger')
+
+    return render_template(
+        'stock_al.html',
+        filas=filas,
+        valor_total=valor_total,
+        corte=corte,
+        fecha_filtro=fecha_str
+    )
+
+
+# -----------------------------------------------
+# RUTA: API - STOCK A UNA FECHA
+# -----------------------------------------------
+@inventario_bp.route('/api/reporte/stock_al')
+@login_required
+@admin_required
+@condicional('movimiento_stock', 'corte_stock', 'producto')
+def api_stock_al():
+    """Devuelve el stock (de un producto o de todo el catálogo) a una fecha."""
+    fecha_str = request.args.get('fecha', '', type=str)
+    producto_id = request.args.get('producto_id', None, type=int)
+    try:
+        fecha = parse_fecha_hora(fecha_str)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida. Use AAAA-MM-DD o AAAA-MM-DDTHH:MM.'}), 400
+
+    filas, valor_total, corte = stock_al(fecha, producto_id)
+    return jsonify(
+        fecha=fecha.isoformat(),
+        corte_id=corte.id if corte else None,
+        productos=[{
+            'producto_id': f['producto_id'],
+            'nombre': f['nombre'],
+            'stock': f['stock'],
+            'precio_costo': float(f['precio_costo']),
+            'valor': float(f['valor'])
+        } for f in filas],
+        valor_total=float(valor_total)
+    )
+
+
+# -----------------------------------------------
+# RUTA: IMPORTACIÓN MASIVA DE PRODUCTOS (CSV)
+# -----------------------------------------------
+@inventario_bp.route('/productos/importar', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def importar_productos():
+    """Crea o actualiza productos en lote desde un archivo CSV (lo procesa el worker)."""
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        solo_validar = bool(request.form.get('solo_validar'))
+        if not archivo or not archivo.filename:
+            flash('Debe seleccionar un archivo CSV.', 'danger')
+            return redirect(url_for('inventario.importar_productos'))
+        nombre = f'{uuid.uuid4().hex}.csv'
+        try:
+            archivo.save(os.path.join(directorio_trabajos(), nombre))
+            trabajo = encolar(
+                'importar_productos', {'archivo': nombre, 'solo_validar': solo_validar}, user_id=current_user.id
+            )
+            db.session.commit()
+            return redirect(url_for('inventario.importar_productos', trabajo=trabajo.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al encolar la importación: {str(e)}', 'danger')
+            return redirect(url_for('inventario.importar_productos'))
+
+    # Resultado de una importación encolada (la página se recarga hasta que termina)
+    trabajo = None
+    trabajo_id = request.args.get('trabajo', None, type=int)
+    if trabajo_id:
+        trabajo = Trabajo.query.filter_by(id=trabajo_id, tipo='importar_productos').first()
+
+    return render_template(
+        'importar_productos.html',
+        trabajo=trabajo,
+        resultado=trabajo.resultado if trabajo and trabajo.estado == 'terminado' else None,
+        max_errores=MAX_ERRORES_MOSTRADOS
+    )
+
+
+# -----------------------------------------------
+# COMANDOS CLI (ej: desde cron)
+# -----------------------------------------------
+def _buscar_usuario(username):
+    if not username:
+        return None
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No existe el usuario "{username}".')
+    return user.id
+
+
+@inventario_bp.cli.command('corte')
+@click.option('--usuario', help='Usuario que registra el corte.')
+def corte_command(usuario):
+    """Guarda un corte (snapshot) del stock de todo el catálogo."""
+    corte = tomar_corte_stock(user_id=_buscar_usuario(usuario))
+    click.echo(f'Corte #{corte.id} registrado (hasta movimiento #{corte.ultimo_movimiento_id}).')
+
+
+@inventario_bp.cli.command('conciliar')
+@click.option('--corregir', is_flag=True, help='Corrige las diferencias encontradas.')
+@click.option('--fuente', type=click.Choice(['stock', 'libro']), default='stock',
+              help='Qué valor se toma como correcto al corregir.')
+@click.option('--usuario', help='Usuario que registra los ajustes.')
+def conciliar_command(corregir, fuente, usuario):
+    """Compara Producto.stock contra el libro de movimientos."""
+    timeout_largo()
+    corte, diferencias = conciliar_stock(
+        corregir=corregir, fuente=fuente, user_id=_buscar_usuario(usuario)
+    )
+    if corte:
+        click.echo(f'Base: corte #{corte.id} ({corte.fecha:%d/%m/%Y %H:%M}).')
+    else:
+        click.echo('Sin cortes previos: se recorrió todo el libro de movimientos.')
+    for d in diferencias:
+        click.echo(f'  {d.nombre}: stock={d.stock} libro={d.stock_libro} diferencia={d.stock - d.stock_libro}')
+    click.echo(f'{len(diferencias)} productos con diferencias.' + (' Corregidos.' if corregir and diferencias else ''))
+
+
+@inventario_bp.cli.command('importar')
+@click.argument('archivo', type=click.File('rb'))
+@click.option('--usuario', required=True, help='Usuario que registra los movimientos de stock.')
+@click.option('--solo-validar', is_flag=True, help='Valida el archivo sin importar nada.')
+@click.option('--errores', type=click.File('w'), help='Guarda el detalle de errores en un CSV.')
+def importar_command(archivo, usuario, solo_validar, errores):
+    """Importa productos desde un CSV (nombre, descripcion, precio, precio_costo, stock, stock_minimo)."""
+    try:
+        resultado = importar_productos_csv(archivo, _buscar_usuario(usuario), solo_validar=solo_validar)
+    except ErrorImportacion as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f'Filas leídas: {resultado["total_filas"]}')
+    click.echo(f'Creados: {resultado["creados"]} - Actualizados: {resultado["actualizados"]}')
+    click.echo(f'Filas con errores: {len(resultado["errores"])}')
+    if errores:
+        writer = csv.writer(errores)
+        writer.writerow(['fila', 'nombre', 'error'])
+        writer.writerows(resultado['errores'])
@@ -1,15 +1,9 @@
 from flask import Blueprint, redirect, url_for, flash, render_template, request
 from flask_login import login_required, current_user
 from .models import db, Jornada, Venta, CierreMetodoPago # <-- Importar CierreMetodoPago
-<<<<<<< HEAD
-from sqlalchemy import func
-import datetime
-import decimal
-=======
 from sqlalchemy import func # <-- Importar func
 import datetime
 import decimal # <-- Importar decimal
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 
 jornadas_bp = Blueprint('jornadas', __name__)
 
@@ -17,13 +11,9 @@ jornadas_bp = Blueprint('jornadas', __name__)
 @jornadas_bp.route('/jornada/iniciar')
 @login_required
 def iniciar_jornada():
-<<<<<<< HEAD
-    jornada_existente = Jornada.query.filter_by(user_id=current_user.id, activa=True).first()
-=======
     """Inicia un nuevo turno (jornada) para el usuario."""
     jornada_existente = Jornada.query.filter_by(user_id=current_user.id, activa=True).first()
 
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     if jornada_existente:
         flash('Ya tienes una jornada activa.', 'warning')
     else:
@@ -31,10 +21,7 @@ def iniciar_jornada():
         db.session.add(nueva_jornada)
         db.session.commit()
         flash(f'Jornada iniciada a las {nueva_jornada.hora_inicio.strftime("%H:%M")}.', 'success')
-<<<<<<< HEAD
-=======
 
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     return redirect(url_for('main.index'))
 
 # -----------------------------------------------
@@ -43,11 +30,6 @@ def iniciar_jornada():
 @jornadas_bp.route('/jornada/finalizar', methods=['GET', 'POST'])
 @login_required
 def finalizar_jornada():
-<<<<<<< HEAD
-    """Muestra el formulario de Cierre de Caja (GET) o procesa el cierre (POST)."""
-
-    jornada_activa = Jornada.query.filter_by(user_id=current_user.id, activa=True).first()
-=======
     """
     Muestra el formulario de Cierre de Caja (GET)
     o procesa el cierre (POST).
@@ -56,17 +38,11 @@ def finalizar_jornada():
     # 1. Buscar la jornada activa del empleado
     jornada_activa = Jornada.query.filter_by(user_id=current_user.id, activa=True).first()
 
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     if not jornada_activa:
         flash('No tienes ninguna jornada activa para finalizar.', 'warning')
         return redirect(url_for('main.index'))
 
-<<<<<<< HEAD
-    # --- Lógica de GET: Calcular totales esperados por método ---
-    # Consultamos las ventas de la jornada, agrupadas por método de pago
-=======
     # 2. Calcular el efectivo esperado (solo ventas 'completadas')
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     totales_esperados_query = db.session.query(
         Venta.metodo_pago,
         func.sum(Venta.total).label('total_por_metodo')
@@ -77,19 +53,11 @@ def finalizar_jornada():
         Venta.metodo_pago
     ).all()
 
-<<<<<<< HEAD
-    # Convertimos la lista de tuplas en un diccionario más fácil de usar
-    # Ej: {'Efectivo': 150.00, 'Tarjeta Débito': 100.00}
-    totales_esperados = {row.metodo_pago: row.total_por_metodo for row in totales_esperados_query}
-
-    # --- Lógica de POST: Procesar el cierre ---
-=======
     # Convertimos la lista de tuplas en un diccionario
     # Ej: {'Efectivo': 150.00, 'Tarjeta Débito': 100.00}
     totales_esperados = {row.metodo_pago: row.total_por_metodo for row in totales_esperados_query}
 
     # 3. Lógica POST (Cuando el empleado envía el formulario)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     if request.method == 'POST':
         try:
             notas_cierre = request.form.get('notas_cierre')
@@ -98,18 +66,10 @@ def finalizar_jornada():
             # Iteramos sobre los métodos que el sistema esperaba
             for metodo, esperado in totales_esperados.items():
                 # El 'name' del input será, ej: "real_contado[Efectivo]"
-<<<<<<< HEAD
-                # Esto es más seguro que usar request.form.get('Efectivo')
-                monto_real_str = request.form.get(f'real_contado[{metodo}]')
-
-                if not monto_real_str:
-                    # Si el empleado no ingresó un monto (ej: para 'Tarjeta'), asumimos que es 0
-=======
                 monto_real_str = request.form.get(f'real_contado[{metodo}]')
 
                 if not monto_real_str:
                     # Si el empleado no ingresó un monto (ej: para 'Tarjeta'), asumimos 0
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
                     monto_real_contado = decimal.Decimal(0)
                 else:
                     monto_real_contado = decimal.Decimal(monto_real_str)
@@ -152,18 +112,10 @@ def finalizar_jornada():
             db.session.rollback()
             flash(f'Error al procesar el cierre: {str(e)}', 'danger')
 
-<<<<<<< HEAD
-    # --- Lógica de GET (continuación) ---
-    return render_template(
-        'finalizar_jornada.html', 
-        jornada=jornada_activa, 
-        totales_esperados=totales_esperados # Pasamos el diccionario
-=======
     # 4. Lógica GET (Solo mostrar el formulario)
     # Pasamos el diccionario de totales a la plantilla
     return render_template(
         'finalizar_jornada.html', 
         jornada=jornada_activa, 
         totales_esperados=totales_esperados
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     )
\ No newline at end of file
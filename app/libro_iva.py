@@ -0,0 +1,536 @@
+"""
+Libro IVA Ventas de un período (mes) armado con los importes guardados en
+cada venta (o en su comprobante fiscal aprobado, que es lo que se informó).
+
+- El reporte (por condición frente al IVA y tipo de comprobante, con
+  subtotales por día y total del mes) sale de una sola consulta con
+  GROUPING SETS.
+- El CSV y los archivos de importación de AFIP (RG 3685: VENTAS_CBTE de 266
+  caracteres y VENTAS_ALICUOTAS de 62, un renglón por alícuota de cada
+  comprobante según sus líneas, ver impuestos.py) se mandan a medida que se
+  leen las filas, sin armar el archivo en memoria. A AFIP solo van los
+  comprobantes con CAE.
+- Cerrar un mes copia sus renglones a renglon_libro_iva: desde ahí se sirve
+  el reporte y los archivos, y no se aceptan ventas importadas, sincronizadas
+  ni anulaciones con fecha en ese mes. Se puede reabrir (el admin que
+  corrige asume rehacer la presentación).
+
+    /admin/libro-iva?periodo=AAAA-MM
+    flask libro_iva cerrar AAAA-MM
+"""
+import csv
+import datetime
+import io
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+import click
+from flask import (
+    Blueprint, Response, abort, current_app, flash, redirect, render_template, request,
+    stream_with_context, url_for
+)
+from flask_login import current_user, login_required
+from sqlalchemy import bindparam, text
+
+from .models import db, PeriodoIva
+from .decorators import admin_required
+from .fiscal import FACTURA_C, TIPOS, POR_ENVIAR
+from .impuestos import ALICUOTAS, EXENTO
+from .respuestas import condicional
+from .versiones import marcar
+
+libro_iva_bp = Blueprint('libro_iva', __name__)
+
+SIN_COMPROBANTE = 0
+FILAS_POR_LECTURA = 2000
+COLUMNAS_CSV = [
+    'fecha', 'comprobante', 'punto_venta', 'numero', 'cae', 'condicion_iva', 'doc_tipo', 'doc_nro',
+    'cliente', 'neto_gravado', 'iva', 'total', 'venta_id'
+]
+
+
+class PeriodoCerrado(Exception):
+    """El mes ya está cerrado en el Libro IVA: no se pueden agregar ni anular ventas."""
+    pass
+
+
+# --- Período ---
+def periodo_de(texto):
+    """'AAAA-MM' -> primer día del mes (ValueError si no es válido)."""
+    return datetime.datetime.strptime(texto, '%Y-%m').date()
+
+
+def _zona():
+    return ZoneInfo(current_app.config['LIBRO_IVA_ZONA_HORARIA'])
+
+
+def _limites(periodo):
+    """[desde, hasta) del mes en la hora local del negocio."""
+    siguiente = (periodo.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    zona = _zona()
+    return (datetime.datetime.combine(periodo, datetime.time(), tzinfo=zona),
+            datetime.datetime.combine(siguiente, datetime.time(), tzinfo=zona))
+
+
+def periodo_cerrado(fecha):
+    """PeriodoIva cerrado que contiene ese momento (o None)."""
+    mes = fecha.astimezone(_zona()).date().replace(day=1)
+    return PeriodoIva.query.filter_by(periodo=mes).first()
+
+
+def ventas_en_periodo_cerrado(venta_ids):
+    """Ids (de entre los dados) de ventas con fecha en un mes cerrado."""
+    return db.session.execute(text("""
+        SELECT v.id FROM venta v
+        JOIN periodo_iva p ON p.periodo = date_trunc('month', timezone(:zona, v.fecha))::date
+        WHERE v.id = ANY(:ids)
+        ORDER BY v.id
+    """), {'zona': current_app.config['LIBRO_IVA_ZONA_HORARIA'], 'ids': list(venta_ids)}).scalars().all()
+
+
+# --- Renglones del libro (uno por venta) ---
+# La fecha es la de la venta: el comprobante se emite el mismo día (ver fiscal.encolar_factura)
+SQL_RENGLONES_ABIERTO = """
+    SELECT v.id AS venta_id,
+           timezone(:zona, v.fecha)::date AS fecha,
+           COALESCE(c.condicion_iva, 'Consumidor Final') AS condicion_iva,
+           COALESCE(cf.tipo_comprobante, 0) AS tipo_comprobante,
+           cf.punto_venta, cf.numero, cf.cae,
+           COALESCE(cf.doc_tipo, 99) AS doc_tipo, COALESCE(cf.doc_nro, 0) AS doc_nro,
+           COALESCE(c.nombre, 'Consumidor Final') AS cliente,
+           COALESCE(cf.importe_neto, v.total_neto_gravado) AS neto,
+           COALESCE(cf.importe_iva, v.total_monto_iva) AS iva,
+           v.total
+    FROM venta v
+    LEFT JOIN cliente c ON c.id = v.cliente_id
+    LEFT JOIN comprobante_fiscal cf ON cf.venta_id = v.id AND cf.estado = 'aprobado'
+    WHERE v.estado = 'completada' AND v.fecha >= :desde AND v.fecha < :hasta
+"""
+SQL_RENGLONES_CERRADO = """
+    SELECT venta_id, fecha, condicion_iva, tipo_comprobante, punto_venta, numero, cae,
+           doc_tipo, doc_nro, cliente, neto, iva, total
+    FROM renglon_libro_iva
+    WHERE periodo_id = :periodo_id
+"""
+COLUMNAS_RENGLON = (
+    'venta_id, fecha, condicion_iva, tipo_comprobante, punto_venta, numero, cae, '
+    'doc_tipo, doc_nro, cliente, neto, iva, total'
+)
+
+# Detalle (día, condición, tipo), subtotal del día, total por (condición, tipo) y total del mes
+SQL_RESUMEN = """
+    WITH r AS ({renglones})
+    SELECT fecha, condicion_iva, tipo_comprobante, count(*) AS cantidad,
+           COALESCE(sum(neto), 0) AS neto, COALESCE(sum(iva), 0) AS iva, COALESCE(sum(total), 0) AS total,
+           GROUPING(fecha, condicion_iva, tipo_comprobante) AS nivel
+    FROM r
+    GROUP BY GROUPING SETS (
+        (fecha, condicion_iva, tipo_comprobante), (fecha), (condicion_iva, tipo_comprobante), ()
+    )
+    ORDER BY fecha, nivel, condicion_iva, tipo_comprobante
+"""
+NIVEL_DETALLE, NIVEL_DIA, NIVEL_GRUPO = 0, 3, 4
+
+# Neto e IVA por alícuota, de las líneas de cada venta (la factura C no discrimina IVA)
+SQL_RESUMEN_ALICUOTAS = """
+    WITH r AS ({renglones})
+    SELECT d.alicuota_iva, count(DISTINCT d.venta_id) AS cantidad,
+           sum(d.neto_gravado) AS neto, sum(d.monto_iva) AS iva, sum(d.cantidad * d.precio_unitario) AS total
+    FROM r
+    JOIN detalle_venta d ON d.venta_id = r.venta_id
+    WHERE r.tipo_comprobante <> :factura_c
+    GROUP BY d.alicuota_iva
+    ORDER BY d.alicuota_iva
+"""
+
+# Archivos de AFIP: solo comprobantes con CAE; las líneas exentas van en el importe exento, no como alícuota
+SQL_AFIP_CBTE = """
+    WITH r AS ({renglones})
+    SELECT r.*, COALESCE(a.cantidad, 0) AS alicuotas
+    FROM r
+    LEFT JOIN (
+        SELECT d.venta_id, count(DISTINCT d.alicuota_iva) AS cantidad
+        FROM detalle_venta d
+        JOIN r ON r.venta_id = d.venta_id
+        WHERE d.alicuota_iva <> :exento
+        GROUP BY d.venta_id
+    ) a ON a.venta_id = r.venta_id
+    WHERE r.tipo_comprobante <> 0
+    ORDER BY r.fecha, r.tipo_comprobante, r.punto_venta, r.numero, r.venta_id
+"""
+SQL_AFIP_ALICUOTAS = """
+    WITH r AS ({renglones})
+    SELECT r.tipo_comprobante, r.punto_venta, r.numero, d.alicuota_iva,
+           sum(d.neto_gravado) AS neto, sum(d.monto_iva) AS iva
+    FROM r
+    JOIN detalle_venta d ON d.venta_id = r.venta_id
+    WHERE r.tipo_comprobante NOT IN (0, :factura_c) AND d.alicuota_iva <> :exento
+    GROUP BY r.fecha, r.tipo_comprobante, r.punto_venta, r.numero, r.venta_id, d.alicuota_iva
+    ORDER BY r.fecha, r.tipo_comprobante, r.punto_venta, r.numero, r.venta_id, d.alicuota_iva
+"""
+
+# Lo que impide (o conviene revisar antes de) cerrar un mes abierto
+SQL_AVISOS = text("""
+    SELECT count(*) FILTER (WHERE cf.estado IN :por_enviar) AS pendientes,
+           count(*) FILTER (WHERE cf.estado = 'rechazado' AND v.estado = 'completada') AS rechazados,
+           count(*) FILTER (WHERE cf.estado = 'aprobado' AND v.estado = 'anulada') AS anuladas_con_cae
+    FROM comprobante_fiscal cf
+    JOIN venta v ON v.id = cf.venta_id
+    WHERE v.fecha >= :desde AND v.fecha < :hasta
+""").bindparams(bindparam('por_enviar', expanding=True))
+
+
+def _renglones(periodo, cerrado=None):
+    """(SQL, parámetros) de los renglones del mes: la copia si está cerrado, las ventas si no."""
+    if cerrado is not None:
+        return SQL_RENGLONES_CERRADO, {'periodo_id': cerrado.id}
+    desde, hasta = _limites(periodo)
+    return SQL_RENGLONES_ABIERTO, {
+        'zona': current_app.config['LIBRO_IVA_ZONA_HORARIA'], 'desde': desde, 'hasta': hasta
+    }
+
+
+def nombre_tipo(tipo):
+    return TIPOS.get(tipo, 'Sin comprobante' if tipo == SIN_COMPROBANTE else str(tipo))
+
+
+def resumen(periodo):
+    """Reporte del mes: totales por condición y tipo, días con su detalle y subtotal, y total."""
+    cerrado = PeriodoIva.query.filter_by(periodo=periodo).first()
+    sql, parametros = _renglones(periodo, cerrado)
+    dias, grupos, total = [], [], None
+    for f in db.session.execute(text(SQL_RESUMEN.format(renglones=sql)), parametros):
+        fila = {'cantidad': f.cantidad, 'neto': f.neto, 'iva': f.iva, 'total': f.total}
+        if f.nivel == NIVEL_DETALLE:
+            if not dias or dias[-1]['fecha'] != f.fecha:
+                dias.append({'fecha': f.fecha, 'renglones': [], 'subtotal': None})
+            dias[-1]['renglones'].append(dict(
+                fila, condicion_iva=f.condicion_iva, comprobante=nombre_tipo(f.tipo_comprobante)
+            ))
+        elif f.nivel == NIVEL_DIA:
+            dias[-1]['subtotal'] = fila
+        elif f.nivel == NIVEL_GRUPO:
+            grupos.append(dict(fila, condicion_iva=f.condicion_iva, comprobante=nombre_tipo(f.tipo_comprobante)))
+        else:
+            total = fila
+
+    alicuotas = [
+        dict(f._asdict(), nombre=ALICUOTAS[f.alicuota_iva].nombre if f.alicuota_iva in ALICUOTAS else f.alicuota_iva)
+        for f in db.session.execute(
+            text(SQL_RESUMEN_ALICUOTAS.format(renglones=sql)), dict(parametros, factura_c=FACTURA_C)
+        )
+    ]
+
+    avisos = None
+    if cerrado is None:
+        desde, hasta = _limites(periodo)
+        avisos = db.session.execute(
+            SQL_AVISOS, {'por_enviar': list(POR_ENVIAR), 'desde': desde, 'hasta': hasta}
+        ).one()._asdict()
+    return {
+        'periodo': periodo, 'cerrado': cerrado, 'dias': dias, 'grupos': grupos, 'alicuotas': alicuotas,
+        'total': total, 'avisos': avisos
+    }
+
+
+def _leer(sql, periodo, **extra):
+    """Corre sql (con {renglones}) sobre el mes con un cursor del servidor: no trae todas las filas juntas."""
+    cerrado = PeriodoIva.query.filter_by(periodo=periodo).first()
+    renglones_sql, parametros = _renglones(periodo, cerrado)
+    return db.session.execute(
+        text(sql.format(renglones=renglones_sql)), dict(parametros, **extra),
+        execution_options={'stream_results': True, 'yield_per': FILAS_POR_LECTURA}
+    )
+
+
+def renglones(periodo):
+    """Renglones del mes en orden."""
+    return _leer('SELECT * FROM ({renglones}) r ORDER BY fecha, tipo_comprobante, punto_venta, numero, venta_id', periodo)
+
+
+# --- Archivos ---
+def lineas_csv(periodo):
+    """CSV del libro, con una fila 'Subtotal' al terminar cada día y el total del mes al final."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def vaciar():
+        datos = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return datos
+
+    def fila_total(fecha, etiqueta, suma):
+        escritor.writerow([fecha, etiqueta, '', '', '', '', '', '', f"{suma['cantidad']} comprobantes",
+                           suma['neto'], suma['iva'], suma['total'], ''])
+
+    escritor.writerow(COLUMNAS_CSV)
+    cero = {'cantidad': 0, 'neto': Decimal(0), 'iva': Decimal(0), 'total': Decimal(0)}
+    dia, suma_dia, suma_mes = None, dict(cero), dict(cero)
+    for i, r in enumerate(renglones(periodo)):
+        if dia is not None and r.fecha != dia:
+            fila_total(dia.isoformat(), 'Subtotal', suma_dia)
+            suma_dia = dict(cero)
+        dia = r.fecha
+        escritor.writerow([
+            r.fecha.isoformat(), nombre_tipo(r.tipo_comprobante), r.punto_venta or '', r.numero or '',
+            r.cae or '', r.condicion_iva, r.doc_tipo, r.doc_nro, r.cliente, r.neto, r.iva, r.total, r.venta_id
+        ])
+        for suma in (suma_dia, suma_mes):
+            suma['cantidad'] += 1
+            suma['neto'] += r.neto
+            suma['iva'] += r.iva
+            suma['total'] += r.total
+        if i % 500 == 499:
+            yield vaciar()
+    if dia is not None:
+        fila_total(dia.isoformat(), 'Subtotal', suma_dia)
+    fila_total('', 'Total', suma_mes)
+    yield vaciar()
+
+
+def _importe(valor):
+    """15 dígitos, dos decimales implícitos."""
+    return f'{int((Decimal(valor) * 100).to_integral_value()):015d}'
+
+
+def _texto(valor, largo):
+    return (valor or '')[:largo].ljust(largo)
+
+
+def linea_cbte(r):
+    """Renglón de VENTAS_CBTE (RG 3685), 266 caracteres."""
+    alicuotas = 0 if r.tipo_comprobante == FACTURA_C else r.alicuotas
+    exento = r.total - r.neto - r.iva
+    return ''.join((
+        r.fecha.strftime('%Y%m%d'),
+        f'{r.tipo_comprobante:03d}',
+        f'{r.punto_venta:05d}',
+        f'{r.numero:020d}',                 # número desde
+        f'{r.numero:020d}',                 # número hasta (un comprobante por renglón)
+        f'{r.doc_tipo:02d}',
+        f'{r.doc_nro:020d}',
+        _texto(r.cliente, 30),
+        _importe(r.total),
+        _importe(0) * 2,                    # no gravado y percepciones a no categorizados
+        _importe(exento),
+        _importe(0) * 4,                    # percepciones e impuestos internos
+        'PES',
+        '0001000000',                       # tipo de cambio 1 (seis decimales)
+        str(alicuotas),
+        'E' if exento and not alicuotas else '0',  # código de operación: exenta o gravada
+        _importe(0),                        # otros tributos
+        '00000000',                         # vencimiento de pago
+    ))
+
+
+def linea_alicuota(r):
+    """Renglón de VENTAS_ALICUOTAS (RG 3685), 62 caracteres."""
+    return ''.join((
+        f'{r.tipo_comprobante:03d}',
+        f'{r.punto_venta:05d}',
+        f'{r.numero:020d}',
+        _importe(r.neto),
+        f'{ALICUOTAS[r.alicuota_iva].codigo_afip:04d}',
+        _importe(r.iva),
+    ))
+
+
+def lineas_afip(periodo, archivo):
+    """Archivo 'cbte' o 'alicuotas' para el importador de AFIP (ISO-8859-1, fin de línea CRLF)."""
+    if archivo == 'cbte':
+        filas, armar = _leer(SQL_AFIP_CBTE, periodo, exento=EXENTO), linea_cbte
+    else:
+        filas, armar = _leer(SQL_AFIP_ALICUOTAS, periodo, exento=EXENTO, factura_c=FACTURA_C), linea_alicuota
+    lote = []
+    for r in filas:
+        lote.append(armar(r))
+        if len(lote) >= 500:
+            yield ('\r\n'.join(lote) + '\r\n').encode('latin-1', 'replace')
+            lote = []
+    if lote:
+        yield ('\r\n'.join(lote) + '\r\n').encode('latin-1', 'replace')
+
+
+# --- Cierre ---
+def cerrar_periodo(periodo, user_id):
+    """
+    Congela el mes: copia sus renglones a renglon_libro_iva con un INSERT ... SELECT.
+    venta y comprobante_fiscal se bloquean en modo SHARE mientras dura la copia,
+    así ninguna venta o CAE en curso queda afuera a medias.
+    """
+    desde, hasta = _limites(periodo)
+    if hasta > datetime.datetime.now(datetime.timezone.utc):
+        raise PeriodoCerrado('El mes todavía no terminó.')
+    if PeriodoIva.query.filter_by(periodo=periodo).first() is not None:
+        raise PeriodoCerrado(f'El período {periodo:%m/%Y} ya está cerrado.')
+
+    db.session.execute(text('LOCK TABLE venta, comprobante_fiscal IN SHARE MODE'))
+    avisos = db.session.execute(SQL_AVISOS, {'por_enviar': list(POR_ENVIAR), 'desde': desde, 'hasta': hasta}).one()
+    if avisos.pendientes:
+        raise PeriodoCerrado(f'Hay {avisos.pendientes} comprobantes del mes esperando el CAE: reintentar más tarde.')
+
+    cerrado = PeriodoIva(periodo=periodo, user_id=user_id)
+    db.session.add(cerrado)
+    db.session.flush()
+    sql, parametros = _renglones(periodo)
+    db.session.execute(text(f"""
+        INSERT INTO renglon_libro_iva (periodo_id, {COLUMNAS_RENGLON})
+        SELECT :periodo_id, {COLUMNAS_RENGLON} FROM ({sql}) r
+    """), dict(parametros, periodo_id=cerrado.id))
+    totales = db.session.execute(text("""
+        SELECT count(*) AS cantidad, COALESCE(sum(neto), 0) AS neto,
+               COALESCE(sum(iva), 0) AS iva, COALESCE(sum(total), 0) AS total
+        FROM renglon_libro_iva WHERE periodo_id = :periodo_id
+    """), {'periodo_id': cerrado.id}).one()
+    cerrado.cantidad, cerrado.neto, cerrado.iva, cerrado.total = totales
+    marcar(db.session, 'renglon_libro_iva')
+    db.session.commit()
+    return cerrado
+
+
+def reabrir_periodo(periodo):
+    """Borra la copia del mes (los renglones caen por ON DELETE CASCADE)."""
+    cerrado = PeriodoIva.query.filter_by(periodo=periodo).first()
+    if cerrado is None:
+        raise PeriodoCerrado(f'El período {periodo:%m/%Y} no está cerrado.')
+    db.session.delete(cerrado)
+    marcar(db.session, 'renglon_libro_iva')
+    db.session.commit()
+
+
+# -----------------------------------------------
+# RUTA: LIBRO IVA VENTAS (Admin)
+# -----------------------------------------------
+def _periodo_o_404(texto):
+    try:
+        return periodo_de(texto)
+    except ValueError:
+        abort(404)
+
+
+def _mes_anterior():
+    return (datetime.date.today().replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+
+
+def _terminado(periodo):
+    return _limites(periodo)[1] <= datetime.datetime.now(datetime.timezone.utc)
+
+
+def clave_libro(*args, **kwargs):
+    """Sin ?periodo el mes depende de la fecha, y 'terminado' de la hora: van al ETag."""
+    texto = request.args.get('periodo')
+    try:
+        periodo = periodo_de(texto) if texto else _mes_anterior()
+    except ValueError:
+        return None
+    return f'{periodo:%Y-%m}-{"terminado" if _terminado(periodo) else "en_curso"}'
+
+
+@libro_iva_bp.route('/admin/libro-iva')
+@login_required
+@admin_required
+@condicional('venta', 'cliente', 'comprobante_fiscal', 'periodo_iva', clave=clave_libro)
+def libro_iva():
+    """Libro IVA Ventas de un mes (por defecto, el anterior)."""
+    texto = request.args.get('periodo')
+    periodo = _periodo_o_404(texto) if texto else _mes_anterior()
+    return render_template(
+        'libro_iva.html',
+        libro=resumen(periodo),
+        terminado=_terminado(periodo),
+        cerrados=PeriodoIva.query.order_by(PeriodoIva.periodo.desc()).limit(24).all()
+    )
+
+
+@libro_iva_bp.route('/admin/libro-iva/<periodo>.csv')
+@login_required
+@admin_required
+def descargar_csv(periodo):
+    periodo = _periodo_o_404(periodo)
+    return Response(
+        stream_with_context(lineas_csv(periodo)), mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=libro_iva_ventas_{periodo:%Y-%m}.csv'}
+    )
+
+
+@libro_iva_bp.route('/admin/libro-iva/<periodo>/afip-<archivo>.txt')
+@login_required
+@admin_required
+def descargar_afip(periodo, archivo):
+    """VENTAS_CBTE o VENTAS_ALICUOTAS del mes para el importador de AFIP."""
+    periodo = _periodo_o_404(periodo)
+    if archivo not in ('cbte', 'alicuotas'):
+        abort(404)
+    return Response(
+        stream_with_context(lineas_afip(periodo, archivo)), mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename=REGINFO_CV_VENTAS_{archivo.upper()}_{periodo:%Y%m}.txt'}
+    )
+
+
+@libro_iva_bp.route('/admin/libro-iva/<periodo>/cerrar', methods=['POST'])
+@login_required
+@admin_required
+def cerrar(periodo):
+    periodo = _periodo_o_404(periodo)
+    try:
+        cerrado = cerrar_periodo(periodo, current_user.id)
+        flash(f'Período {periodo:%m/%Y} cerrado con {cerrado.cantidad} comprobantes.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al cerrar el período: {str(e)}', 'danger')
+    return redirect(url_for('libro_iva.libro_iva', periodo=f'{periodo:%Y-%m}'))
+
+
+@libro_iva_bp.route('/admin/libro-iva/<periodo>/reabrir', methods=['POST'])
+@login_required
+@admin_required
+def reabrir(periodo):
+    periodo = _periodo_o_404(periodo)
+    try:
+        reabrir_periodo(periodo)
+        flash(f'Período {periodo:%m/%Y} reabierto: el libro vuelve a calcularse desde las ventas.', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al reabrir el período: {str(e)}', 'danger')
+    return redirect(url_for('libro_iva.libro_iva', periodo=f'{periodo:%Y-%m}'))
+
+
+# -----------------------------------------------
+# COMANDOS CLI (ej: desde cron, el día 1 de cada mes)
+# -----------------------------------------------
+def _periodo_cli(valor):
+    try:
+        return periodo_de(valor) if valor else _mes_anterior()
+    except ValueError:
+        raise click.BadParameter('Usar el formato AAAA-MM.')
+
+
+@libro_iva_bp.cli.command('cerrar')
+@click.argument('periodo', required=False)
+@click.option('--usuario', 'user_id', type=int, required=True, help='Id del usuario que cierra.')
+def cerrar_command(periodo, user_id):
+    """Cierra un mes (por defecto, el anterior)."""
+    periodo = _periodo_cli(periodo)
+    try:
+        cerrado = cerrar_periodo(periodo, user_id)
+    except PeriodoCerrado as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    click.echo(f'Período {periodo:%m/%Y} cerrado: {cerrado.cantidad} comprobantes, '
+               f'neto {cerrado.neto}, IVA {cerrado.iva}, total {cerrado.total}.')
+
+
+@libro_iva_bp.cli.command('exportar')
+@click.argument('periodo', required=False)
+@click.option('--formato', type=click.Choice(['csv', 'cbte', 'alicuotas']), default='csv')
+@click.option('--salida', type=click.File('wb'), default='-', help='Archivo de salida (por defecto, la consola).')
+def exportar_command(periodo, formato, salida):
+    """Escribe el libro de un mes en CSV o en el formato de AFIP."""
+    periodo = _periodo_cli(periodo)
+    if formato == 'csv':
+        for bloque in lineas_csv(periodo):
+            salida.write(bloque.encode('utf-8'))
+    else:
+        for bloque in lineas_afip(periodo, formato):
+            salida.write(bloque)
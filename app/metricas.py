@@ -0,0 +1,235 @@
+"""
+Métricas por ruta en formato de texto de Prometheus (/admin/metricas).
+
+Por endpoint se mide: latencia del request, cantidad de sentencias SQL y
+tiempo total de SQL por request, y espera para obtener una conexión del pool.
+Además se cuentan aciertos/fallos de caché: la caché de compilación de
+SQLAlchemy y cualquier caché propia que llame a registrar_cache().
+
+Los datos viven en memoria de cada proceso (cada worker de gunicorn expone
+los suyos). Para que Prometheus lo lea sin sesión, configurar METRICAS_TOKEN
+y mandar el header `Authorization: Bearer <token>`.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import (
+    Blueprint, Response, current_app, g, has_request_context, request
+)
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import QueuePool
+
+metricas_bp = Blueprint('metricas', __name__)
+
+PREFIJO = 'negocio'
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_ESPERA_POOL = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+BUCKETS_SENTENCIAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# --- Registro en memoria ---
+class Histograma:
+    """Histograma acumulable por etiquetas (un dict etiquetas -> cuentas)."""
+    def __init__(self, nombre, ayuda, buckets, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self.etiquetas = etiquetas
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observar(self, valores, valor):
+        with self.lock:
+            serie = self.series.get(valores)
+            if serie is None:
+                serie = self.series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][bisect_left(self.buckets, valor)] += 1
+            serie[1] += valor
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self.lock:
+            series = [(valores, list(cuentas), suma) for valores, (cuentas, suma) in self.series.items()]
+        for valores, cuentas, suma in sorted(series):
+            base = _etiquetas(self.etiquetas, valores)
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, cuentas):
+                acumulado += cuenta
+                lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {acumulado}')
+            acumulado += cuentas[-1]
+            lineas.append(f'{self.nombre}_bucket{{{base},le="+Inf"}} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{{{base}}} {suma:.6f}')
+            lineas.append(f'{self.nombre}_count{{{base}}} {acumulado}')
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def incrementar(self, valores, cantidad=1):
+        with self.lock:
+            self.series[valores] = self.series.get(valores, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        with self.lock:
+            series = sorted(self.series.items())
+        for valores, total in series:
+            lineas.append(f'{self.nombre}{{{_etiquetas(self.etiquetas, valores)}}} {total}')
+        return lineas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores):
+    return ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+
+
+LATENCIA = Histograma(
+    f'{PREFIJO}_http_request_duration_seconds', 'Latencia de los requests por endpoint.',
+    BUCKETS_SEGUNDOS, ('endpoint', 'metodo')
+)
+REQUESTS = Contador(
+    f'{PREFIJO}_http_requests_total', 'Requests atendidos por endpoint y código de respuesta.',
+    ('endpoint', 'metodo', 'codigo')
+)
+SQL_SENTENCIAS = Histograma(
+    f'{PREFIJO}_sql_statements_per_request', 'Sentencias SQL ejecutadas por request.',
+    BUCKETS_SENTENCIAS, ('endpoint',)
+)
+SQL_TIEMPO = Histograma(
+    f'{PREFIJO}_sql_duration_seconds_per_request', 'Tiempo total de SQL por request.',
+    BUCKETS_SEGUNDOS, ('endpoint',)
+)
+ESPERA_POOL = Histograma(
+    f'{PREFIJO}_pool_checkout_wait_seconds', 'Espera para obtener una conexión del pool (incluye abrirla).',
+    BUCKETS_ESPERA_POOL, ('endpoint',)
+)
+CACHE = Contador(
+    f'{PREFIJO}_cache_requests_total', 'Consultas a cachés por resultado (hit/miss).',
+    ('cache', 'resultado')
+)
+
+
+def registrar_cache(nombre, acierto):
+    """Cuenta un acierto (True) o un fallo (False) de la caché `nombre`."""
+    CACHE.incrementar((nombre, 'hit' if acierto else 'miss'))
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'sin_ruta'
+    return 'fuera_de_request'
+
+
+# --- Pool que mide la espera de checkout ---
+class PoolMedido(QueuePool):
+    """QueuePool que registra cuánto se espera por cada conexión."""
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            ESPERA_POOL.observar((_endpoint(),), time.perf_counter() - inicio)
+
+
+# --- Eventos de SQLAlchemy (todas las engines, primario y réplica) ---
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metricas_inicio'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop('metricas_inicio', None)
+    if inicio is not None and has_request_context() and 'metricas_inicio' in g:
+        g.metricas_sql_n += 1
+        g.metricas_sql_t += time.perf_counter() - inicio
+
+    estado_cache = getattr(context, 'cache_hit', None)
+    if estado_cache is CACHE_HIT:
+        registrar_cache('sqlalchemy_compilacion', True)
+    elif estado_cache is CACHE_MISS:
+        registrar_cache('sqlalchemy_compilacion', False)
+
+
+# --- Hooks de Flask ---
+@metricas_bp.before_app_request
+def _iniciar_medicion():
+    g.metricas_inicio = time.perf_counter()
+    g.metricas_sql_n = 0
+    g.metricas_sql_t = 0.0
+
+
+@metricas_bp.after_app_request
+def _registrar_request(response):
+    inicio = g.pop('metricas_inicio', None)
+    if inicio is None:
+        return response
+
+    endpoint = request.endpoint or 'sin_ruta'
+    LATENCIA.observar((endpoint, request.method), time.perf_counter() - inicio)
+    REQUESTS.incrementar((endpoint, request.method, response.status_code))
+    SQL_SENTENCIAS.observar((endpoint,), g.metricas_sql_n)
+    SQL_TIEMPO.observar((endpoint,), g.metricas_sql_t)
+    return response
+
+
+def _estado_pools():
+    """Gauges con el estado actual de cada pool (una línea por bind)."""
+    from .models import db
+
+    lineas = [
+        f'# HELP {PREFIJO}_pool_connections Conexiones del pool por estado.',
+        f'# TYPE {PREFIJO}_pool_connections gauge',
+    ]
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        nombre = bind or 'primario'
+        lineas.append(f'{PREFIJO}_pool_connections{{bind="{nombre}",estado="en_uso"}} {pool.checkedout()}')
+        lineas.append(f'{PREFIJO}_pool_connections{{bind="{nombre}",estado="libres"}} {pool.checkedin()}')
+        lineas.append(f'{PREFIJO}_pool_connections{{bind="{nombre}",estado="overflow"}} {max(pool.overflow(), 0)}')
+    return lineas
+
+
+def _autorizado():
+    token = current_app.config.get('METRICAS_TOKEN')
+    if token:
+        enviado = request.headers.get('Authorization', '')
+        if hmac.compare_digest(enviado.encode(), f'Bearer {token}'.encode()):
+            return True
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+
+# -----------------------------------------------
+# RUTA: MÉTRICAS (Prometheus)
+# -----------------------------------------------
+@metricas_bp.route('/admin/metricas')
+def ver_metricas():
+    """Expone las métricas acumuladas del proceso en formato Prometheus."""
+    # Quien scrapea es un programa: código de error y texto plano, sin redirigir al login
+    if not _autorizado():
+        if current_user.is_authenticated:
+            return Response('Se requiere ser Administrador.\n', status=403, mimetype='text/plain')
+        return Response('Se requiere el token de métricas.\n', status=401, mimetype='text/plain',
+                        headers={'WWW-Authenticate': 'Bearer'})
+
+    lineas = []
+    for metrica in (LATENCIA, REQUESTS, SQL_SENTENCIAS, SQL_TIEMPO, ESPERA_POOL, CACHE):
+        lineas.extend(metrica.exponer())
+    lineas.extend(_estado_pools())
+    return Response('\n'.join(lineas) + '\n', mimetype='text/plain; version=0.0.4; charset=utf-8')
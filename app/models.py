@@ -1,19 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.sql import func
+from sqlalchemy import event, DDL
 from flask_login import UserMixin
+from .replicas import SesionEnrutada
 import datetime
-<<<<<<< HEAD
-import decimal
-=======
 import decimal # Asegúrate de que decimal esté importado
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 
-db = SQLAlchemy()
+# La sesión enruta las lecturas de reportes a la réplica (ver replicas.py)
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 
 # -----------------------------------------------
-<<<<<<< HEAD
-# MODELO DE USUARIO
-=======
 # MODELO DE CONFIGURACIÓN (¡NUEVO!)
 # -----------------------------------------------
 class Configuracion(db.Model):
@@ -24,7 +20,6 @@ class Configuracion(db.Model):
 
 # -----------------------------------------------
 # MODELO DE USUARIO (Empleado/Admin)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,11 +36,7 @@ class User(db.Model, UserMixin):
         return f'<User {self.username}>'
 
 # -----------------------------------------------
-<<<<<<< HEAD
-# MODELO DE CLIENTE
-=======
 # MODELO CLIENTE (¡MODIFICADO!)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class Cliente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -53,31 +44,26 @@ class Cliente(db.Model):
     documento_fiscal = db.Column(db.String(20), nullable=True, unique=True)
     telefono = db.Column(db.String(50), nullable=True)
     email = db.Column(db.String(120), nullable=True)
-<<<<<<< HEAD
-=======
     
     # --- ¡NUEVA COLUMNA DE IVA! ---
     condicion_iva = db.Column(db.String(50), nullable=False, default='Consumidor Final')
     # -----------------------------
     
     # (Relación definida UNA SOLA VEZ)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
+    # Lo mantiene un trigger en cada UPDATE (sincronización incremental de la API, ver api.py)
+    actualizado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
     ventas = db.relationship('Venta', backref='cliente', lazy=True)
 
     def __repr__(self):
         return f'<Cliente {self.nombre}>'
 
 # -----------------------------------------------
-<<<<<<< HEAD
-# MODELO MOVIMIENTO STOCK (AUDITORÍA)
-=======
 # MODELO MOVIMIENTO STOCK (Auditoría)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class MovimientoStock(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     fecha = db.Column(db.DateTime(timezone=True), server_default=func.now())
-<<<<<<< HEAD
+    actualizado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())  # API v1
     cantidad = db.Column(db.Integer, nullable=False) # Positivo (entrada), Negativo (salida)
     tipo = db.Column(db.String(50), nullable=False) # Ej: "Entrada Proveedor", "Venta", "Anulación Venta"
     producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
@@ -88,15 +74,6 @@ class MovimientoStock(db.Model):
 
 # -----------------------------------------------
 # MODELO DE JORNADA (TURNO)
-=======
-    cantidad = db.Column(db.Integer, nullable=False)
-    tipo = db.Column(db.String(50), nullable=False) 
-    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-
-# -----------------------------------------------
-# MODELO DE JORNADA (Turno)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class Jornada(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -105,6 +82,7 @@ class Jornada(db.Model):
     activa = db.Column(db.Boolean, default=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     notas_cierre = db.Column(db.Text, nullable=True)
+    actualizado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
     
     ventas = db.relationship('Venta', backref='jornada', lazy=True)
     cierres_metodo_pago = db.relationship('CierreMetodoPago', backref='jornada', lazy=True)
@@ -130,11 +108,7 @@ class Jornada(db.Model):
         return f'<Jornada {self.id} - User {self.user_id}>'
 
 # -----------------------------------------------
-<<<<<<< HEAD
-# MODELO CIERRE METODO PAGO (ARQUEO)
-=======
 # MODELO CIERRE METODO PAGO (Arqueo)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class CierreMetodoPago(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -154,11 +128,9 @@ class Producto(db.Model):
     precio = db.Column(db.Numeric(10, 2), nullable=False)
     precio_costo = db.Column(db.Numeric(10, 2), nullable=False, default=0.0)
     stock = db.Column(db.Integer, nullable=False, default=0)
-<<<<<<< HEAD
     stock_minimo = db.Column(db.Integer, nullable=False, default=5) # Alerta de Stock
-=======
-    stock_minimo = db.Column(db.Integer, nullable=False, default=5)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
+    actualizado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
+    alicuota_iva = db.Column(db.String(10), nullable=False, default='21', server_default='21')  # ver impuestos.ALICUOTAS
     
     movimientos_stock = db.relationship('MovimientoStock', backref='producto', lazy=True)
     
@@ -166,22 +138,13 @@ class Producto(db.Model):
         return f'<Producto {self.nombre}>'
 
 # -----------------------------------------------
-<<<<<<< HEAD
-# MODELO DE VENTA
-=======
 # MODELO DE VENTA (¡MODIFICADO!)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class Venta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     fecha = db.Column(db.DateTime(timezone=True), server_default=func.now())
     total = db.Column(db.Numeric(10, 2), nullable=False, default=0.0)
     ganancia_bruta_total = db.Column(db.Numeric(10, 2), nullable=False, default=0.0)
-<<<<<<< HEAD
-    estado = db.Column(db.String(20), nullable=False, default='completada')
-    metodo_pago = db.Column(db.String(50), nullable=False, default='Efectivo')
-    
-=======
     
     # --- ¡NUEVAS COLUMNAS DE IMPUESTOS! ---
     total_neto_gravado = db.Column(db.Numeric(10, 2), nullable=False, default=0.0)
@@ -193,25 +156,20 @@ class Venta(db.Model):
     metodo_pago = db.Column(db.String(50), nullable=False, default='Efectivo')
     
     # Claves Foráneas
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     jornada_id = db.Column(db.Integer, db.ForeignKey('jornada.id'), nullable=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=True)
+    actualizado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
+    # Id de la venta en el sistema anterior (solo ventas importadas, ver importacion.py)
+    referencia_externa = db.Column(db.String(64), nullable=True, unique=True)
     
     detalles = db.relationship('DetalleVenta', backref='venta', lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
-<<<<<<< HEAD
         return f'<Venta {self.id} - {self.estado}>'
 
 # -----------------------------------------------
 # MODELO DE DETALLE DE VENTA
-=======
-        return f'<Venta {self.id} - {self.metodo_pago}>'
-
-# -----------------------------------------------
-# MODELO DE DETALLE DE VENTA (¡MODIFICADO!)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
 # -----------------------------------------------
 class DetalleVenta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -219,16 +177,451 @@ class DetalleVenta(db.Model):
     precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
     precio_costo_unitario = db.Column(db.Numeric(10, 2), nullable=False)
     
-<<<<<<< HEAD
-=======
     # --- ¡NUEVAS COLUMNAS DE IMPUESTOS! ---
     neto_gravado = db.Column(db.Numeric(10, 2), nullable=False)
     monto_iva = db.Column(db.Numeric(10, 2), nullable=False)
     # ------------------------------------
     
     # (Definido UNA SOLA VEZ)
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
     venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), nullable=False)
     producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    # Alícuota con la que se liquidó la línea (la del producto puede cambiar después)
+    alicuota_iva = db.Column(db.String(10), nullable=False, default='21', server_default='21')
     
-    producto = db.relationship('Producto', backref='detalles_venta')
\ No newline at end of file
+    producto = db.relationship('Producto', backref='detalles_venta')
+
+# -----------------------------------------------
+# MODELO CORTE DE STOCK (Foto periódica del inventario)
+# -----------------------------------------------
+class CorteStock(db.Model):
+    """Marca un momento en el que se guardó el stock de todo el catálogo."""
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # Último MovimientoStock incluido en la foto (marca de agua)
+    ultimo_movimiento_id = db.Column(db.Integer, nullable=False, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    snapshots = db.relationship('SnapshotStock', backref='corte', lazy=True, cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f'<CorteStock {self.id} - Mov {self.ultimo_movimiento_id}>'
+
+# -----------------------------------------------
+# MODELO SNAPSHOT DE STOCK (Stock de un producto en un corte)
+# -----------------------------------------------
+class SnapshotStock(db.Model):
+    corte_id = db.Column(db.Integer, db.ForeignKey('corte_stock.id'), primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), primary_key=True)
+    stock = db.Column(db.Integer, nullable=False)
+
+# -----------------------------------------------
+# MODELO ACTUALIZACIÓN DE PRECIOS (Cambio masivo)
+# -----------------------------------------------
+class ActualizacionPrecios(db.Model):
+    """Un cambio masivo de precios sobre un filtro de productos (inmediato o programado)."""
+    id = db.Column(db.Integer, primary_key=True)
+    creada = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    vigencia = db.Column(db.DateTime(timezone=True), nullable=False) # Cuándo debe aplicarse
+    aplicada = db.Column(db.DateTime(timezone=True), nullable=True)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente') # pendiente, aplicada, cancelada
+
+    # Qué se cambia: 'precio', 'precio_costo' o 'ambos'; 'porcentaje' o 'monto'
+    campo = db.Column(db.String(20), nullable=False, default='precio')
+    modo = db.Column(db.String(20), nullable=False, default='porcentaje')
+    valor = db.Column(db.Numeric(10, 2), nullable=False)
+
+    # Filtros (todos opcionales)
+    filtro_nombre = db.Column(db.String(100), nullable=True)
+    margen_min = db.Column(db.Numeric(6, 2), nullable=True)
+    margen_max = db.Column(db.Numeric(6, 2), nullable=True)
+    estado_stock = db.Column(db.String(20), nullable=True) # sin_stock, bajo, normal
+
+    productos_afectados = db.Column(db.Integer, nullable=False, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    user = db.relationship('User')
+    historial = db.relationship('HistorialPrecio', backref='actualizacion', lazy=True)
+
+    def __repr__(self):
+        return f'<ActualizacionPrecios {self.id} - {self.estado}>'
+
+# -----------------------------------------------
+# MODELO HISTORIAL DE PRECIOS (Solo inserción)
+# -----------------------------------------------
+class HistorialPrecio(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    precio_anterior = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_nuevo = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_costo_anterior = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_costo_nuevo = db.Column(db.Numeric(10, 2), nullable=False)
+    origen = db.Column(db.String(50), nullable=False) # Ej: "Actualización Masiva", "Edición de Producto"
+    actualizacion_id = db.Column(db.Integer, db.ForeignKey('actualizacion_precios.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    producto = db.relationship('Producto', backref='historial_precios')
+
+    def __repr__(self):
+        return f'<HistorialPrecio {self.id} - Prod {self.producto_id}>'
+
+# El historial no se modifica ni se borra: lo impide un trigger en la base
+event.listen(
+    HistorialPrecio.__table__,
+    'after_create',
+    DDL("""
+        CREATE OR REPLACE FUNCTION historial_precio_solo_insercion() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'historial_precio es de solo inserción';
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER historial_precio_inmutable
+            BEFORE UPDATE OR DELETE ON historial_precio
+            FOR EACH ROW EXECUTE FUNCTION historial_precio_solo_insercion();
+    """).execute_if(dialect='postgresql')
+)
+
+# -----------------------------------------------
+# MODELO CONSULTA LENTA (Diagnóstico, tabla acotada)
+# -----------------------------------------------
+class ConsultaLenta(db.Model):
+    """Sentencia SQL que superó el umbral de lentitud (ver consultas_lentas.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    huella = db.Column(db.String(32), nullable=False) # md5 del SQL normalizado
+    sql = db.Column(db.Text, nullable=False)          # SQL normalizado (sin literales)
+    parametros = db.Column(db.Text, nullable=True)    # JSON, con datos sensibles ocultos
+    duracion_ms = db.Column(db.Numeric(10, 2), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=True)
+    plan = db.Column(db.Text, nullable=True)          # EXPLAIN (ANALYZE, BUFFERS), solo SELECT
+
+    def __repr__(self):
+        return f'<ConsultaLenta {self.id} - {self.huella} ({self.duracion_ms} ms)>'
+
+# -----------------------------------------------
+# MODELO VERSIÓN DE DATOS (ETag de reportes y recibos)
+# -----------------------------------------------
+class VersionDatos(db.Model):
+    """Contador de cambios por tabla; se incrementa en cada commit que la modifica (ver versiones.py)."""
+    nombre = db.Column(db.String(64), primary_key=True) # nombre de la tabla
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f'<VersionDatos {self.nombre} v{self.version}>'
+
+# -----------------------------------------------
+# MODELO TRABAJO (Cola de tareas en segundo plano)
+# -----------------------------------------------
+class Trabajo(db.Model):
+    """Tarea pesada que corre un worker aparte (ver trabajos.py y worker.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente') # pendiente, en_curso, terminado, fallido, cancelado
+    prioridad = db.Column(db.Integer, nullable=False, default=0)           # mayor = se toma antes
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=3)
+    disponible_desde = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+    progreso = db.Column(db.Integer, nullable=False, default=0)            # 0 a 100
+    mensaje = db.Column(db.String(200), nullable=True)
+    resultado = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    creado = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    iniciado = db.Column(db.DateTime(timezone=True), nullable=True)
+    terminado = db.Column(db.DateTime(timezone=True), nullable=True)
+    latido = db.Column(db.DateTime(timezone=True), nullable=True)          # último aviso del worker
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} - {self.estado}>'
+
+# -----------------------------------------------
+# MODELO NUMERADOR FISCAL (Último número por punto de venta y tipo)
+# -----------------------------------------------
+class NumeradorFiscal(db.Model):
+    """Último número autorizado; se bloquea la fila al numerar para no dejar huecos."""
+    punto_venta = db.Column(db.Integer, primary_key=True)
+    tipo_comprobante = db.Column(db.Integer, primary_key=True)   # 1 = Factura A, 6 = B, 11 = C
+    ultimo_numero = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NumeradorFiscal {self.punto_venta}-{self.tipo_comprobante}: {self.ultimo_numero}>'
+
+# -----------------------------------------------
+# MODELO COMPROBANTE FISCAL (Factura electrónica de una venta)
+# -----------------------------------------------
+class ComprobanteFiscal(db.Model):
+    """Se crea con la venta y lo envía un worker a AFIP (ver fiscal.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), nullable=False, unique=True)
+    punto_venta = db.Column(db.Integer, nullable=False)
+    tipo_comprobante = db.Column(db.Integer, nullable=False)
+    numero = db.Column(db.Integer, nullable=True)                  # se asigna al enviar
+    estado = db.Column(db.String(20), nullable=False, default='pendiente') # pendiente, numerado, aprobado, rechazado, anulado
+    fecha = db.Column(db.Date, nullable=False)
+    doc_tipo = db.Column(db.Integer, nullable=False)               # 80 = CUIT, 96 = DNI, 99 = sin identificar
+    doc_nro = db.Column(db.BigInteger, nullable=False, default=0)
+    importe_total = db.Column(db.Numeric(10, 2), nullable=False)
+    importe_neto = db.Column(db.Numeric(10, 2), nullable=False)
+    importe_iva = db.Column(db.Numeric(10, 2), nullable=False)
+    importe_exento = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
+    cae = db.Column(db.String(14), nullable=True)
+    cae_vencimiento = db.Column(db.Date, nullable=True)
+    observaciones = db.Column(db.Text, nullable=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    creado = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    aprobado = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    venta = db.relationship('Venta', backref=db.backref('comprobante_fiscal', uselist=False))
+
+    __table_args__ = (
+        db.UniqueConstraint('punto_venta', 'tipo_comprobante', 'numero', name='uq_comprobante_fiscal_numero'),
+    )
+
+    def __repr__(self):
+        return f'<ComprobanteFiscal {self.punto_venta}-{self.tipo_comprobante}-{self.numero} - {self.estado}>'
+
+# -----------------------------------------------
+# MODELO VENTA SINCRONIZADA (Ventas hechas sin conexión en el POS)
+# -----------------------------------------------
+class VentaSincronizada(db.Model):
+    """Una venta que el POS guardó sin conexión; el uuid lo genera el navegador y evita duplicados."""
+    uuid = db.Column(db.String(36), primary_key=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), nullable=True, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)     # registrada, conflicto, rechazada, revisada
+    creada = db.Column(db.DateTime(timezone=True), nullable=False)   # hora de la caja, no del servidor
+    recibida = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    datos = db.Column(db.JSON, nullable=False)            # lo que mandó el POS, tal cual
+    conflictos = db.Column(db.JSON, nullable=True)        # [{'tipo': 'stock' | 'precio' | 'jornada' | ..., ...}]
+    revisada_por_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    revisada = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    venta = db.relationship('Venta')
+    user = db.relationship('User', foreign_keys=[user_id])
+    revisada_por = db.relationship('User', foreign_keys=[revisada_por_id])
+
+    def __repr__(self):
+        return f'<VentaSincronizada {self.uuid} - {self.estado}>'
+
+# -----------------------------------------------
+# MODELO CÓDIGO DE PRODUCTO (Código de barras / SKU)
+# -----------------------------------------------
+class CodigoProducto(db.Model):
+    """Código de barras (EAN/UPC) o SKU; un producto puede tener varios."""
+    id = db.Column(db.Integer, primary_key=True)
+    codigo = db.Column(db.String(64), nullable=False, unique=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+
+    producto = db.relationship('Producto', backref=db.backref(
+        'codigos', lazy=True, cascade='all, delete-orphan', order_by='CodigoProducto.id'
+    ))
+
+    def __repr__(self):
+        return f'<CodigoProducto {self.codigo} - Prod {self.producto_id}>'
+
+# Cada cambio en productos o códigos avisa por NOTIFY qué productos cambiaron,
+# para que el índice de códigos en memoria de cada proceso se actualice (ver codigos.py)
+SQL_NOTIFICAR_CATALOGO = """
+    CREATE OR REPLACE FUNCTION catalogo_notificar_producto() RETURNS trigger AS $$
+    DECLARE ids text;
+    BEGIN
+        SELECT string_agg(DISTINCT id::text, ',') INTO ids FROM filas;
+        IF ids IS NOT NULL THEN
+            PERFORM pg_notify('catalogo', CASE WHEN length(ids) > 7000 THEN '*' ELSE ids END);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION catalogo_notificar_codigo() RETURNS trigger AS $$
+    DECLARE ids text;
+    BEGIN
+        SELECT string_agg(DISTINCT producto_id::text, ',') INTO ids FROM filas;
+        IF ids IS NOT NULL THEN
+            PERFORM pg_notify('catalogo', CASE WHEN length(ids) > 7000 THEN '*' ELSE ids END);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE TRIGGER producto_catalogo_alta AFTER INSERT ON producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_producto();
+    CREATE TRIGGER producto_catalogo_cambio AFTER UPDATE ON producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_producto();
+    CREATE TRIGGER producto_catalogo_baja AFTER DELETE ON producto
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_producto();
+    CREATE TRIGGER codigo_producto_catalogo_alta AFTER INSERT ON codigo_producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_codigo();
+    CREATE TRIGGER codigo_producto_catalogo_cambio AFTER UPDATE ON codigo_producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_codigo();
+    CREATE TRIGGER codigo_producto_catalogo_baja AFTER DELETE ON codigo_producto
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION catalogo_notificar_codigo();
+"""
+event.listen(CodigoProducto.__table__, 'after_create', DDL(SQL_NOTIFICAR_CATALOGO).execute_if(dialect='postgresql'))
+
+# -----------------------------------------------
+# MODELO TOKEN DE API (Integraciones, ver api.py)
+# -----------------------------------------------
+class TokenApi(db.Model):
+    """Token de solo lectura para /api/v1; se guarda solo su hash."""
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)          # Ej: "Contabilidad", "Tienda online"
+    prefijo = db.Column(db.String(12), nullable=False)          # para reconocerlo en el listado
+    hash = db.Column(db.String(64), nullable=False, unique=True)  # sha256 del token
+    creado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+    creado_por_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    ultimo_uso = db.Column(db.DateTime(timezone=True), nullable=True)
+    revocado = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    creado_por = db.relationship('User')
+
+    def __repr__(self):
+        return f'<TokenApi {self.prefijo} - {self.nombre}>'
+
+# -----------------------------------------------
+# MODELO REGISTRO DE BAJA (Filas borradas, para la API incremental)
+# -----------------------------------------------
+class RegistroBaja(db.Model):
+    """Producto o cliente borrado: lo carga un trigger para que las integraciones lo vean."""
+    id = db.Column(db.Integer, primary_key=True)
+    tabla = db.Column(db.String(30), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
+
+    def __repr__(self):
+        return f'<RegistroBaja {self.tabla} {self.registro_id}>'
+
+# La columna actualizado la pone la base en cada UPDATE (incluidos los UPDATE
+# masivos con text() o COPY, que el ORM no ve); los cambios de códigos tocan
+# su producto y los DELETE quedan en registro_baja. Lleva la hora de la
+# escritura (clock_timestamp), no la del inicio de la transacción (now).
+SQL_SINCRONIZACION_API = """
+    CREATE OR REPLACE FUNCTION api_tocar_actualizado() RETURNS trigger AS $$
+    BEGIN
+        NEW.actualizado := clock_timestamp();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION api_tocar_producto_de_codigo() RETURNS trigger AS $$
+    BEGIN
+        UPDATE producto SET actualizado = clock_timestamp() WHERE id IN (SELECT producto_id FROM filas);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION api_registrar_baja() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO registro_baja (tabla, registro_id) SELECT TG_TABLE_NAME, id FROM filas;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE TRIGGER producto_api_actualizado BEFORE UPDATE ON producto
+        FOR EACH ROW EXECUTE FUNCTION api_tocar_actualizado();
+    CREATE TRIGGER cliente_api_actualizado BEFORE UPDATE ON cliente
+        FOR EACH ROW EXECUTE FUNCTION api_tocar_actualizado();
+    CREATE TRIGGER venta_api_actualizado BEFORE UPDATE ON venta
+        FOR EACH ROW EXECUTE FUNCTION api_tocar_actualizado();
+    CREATE TRIGGER jornada_api_actualizado BEFORE UPDATE ON jornada
+        FOR EACH ROW EXECUTE FUNCTION api_tocar_actualizado();
+    CREATE TRIGGER codigo_producto_api_alta AFTER INSERT ON codigo_producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION api_tocar_producto_de_codigo();
+    CREATE TRIGGER codigo_producto_api_cambio AFTER UPDATE ON codigo_producto
+        REFERENCING NEW TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION api_tocar_producto_de_codigo();
+    CREATE TRIGGER codigo_producto_api_baja AFTER DELETE ON codigo_producto
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION api_tocar_producto_de_codigo();
+    CREATE TRIGGER producto_api_baja AFTER DELETE ON producto
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION api_registrar_baja();
+    CREATE TRIGGER cliente_api_baja AFTER DELETE ON cliente
+        REFERENCING OLD TABLE AS filas FOR EACH STATEMENT EXECUTE FUNCTION api_registrar_baja();
+"""
+# Va sobre la metadata (no sobre una tabla) porque usa varias: corre cuando ya existen todas
+event.listen(db.metadata, 'after_create', DDL(SQL_SINCRONIZACION_API).execute_if(dialect='postgresql'))
+
+# -----------------------------------------------
+# MODELO PERÍODO IVA (Meses cerrados del Libro IVA Ventas, ver libro_iva.py)
+# -----------------------------------------------
+class PeriodoIva(db.Model):
+    """Mes cerrado: el libro se sirve desde sus renglones copiados, no desde las ventas."""
+    id = db.Column(db.Integer, primary_key=True)
+    periodo = db.Column(db.Date, nullable=False, unique=True)   # primer día del mes
+    cerrado = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    neto = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    iva = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    user = db.relationship('User')
+    renglones = db.relationship('RenglonLibroIva', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+
+    def __repr__(self):
+        return f'<PeriodoIva {self.periodo:%m/%Y}>'
+
+# -----------------------------------------------
+# MODELO RENGLÓN DEL LIBRO IVA (Copia de cada venta de un mes cerrado)
+# -----------------------------------------------
+class RenglonLibroIva(db.Model):
+    periodo_id = db.Column(db.Integer, db.ForeignKey('periodo_iva.id', ondelete='CASCADE'), primary_key=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('venta.id'), primary_key=True)
+    fecha = db.Column(db.Date, nullable=False)
+    condicion_iva = db.Column(db.String(50), nullable=False)
+    tipo_comprobante = db.Column(db.Integer, nullable=False)      # 0 = sin comprobante (sin CAE)
+    punto_venta = db.Column(db.Integer, nullable=True)
+    numero = db.Column(db.Integer, nullable=True)
+    cae = db.Column(db.String(14), nullable=True)
+    doc_tipo = db.Column(db.Integer, nullable=False)
+    doc_nro = db.Column(db.BigInteger, nullable=False)
+    cliente = db.Column(db.String(150), nullable=False)
+    neto = db.Column(db.Numeric(10, 2), nullable=False)
+    iva = db.Column(db.Numeric(10, 2), nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
+
+    def __repr__(self):
+        return f'<RenglonLibroIva {self.periodo_id} - venta {self.venta_id}>'
+
+# -----------------------------------------------
+# ÍNDICES ADICIONALES
+# -----------------------------------------------
+# Consultas de stock a una fecha: recorren solo el rango de movimientos
+# entre el corte más cercano y la fecha pedida.
+db.Index('ix_movimiento_stock_fecha', MovimientoStock.fecha)
+db.Index('ix_movimiento_stock_producto_fecha', MovimientoStock.producto_id, MovimientoStock.fecha)
+db.Index('ix_corte_stock_fecha', CorteStock.fecha)
+db.Index('ix_historial_precio_producto_fecha', HistorialPrecio.producto_id, HistorialPrecio.fecha)
+db.Index('ix_historial_precio_fecha', HistorialPrecio.fecha)
+db.Index('ix_consulta_lenta_huella_fecha', ConsultaLenta.huella, ConsultaLenta.fecha)
+# Cola de trabajos: los workers buscan solo entre los pendientes
+db.Index(
+    'ix_trabajo_pendientes', Trabajo.prioridad.desc(), Trabajo.disponible_desde, Trabajo.id,
+    postgresql_where=Trabajo.estado == 'pendiente'
+)
+# Facturación electrónica: un solo envío sin empezar; los reintentos (intentos > 0) no cuentan
+db.Index(
+    'ux_trabajo_fiscal_enviar', Trabajo.tipo, unique=True,
+    postgresql_where=(Trabajo.tipo == 'fiscal_enviar') & (Trabajo.estado == 'pendiente') & (Trabajo.intentos == 0)
+)
+# Facturación electrónica: el worker busca solo los comprobantes por enviar
+db.Index(
+    'ix_comprobante_fiscal_por_enviar',
+    ComprobanteFiscal.punto_venta, ComprobanteFiscal.tipo_comprobante, ComprobanteFiscal.id,
+    postgresql_where=ComprobanteFiscal.estado.in_(['pendiente', 'numerado'])
+)
+# POS sin conexión: la revisión lista solo las ventas con conflictos
+db.Index(
+    'ix_venta_sincronizada_por_revisar', VentaSincronizada.recibida,
+    postgresql_where=VentaSincronizada.estado.in_(['conflicto', 'rechazada'])
+)
+db.Index('ix_codigo_producto_producto', CodigoProducto.producto_id)
+# API v1: cada recurso se recorre en orden (actualizado, id) desde updated_since
+db.Index('ix_producto_actualizado', Producto.actualizado, Producto.id)
+db.Index('ix_cliente_actualizado', Cliente.actualizado, Cliente.id)
+db.Index('ix_venta_actualizado', Venta.actualizado, Venta.id)
+db.Index('ix_jornada_actualizado', Jornada.actualizado, Jornada.id)
+db.Index('ix_movimiento_stock_actualizado', MovimientoStock.actualizado, MovimientoStock.id)
+db.Index('ix_registro_baja_fecha', RegistroBaja.fecha, RegistroBaja.id)
+# Libro IVA: las ventas de un mes se leen por rango de fecha
+db.Index('ix_venta_fecha', Venta.fecha)
+# Líneas de una venta (Libro IVA por alícuota, recibos)
+db.Index('ix_detalle_venta_venta', DetalleVenta.venta_id)
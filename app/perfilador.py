@@ -0,0 +1,312 @@
+"""
+Perfilador por muestreo, activable desde /admin/perfilador.
+
+Mientras un request está siendo perfilado, un hilo aparte toma su pila cada
+pocos milisegundos (sys._current_frames). Cada muestra se clasifica como
+'db' (esperando a PostgreSQL), 'orm' (SQLAlchemy), 'template' (Jinja) o
+'python' (el resto). Si el request tarda más que el umbral, la pila se guarda
+en formato "folded" (compatible con flamegraph.pl y speedscope) junto con un
+.json con el resumen. Se guardan como máximo PERFILADOR_MAX_ARCHIVOS perfiles.
+
+La configuración (activo, endpoint, usuario, porcentaje, umbral) vive en la
+tabla Configuracion y se relee cada pocos segundos.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, g, current_app, send_from_directory, abort
+)
+from flask_login import login_required, current_user
+
+from .models import db, Configuracion
+from .decorators import admin_required
+
+perfilador_bp = Blueprint('perfilador', __name__)
+
+INTERVALO_S = 0.005
+PROFUNDIDAD_MAX = 200
+CONFIG_TTL_S = 5
+MAX_PERFILES_LISTADOS = 50
+CATEGORIAS = ('db', 'orm', 'template', 'python')
+
+# Claves en la tabla Configuracion y sus valores por defecto
+CLAVES = {
+    'perfilador_activo': '0',
+    'perfilador_endpoint': '',
+    'perfilador_user_id': '',
+    'perfilador_porcentaje': '100',
+    'perfilador_umbral_ms': '500',
+}
+
+_activos = {}            # id de hilo -> Perfil
+_lock = threading.Lock()
+_despertar = threading.Event()
+_muestreador = None
+_config = {'leida': 0.0, 'valores': dict(CLAVES)}
+
+
+class Perfil:
+    """Muestras de la pila de un request."""
+    def __init__(self):
+        self.pilas = Counter()
+        self.categorias = Counter()
+
+    def muestrear(self, frame):
+        marcos = []
+        while frame is not None and len(marcos) < PROFUNDIDAD_MAX:
+            marcos.append(frame.f_code)
+            frame = frame.f_back
+        marcos.reverse()  # de la raíz a la hoja
+        self.pilas[';'.join(_nombre_marco(c) for c in marcos)] += 1
+        self.categorias[_categoria(marcos)] += 1
+
+
+@lru_cache(maxsize=8192)
+def _nombre_marco(codigo):
+    archivo = codigo.co_filename
+    for base in sys.path:
+        if base and archivo.startswith(base):
+            archivo = archivo[len(base):].lstrip(os.sep)
+            break
+    nombre = getattr(codigo, 'co_qualname', codigo.co_name)
+    return f'{archivo}:{nombre}'.replace(';', ',').replace(' ', '_')
+
+
+def _categoria(marcos):
+    archivos = [c.co_filename.replace(os.sep, '/') for c in marcos]
+    if any('/psycopg2/' in a for a in archivos) or any(
+        c.co_name in ('do_execute', 'do_executemany', 'do_execute_no_params') for c in marcos
+    ):
+        return 'db'
+    if any('/sqlalchemy/' in a for a in archivos):
+        return 'orm'
+    if any('/jinja2/' in a or a.endswith('.html') for a in archivos):
+        return 'template'
+    return 'python'
+
+
+def _muestrear():
+    """Hilo que toma las pilas de los requests perfilados."""
+    while True:
+        # Se muestrea con el lock tomado: un request no termina a mitad de una muestra
+        with _lock:
+            hay_activos = bool(_activos)
+            if hay_activos:
+                marcos = sys._current_frames()
+                for ident, perfil in _activos.items():
+                    frame = marcos.get(ident)
+                    if frame is not None:
+                        perfil.muestrear(frame)
+                del marcos
+        if hay_activos:
+            time.sleep(INTERVALO_S)
+        else:
+            _despertar.wait()
+            _despertar.clear()
+
+
+def _iniciar_muestreador():
+    global _muestreador
+    with _lock:
+        if _muestreador is None or not _muestreador.is_alive():
+            _muestreador = threading.Thread(target=_muestrear, name='perfilador', daemon=True)
+            _muestreador.start()
+
+
+# --- Configuración ---
+def get_config_perfilador(forzar=False):
+    """Valores de configuración del perfilador (cacheados CONFIG_TTL_S segundos)."""
+    if forzar or time.monotonic() - _config['leida'] > CONFIG_TTL_S:
+        valores = dict(CLAVES)
+        filas = Configuracion.query.filter(Configuracion.clave.in_(list(CLAVES))).all()
+        valores.update({fila.clave: fila.valor or '' for fila in filas})
+        _config['valores'] = valores
+        _config['leida'] = time.monotonic()
+    return _config['valores']
+
+
+def directorio_perfiles():
+    return current_app.config.get('PERFILADOR_DIRECTORIO') or os.path.join(current_app.instance_path, 'perfiles')
+
+
+def _debe_perfilar():
+    if request.endpoint in (None, 'static') or request.blueprint == 'perfilador':
+        return False
+    config = get_config_perfilador()
+    if config['perfilador_activo'] != '1':
+        return False
+    if config['perfilador_endpoint'] and request.endpoint != config['perfilador_endpoint']:
+        return False
+    if config['perfilador_user_id']:
+        if not current_user.is_authenticated or str(current_user.id) != config['perfilador_user_id']:
+            return False
+    return random.random() * 100 < float(config['perfilador_porcentaje'] or 0)
+
+
+# --- Hooks ---
+@perfilador_bp.before_app_request
+def _empezar_perfil():
+    if not _debe_perfilar():
+        return
+    _iniciar_muestreador()
+    g.perfil = Perfil()
+    g.perfil_inicio = time.perf_counter()
+    with _lock:
+        _activos[threading.get_ident()] = g.perfil
+    _despertar.set()
+
+
+@perfilador_bp.after_app_request
+def _anotar_estado(response):
+    if 'perfil' in g:
+        g.perfil_estado = response.status_code
+    return response
+
+
+@perfilador_bp.teardown_app_request
+def _terminar_perfil(exc):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return
+    with _lock:
+        _activos.pop(threading.get_ident(), None)
+
+    duracion_ms = (time.perf_counter() - g.pop('perfil_inicio')) * 1000
+    umbral_ms = float(get_config_perfilador()['perfilador_umbral_ms'] or 0)
+    if duracion_ms < umbral_ms or not perfil.pilas:
+        return
+    try:
+        guardar_perfil(perfil, duracion_ms, g.get('perfil_estado', 500))
+    except OSError as e:
+        current_app.logger.warning('No se pudo guardar el perfil: %s', e)
+
+
+def guardar_perfil(perfil, duracion_ms, estado):
+    """Escribe el .folded y el .json del perfil y borra los más viejos."""
+    directorio = directorio_perfiles()
+    os.makedirs(directorio, exist_ok=True)
+    ahora = datetime.now()
+    base = f'{ahora:%Y%m%d_%H%M%S_%f}_{request.endpoint}'
+
+    with open(os.path.join(directorio, base + '.folded'), 'w', encoding='utf-8') as archivo:
+        for pila, cantidad in perfil.pilas.most_common():
+            archivo.write(f'{pila} {cantidad}\n')
+
+    muestras = sum(perfil.categorias.values())
+    resumen = {
+        'archivo': base + '.folded',
+        'fecha': ahora.isoformat(timespec='seconds'),
+        'endpoint': request.endpoint,
+        'ruta': request.full_path.rstrip('?'),
+        'metodo': request.method,
+        'estado': estado,
+        'user_id': current_user.id if current_user.is_authenticated else None,
+        'duracion_ms': round(duracion_ms, 1),
+        'muestras': muestras,
+        'intervalo_ms': INTERVALO_S * 1000,
+        # Tiempo aproximado por categoría (muestras x intervalo)
+        'categorias_ms': {c: round(perfil.categorias[c] * INTERVALO_S * 1000, 1) for c in CATEGORIAS},
+    }
+    with open(os.path.join(directorio, base + '.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(resumen, archivo, ensure_ascii=False)
+
+    _rotar(directorio, current_app.config['PERFILADOR_MAX_ARCHIVOS'])
+
+
+def _rotar(directorio, maximo):
+    resumenes = sorted(n for n in os.listdir(directorio) if n.endswith('.json'))
+    for nombre in resumenes[:max(len(resumenes) - maximo, 0)]:
+        for extension in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(directorio, nombre[:-5] + extension))
+            except FileNotFoundError:
+                pass
+
+
+def perfiles_recientes(limite=MAX_PERFILES_LISTADOS):
+    directorio = directorio_perfiles()
+    if not os.path.isdir(directorio):
+        return []
+    resumenes = []
+    for nombre in sorted((n for n in os.listdir(directorio) if n.endswith('.json')), reverse=True)[:limite]:
+        try:
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as archivo:
+                resumenes.append(json.load(archivo))
+        except (OSError, ValueError):
+            continue
+    return resumenes
+
+
+# -----------------------------------------------
+# RUTA: PERFILADOR (Admin)
+# -----------------------------------------------
+@perfilador_bp.route('/admin/perfilador', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def perfilador():
+    """Activa/configura el perfilador y lista los últimos perfiles lentos."""
+    if request.method == 'POST':
+        try:
+            porcentaje = float(request.form.get('porcentaje') or 0)
+            umbral_ms = int(request.form.get('umbral_ms') or 0)
+            user_id = request.form.get('user_id', '').strip()
+            if not 0 <= porcentaje <= 100:
+                raise ValueError('El porcentaje debe estar entre 0 y 100.')
+            if umbral_ms < 0 or (user_id and not user_id.isdigit()):
+                raise ValueError('Umbral o usuario inválido.')
+
+            nuevos = {
+                'perfilador_activo': '1' if request.form.get('activo') else '0',
+                'perfilador_endpoint': request.form.get('endpoint', '').strip(),
+                'perfilador_user_id': user_id,
+                'perfilador_porcentaje': f'{porcentaje:g}',
+                'perfilador_umbral_ms': str(umbral_ms),
+            }
+            existentes = {
+                c.clave: c for c in Configuracion.query.filter(Configuracion.clave.in_(list(CLAVES))).all()
+            }
+            for clave, valor in nuevos.items():
+                if clave in existentes:
+                    existentes[clave].valor = valor
+                else:
+                    db.session.add(Configuracion(clave=clave, valor=valor))
+            db.session.commit()
+            get_config_perfilador(forzar=True)
+            flash('Configuración del perfilador guardada.', 'success')
+        except ValueError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al guardar la configuración: {str(e)}', 'danger')
+        return redirect(url_for('perfilador.perfilador'))
+
+    endpoints = sorted({
+        r.endpoint for r in current_app.url_map.iter_rules()
+        if r.endpoint != 'static' and not r.endpoint.startswith('perfilador.')
+    })
+    return render_template(
+        'perfilador.html',
+        config=get_config_perfilador(forzar=True),
+        perfiles=perfiles_recientes(),
+        endpoints=endpoints,
+        categorias=CATEGORIAS,
+        intervalo_ms=f'{INTERVALO_S * 1000:g}'
+    )
+
+
+@perfilador_bp.route('/admin/perfilador/<nombre>')
+@login_required
+@admin_required
+def descargar_perfil(nombre):
+    """Descarga un perfil en formato folded (para flamegraph.pl o speedscope)."""
+    if not nombre.endswith('.folded'):
+        abort(404)
+    return send_from_directory(directorio_perfiles(), nombre, as_attachment=True, mimetype='text/plain')
@@ -0,0 +1,255 @@
+"""
+Templates: caché de bytecode en disco y caché de fragmentos en memoria.
+
+Caché de bytecode: Jinja guarda cada template compilado en PLANTILLAS_BYTECODE
+(por defecto instance/jinja). Un worker nuevo lo carga en lugar de volver a
+compilar el template; si el archivo fuente cambió, Jinja lo recompila solo.
+
+    flask plantillas precompilar   # en cada deploy, antes de levantar los workers
+
+Caché de fragmentos: un bloque caro que cambia poco se renderiza una vez y se
+reutiliza mientras no cambie su clave:
+
+    {% cache 'sidebar', current_user.role %} ... {% endcache %}
+    {% cache 'opciones-clientes', version_datos('cliente') %} ... {% endcache %}
+
+La clave es el template, el nombre del fragmento y los valores que siguen: todo
+lo que cambie el HTML del bloque tiene que estar en la clave (el rol, la versión
+de los datos de version_datos, etc.). No sirve para lo que cambia con cada
+venta: la versión de 'producto' sube en cada una (por el stock), así que las
+listas de productos con su stock no se cachean. Cada worker tiene su propio
+caché, un LRU acotado a PLANTILLAS_FRAGMENTOS_KB; con 0, o con recarga de
+templates (debug), los bloques se renderizan siempre.
+
+    flask plantillas medir --usuario admin   # tiempos con y sin cachés
+"""
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import before_render_template, template_rendered, url_for
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError, nodes
+from jinja2.ext import Extension
+
+from . import versiones
+
+# Las páginas más pesadas: listas de productos y clientes, reportes y el menú de admin
+PAGINAS = (
+    'main.index',
+    'main.nueva_venta',
+    'main.ajuste_inventario',
+    'main.gestionar_productos',
+    'libro_iva.libro_iva',
+)
+
+
+class Fragmentos:
+    """LRU de fragmentos renderizados, acotado por tamaño (caracteres); uno por worker."""
+
+    def __init__(self, maximo=0):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+        self._tamanio = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, generar):
+        if self.maximo <= 0:
+            return generar()
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return valor
+            self.fallos += 1
+        # Fuera del lock: el bloque puede consultar la base
+        valor = generar()
+        if len(valor) <= self.maximo:
+            with self._lock:
+                anterior = self._datos.pop(clave, None)
+                if anterior is not None:
+                    self._tamanio -= len(anterior)
+                self._datos[clave] = valor
+                self._tamanio += len(valor)
+                while self._tamanio > self.maximo:
+                    _, viejo = self._datos.popitem(last=False)
+                    self._tamanio -= len(viejo)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._tamanio = 0
+
+
+class FragmentoCache(Extension):
+    """Etiqueta {% cache 'nombre', clave... %} ... {% endcache %}."""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragmentos=Fragmentos())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        clave = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            clave.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(['name:endcache'], drop_needle=True)
+        llamada = self.call_method('_fragmento', [nodes.Const(parser.name), nodes.Tuple(clave, 'load')])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _fragmento(self, plantilla, clave, caller):
+        return self.environment.fragmentos.obtener((plantilla, *clave), caller)
+
+
+def version_datos(*tablas):
+    """Versiones de las tablas (ver versiones.py), para usar como clave de un fragmento."""
+    return tuple(version for version, _ in versiones.leer(tablas).values())
+
+
+# --- Mediciones ---
+def _compilables(env):
+    """Templates HTML que compilan; los que no, con su error."""
+    nombres, errores = [], []
+    for nombre in env.list_templates(filter_func=lambda n: n.endswith('.html')):
+        try:
+            env.get_template(nombre)
+            nombres.append(nombre)
+        except TemplateSyntaxError as e:
+            errores.append((nombre, e))
+    return nombres, errores
+
+
+def medir_compilacion(app):
+    """Segundos para cargar todos los templates desde el fuente y desde el caché de bytecode."""
+    env = app.jinja_env
+    bytecode = env.bytecode_cache
+    nombres, errores = _compilables(env)  # de paso deja el caché de bytecode al día
+    tiempos = {}
+    try:
+        for modo, cache in (('fuente', None), ('bytecode', bytecode)):
+            env.bytecode_cache = cache
+            env.cache.clear()
+            inicio = time.perf_counter()
+            for nombre in nombres:
+                env.get_template(nombre)
+            tiempos[modo] = time.perf_counter() - inicio
+    finally:
+        env.bytecode_cache = bytecode
+        env.cache.clear()
+    return len(nombres), tiempos, errores
+
+
+def medir_paginas(app, user_id, repeticiones):
+    """
+    {(endpoint, modo): (ms de render, ms del request, código HTTP)}, medianas por modo.
+    No hay ventas entre los requests: los fragmentos que dependen de una versión
+    que cambia con cada venta acertarían acá y no en la caja.
+    """
+    fragmentos = app.jinja_env.fragmentos
+    configurado = fragmentos.maximo
+    maximo = (app.config['PLANTILLAS_FRAGMENTOS_KB'] or 8192) * 1024
+    with app.test_request_context():
+        urls = [(e, url_for(e)) for e in PAGINAS if e in app.view_functions]
+
+    render = {}
+
+    def antes(sender, template, context, **extra):
+        render['inicio'] = time.perf_counter()
+
+    def despues(sender, template, context, **extra):
+        render['ms'] = (time.perf_counter() - render['inicio']) * 1000
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(user_id)
+        sesion['_fresh'] = True
+
+    resultados = {}
+    try:
+        with before_render_template.connected_to(antes, app), template_rendered.connected_to(despues, app):
+            for endpoint, url in urls:
+                for modo, limite in (('sin fragmentos', 0), ('con fragmentos', maximo)):
+                    fragmentos.maximo = limite
+                    fragmentos.limpiar()
+                    cliente.get(url)  # primera vez: compila el template y llena el caché
+                    ms_render, ms_total = [], []
+                    for _ in range(repeticiones):
+                        render.clear()
+                        inicio = time.perf_counter()
+                        respuesta = cliente.get(url)
+                        ms_total.append((time.perf_counter() - inicio) * 1000)
+                        if 'ms' in render:
+                            ms_render.append(render['ms'])
+                    resultados[(endpoint, modo)] = (
+                        statistics.median(ms_render) if ms_render else None,
+                        statistics.median(ms_total),
+                        respuesta.status_code,
+                    )
+    finally:
+        fragmentos.maximo = configurado
+        fragmentos.limpiar()
+    return resultados
+
+
+def init_app(app):
+    """Configura los cachés de templates y registra los comandos `flask plantillas`."""
+    env = app.jinja_env
+    directorio = app.config['PLANTILLAS_BYTECODE'] or os.path.join(app.instance_path, 'jinja')
+    os.makedirs(directorio, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(directorio)
+
+    env.add_extension(FragmentoCache)
+    recarga = app.debug or app.config.get('TEMPLATES_AUTO_RELOAD')
+    env.fragmentos.maximo = 0 if recarga else app.config['PLANTILLAS_FRAGMENTOS_KB'] * 1024
+    app.add_template_global(version_datos)
+
+    @app.cli.group('plantillas')
+    def plantillas_cli():
+        """Cachés de templates."""
+
+    @plantillas_cli.command('precompilar')
+    def precompilar_cmd():
+        """Compila todos los templates y los deja en el caché de bytecode."""
+        env.cache.clear()
+        inicio = time.perf_counter()
+        nombres, errores = _compilables(env)
+        click.echo(f'{len(nombres)} templates en {directorio} ({time.perf_counter() - inicio:.2f} s).')
+        for nombre, error in errores:
+            click.echo(f'  - {nombre}: {error}', err=True)
+        if errores:
+            raise SystemExit(1)
+
+    @plantillas_cli.command('medir')
+    @click.option('--usuario', required=True, help='Usuario con el que se piden las páginas (el rol cambia el menú).')
+    @click.option('--repeticiones', default=20, show_default=True, type=click.IntRange(min=1), help='Requests medidos por página y modo.')
+    def medir_cmd(usuario, repeticiones):
+        """Tiempos de carga de templates y de render de las páginas más pesadas, con y sin cachés."""
+        from .models import User
+
+        user = User.query.filter_by(username=usuario).first()
+        if user is None:
+            raise click.UsageError(f'No existe el usuario {usuario}.')
+        user_id = user.id
+
+        cantidad, tiempos, errores = medir_compilacion(app)
+        click.echo(f'Carga de {cantidad} templates en un worker nuevo:')
+        click.echo(f'  compilando el fuente:     {tiempos["fuente"] * 1000:8.1f} ms')
+        click.echo(f'  desde caché de bytecode:  {tiempos["bytecode"] * 1000:8.1f} ms')
+        for nombre, error in errores:
+            click.echo(f'  (no compila {nombre}: {error})')
+
+        resultados = medir_paginas(app, user_id, repeticiones)
+        click.echo(f'\nMedianas de {repeticiones} requests como {usuario}:')
+        click.echo(f'{"Endpoint":28} {"Modo":15} {"Render ms":>10} {"Request ms":>11} {"HTTP":>5}')
+        for (endpoint, modo), (ms_render, ms_total, codigo) in resultados.items():
+            render_txt = f'{ms_render:10.2f}' if ms_render is not None else f'{"-":>10}'
+            click.echo(f'{endpoint:28} {modo:15} {render_txt} {ms_total:11.2f} {codigo:>5}')
+        f = env.fragmentos
+        click.echo(f'\nFragmentos: {f.aciertos} aciertos, {f.fallos} fallos.')
@@ -0,0 +1,318 @@
+"""
+POS sin conexión: la caja sigue vendiendo aunque se caiga la red.
+
+nueva_venta.html registra un service worker (/ventas/sw.js) que guarda la
+página y sus assets, y pos.js guarda en IndexedDB el catálogo de
+/api/pos/catalogo. Cada venta se guarda primero en el navegador con un uuid
+propio y se manda en lote a /api/pos/sincronizar apenas hay conexión.
+
+Con conexión, el POS controla antes de guardar la venta lo mismo que la venta
+en línea: que el usuario tenga una jornada activa (el catálogo la informa) y
+que alcance el stock del catálogo recién pedido.
+
+Sin conexión, la venta ya ocurrió (el cliente se fue con la mercadería), así que
+el servidor no la rechaza por stock o precio: la registra con la hora y el
+precio de la caja y anota los conflictos (stock insuficiente, precio distinto
+del vigente, jornada cerrada, mes cerrado en el Libro IVA: en ese caso queda
+con la fecha del día) para revisarlos en /admin/pos/conflictos. Una venta hecha
+sin jornada abierta va a la primera jornada que el usuario abrió después; si
+todavía no abrió ninguna, queda en el POS hasta que la abra. Solo se rechazan
+las ventas que no se pueden registrar (ej: un producto borrado).
+Reenviar el mismo uuid devuelve el resultado anterior sin duplicar la venta.
+"""
+import datetime
+import decimal
+import hashlib
+import uuid as uuidlib
+
+from flask import Blueprint, current_app, flash, jsonify, make_response, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+
+from .models import (
+    db, Cliente, DetalleVenta, Jornada, MovimientoStock, Producto, Venta, VentaSincronizada
+)
+from .decorators import admin_required
+from .assets import asset_urls
+from .codigos import codigos_por_producto
+from .fiscal import encolar_factura
+from .impuestos import liquidar
+from .libro_iva import periodo_cerrado
+from .respuestas import condicional
+
+pos_bp = Blueprint('pos', __name__)
+
+MAX_VENTAS_POR_LOTE = 100
+CENTAVO = decimal.Decimal('0.01')
+
+
+class VentaInvalida(Exception):
+    """La venta no se puede registrar tal como vino del POS."""
+    pass
+
+
+class SinJornada(Exception):
+    """No hay jornada a la cual asignar la venta: el POS la vuelve a mandar más tarde."""
+    pass
+
+
+# --- Registro de una venta hecha sin conexión ---
+def _leer_venta(datos):
+    """Valida y normaliza lo que manda el POS."""
+    try:
+        uid = str(uuidlib.UUID(str(datos['uuid'])))
+        creada = datetime.datetime.fromisoformat(str(datos['creada']).replace('Z', '+00:00'))
+        if creada.tzinfo is None:
+            creada = creada.astimezone()
+        items = [{
+            'producto_id': int(i['producto_id']),
+            'cantidad': int(i['cantidad']),
+            'precio_unitario': decimal.Decimal(str(i['precio_unitario'])).quantize(CENTAVO),
+        } for i in datos['items']]
+        cliente_id = int(datos['cliente_id']) if datos.get('cliente_id') else None
+    except (KeyError, TypeError, ValueError, decimal.InvalidOperation) as e:
+        raise VentaInvalida(f'Datos de venta inválidos: {e}')
+    if not items or any(i['cantidad'] <= 0 or i['precio_unitario'] <= 0 for i in items):
+        raise VentaInvalida('La venta no tiene productos válidos.')
+    if not datos.get('metodo_pago'):
+        raise VentaInvalida('La venta no tiene método de pago.')
+    # Un reloj de caja adelantado no puede dejar ventas en el futuro
+    return uid, min(creada, datetime.datetime.now(datetime.timezone.utc)), items, cliente_id
+
+
+def _jornada_de(user_id, creada):
+    return Jornada.query.filter(
+        Jornada.user_id == user_id,
+        Jornada.hora_inicio <= creada,
+        or_(Jornada.hora_fin.is_(None), Jornada.hora_fin >= creada)
+    ).order_by(Jornada.hora_inicio.desc()).first()
+
+
+def _jornada_siguiente(user_id, creada):
+    """Primera jornada que el usuario abrió después de la venta (la activa, si es la única)."""
+    return Jornada.query.filter(
+        Jornada.user_id == user_id, Jornada.hora_inicio > creada
+    ).order_by(Jornada.hora_inicio).first()
+
+
+def registrar_venta_sincronizada(datos, user_id):
+    """
+    Registra una venta del POS (dentro de la transacción del llamador) y
+    devuelve su VentaSincronizada. Si el uuid ya llegó, devuelve la existente.
+    """
+    uid, creada, items, cliente_id = _leer_venta(datos)
+    existente = db.session.get(VentaSincronizada, uid)
+    if existente is not None:
+        return existente
+
+    sincronizada = VentaSincronizada(uuid=uid, user_id=user_id, creada=creada, datos=datos)
+    ids = sorted({i['producto_id'] for i in items})
+    # Mismo orden de bloqueo que el resto de las escrituras de stock
+    productos = {p.id: p for p in Producto.query.filter(Producto.id.in_(ids)).order_by(Producto.id).with_for_update()}
+    faltantes = [pid for pid in ids if pid not in productos]
+    if cliente_id and db.session.get(Cliente, cliente_id) is None:
+        faltantes.append(f'cliente {cliente_id}')
+    if faltantes:
+        sincronizada.estado = 'rechazada'
+        sincronizada.conflictos = [{'tipo': 'inexistente', 'detalle': str(f)} for f in faltantes]
+        db.session.add(sincronizada)
+        return sincronizada
+
+    conflictos = []
+    jornada = _jornada_de(user_id, creada)
+    if jornada is None:
+        jornada = _jornada_siguiente(user_id, creada)
+        if jornada is None:
+            raise SinJornada('No hay una jornada abierta: la venta se registra cuando se abra una.')
+        conflictos.append({
+            'tipo': 'jornada',
+            'detalle': f'No había una jornada abierta a esa hora: se registró en la jornada #{jornada.id}'
+                       + ('.' if jornada.activa else ', que ya está cerrada (revisar el arqueo).')
+        })
+    elif not jornada.activa:
+        conflictos.append({'tipo': 'jornada', 'detalle': f'La jornada #{jornada.id} ya estaba cerrada (revisar el arqueo).'})
+    if periodo_cerrado(creada) is not None:
+        # El libro de ese mes ya se presentó: la venta entra en el mes en curso
+        conflictos.append({'tipo': 'periodo', 'detalle': f'El mes {creada:%m/%Y} ya estaba cerrado en el Libro IVA: se registró con la fecha de hoy.'})
+        creada = datetime.datetime.now(datetime.timezone.utc)
+
+    ganancia = decimal.Decimal(0)
+    lineas = []
+    for item in items:
+        producto = productos[item['producto_id']]
+        if producto.stock < item['cantidad']:
+            conflictos.append({
+                'tipo': 'stock', 'producto_id': producto.id, 'nombre': producto.nombre,
+                'stock': producto.stock, 'cantidad': item['cantidad']
+            })
+        if item['precio_unitario'] != producto.precio:
+            conflictos.append({
+                'tipo': 'precio', 'producto_id': producto.id, 'nombre': producto.nombre,
+                'precio_cobrado': str(item['precio_unitario']), 'precio_actual': str(producto.precio)
+            })
+        ganancia += (item['precio_unitario'] - producto.precio_costo) * item['cantidad']
+        lineas.append((producto, item))
+    # Con el precio cobrado en la caja y la alícuota actual del producto, igual que nueva_venta
+    liquidacion = liquidar(
+        (item['precio_unitario'] * item['cantidad'], producto.alicuota_iva) for producto, item in lineas
+    )
+
+    venta = Venta(
+        fecha=creada,
+        total=liquidacion.total,
+        ganancia_bruta_total=ganancia,
+        total_neto_gravado=liquidacion.neto,
+        total_monto_iva=liquidacion.iva,
+        user_id=user_id,
+        jornada_id=jornada.id,
+        estado='completada',
+        cliente_id=cliente_id,
+        metodo_pago=datos['metodo_pago']
+    )
+    db.session.add(venta)
+    db.session.flush()
+    for (producto, item), linea in zip(lineas, liquidacion.lineas):
+        producto.stock -= item['cantidad']
+        db.session.add(DetalleVenta(
+            venta_id=venta.id,
+            producto_id=producto.id,
+            cantidad=item['cantidad'],
+            precio_unitario=item['precio_unitario'],
+            precio_costo_unitario=producto.precio_costo,
+            neto_gravado=linea.neto,
+            monto_iva=linea.iva,
+            alicuota_iva=producto.alicuota_iva
+        ))
+        # El movimiento lleva la hora de registro: los cortes de stock suponen un libro que solo crece
+        db.session.add(MovimientoStock(
+            producto_id=producto.id, cantidad=-item['cantidad'], tipo='Venta', user_id=user_id
+        ))
+    encolar_factura(venta)
+
+    sincronizada.venta_id = venta.id
+    sincronizada.estado = 'conflicto' if conflictos else 'registrada'
+    sincronizada.conflictos = conflictos or None
+    db.session.add(sincronizada)
+    return sincronizada
+
+
+def _resultado(sincronizada):
+    return {
+        'uuid': sincronizada.uuid,
+        'estado': sincronizada.estado,
+        'venta_id': sincronizada.venta_id,
+        'conflictos': sincronizada.conflictos or [],
+        'recibo': url_for('main.recibo_venta', venta_id=sincronizada.venta_id) if sincronizada.venta_id else None,
+    }
+
+
+# -----------------------------------------------
+# RUTA: SERVICE WORKER DEL POS
+# -----------------------------------------------
+@pos_bp.route('/ventas/sw.js')
+def service_worker():
+    """Service worker con la lista de assets a guardar (cambia con cada build)."""
+    assets = [url for bundle in ('app.css', 'app.js', 'pos.js') for url in asset_urls(bundle)]
+    version = hashlib.md5(repr(assets).encode('utf-8')).hexdigest()[:12]
+    respuesta = make_response(render_template('pos_sw.js', assets=assets, version=version))
+    respuesta.mimetype = 'application/javascript'
+    # El navegador tiene que ver enseguida un service worker nuevo
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+# -----------------------------------------------
+# RUTA: API - CATÁLOGO PARA EL POS
+# -----------------------------------------------
+@pos_bp.route('/api/pos/catalogo')
+@login_required
+@condicional('producto', 'cliente', 'codigo_producto', 'jornada')
+def catalogo():
+    """Productos y clientes que el POS guarda en IndexedDB para vender sin conexión, y la jornada activa."""
+    productos = db.session.query(
+        Producto.id, Producto.nombre, Producto.precio, Producto.stock
+    ).order_by(Producto.nombre).all()
+    clientes = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.documento_fiscal
+    ).order_by(Cliente.nombre).all()
+    codigos = codigos_por_producto()
+    jornada = Jornada.query.filter_by(user_id=current_user.id, activa=True).first()
+    return jsonify(
+        generado=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        jornada={'id': jornada.id, 'hora_inicio': jornada.hora_inicio.isoformat()} if jornada else None,
+        productos=[{
+            'id': p.id, 'nombre': p.nombre, 'precio': str(p.precio), 'stock': p.stock,
+            'codigos': codigos.get(p.id, [])
+        } for p in productos],
+        clientes=[{'id': c.id, 'nombre': c.nombre, 'documento_fiscal': c.documento_fiscal} for c in clientes]
+    )
+
+
+# -----------------------------------------------
+# RUTA: API - SINCRONIZAR VENTAS DEL POS
+# -----------------------------------------------
+@pos_bp.route('/api/pos/sincronizar', methods=['POST'])
+@login_required
+def sincronizar():
+    """Registra en lote las ventas guardadas en el navegador: {"ventas": [...]}."""
+    datos = request.get_json(silent=True) or {}
+    ventas = datos.get('ventas')
+    if not isinstance(ventas, list) or len(ventas) > MAX_VENTAS_POR_LOTE:
+        return jsonify({'success': False, 'error': f'Se esperan hasta {MAX_VENTAS_POR_LOTE} ventas.'}), 400
+
+    resultados = []
+    for venta in ventas:
+        # Cada venta en su savepoint: una inválida no frena a las demás
+        try:
+            with db.session.begin_nested():
+                resultados.append(_resultado(registrar_venta_sincronizada(venta, current_user.id)))
+        except VentaInvalida as e:
+            resultados.append({'uuid': venta.get('uuid') if isinstance(venta, dict) else None,
+                               'estado': 'invalida', 'error': str(e)})
+        except SinJornada as e:
+            resultados.append({'uuid': venta.get('uuid'), 'estado': 'reintentar', 'error': str(e)})
+        except IntegrityError:
+            # Otra pestaña mandó el mismo uuid al mismo tiempo: el próximo envío ve el resultado
+            resultados.append({'uuid': venta.get('uuid'), 'estado': 'reintentar'})
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Error al sincronizar ventas del POS')
+        return jsonify({'success': False, 'error': f'Error al sincronizar: {str(e)}'}), 500
+    return jsonify(success=True, resultados=resultados)
+
+
+# -----------------------------------------------
+# RUTA: CONFLICTOS DEL POS (Admin)
+# -----------------------------------------------
+@pos_bp.route('/admin/pos/conflictos')
+@login_required
+@admin_required
+def conflictos():
+    """Ventas sin conexión con diferencias de stock, precio o jornada, para revisar."""
+    lista = VentaSincronizada.query.options(
+        db.joinedload(VentaSincronizada.user)
+    ).filter(
+        VentaSincronizada.estado.in_(['conflicto', 'rechazada'])
+    ).order_by(VentaSincronizada.recibida).limit(200).all()
+    return render_template('pos_conflictos.html', ventas=lista)
+
+
+@pos_bp.route('/admin/pos/conflictos/<uuid>/revisar', methods=['POST'])
+@login_required
+@admin_required
+def revisar_conflicto(uuid):
+    """Marca un conflicto como revisado (ej: después de ajustar el stock)."""
+    sincronizada = VentaSincronizada.query.get_or_404(uuid)
+    try:
+        sincronizada.estado = 'revisada'
+        sincronizada.revisada_por_id = current_user.id
+        sincronizada.revisada = func.now()
+        db.session.commit()
+        flash('Venta marcada como revisada.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al marcar la venta: {str(e)}', 'danger')
+    return redirect(url_for('pos.conflictos'))
@@ -0,0 +1,321 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import func, select, text
+import click
+import datetime
+import decimal
+
+from .models import db, Producto, ActualizacionPrecios, HistorialPrecio
+from .decorators import admin_required
+from .respuestas import condicional
+from .versiones import marcar
+from .trabajos import tarea, encolar
+
+precios_bp = Blueprint('precios', __name__)
+
+ORIGEN_ACTUALIZACION_MASIVA = 'Actualización Masiva'
+CAMPOS_VALIDOS = ('precio', 'precio_costo', 'ambos')
+MODOS_VALIDOS = ('porcentaje', 'monto')
+ESTADOS_STOCK = {
+    'sin_stock': 'stock <= 0',
+    'bajo': 'stock > 0 AND stock <= stock_minimo',
+    'normal': 'stock > stock_minimo',
+}
+# Margen sobre el precio de venta; NULL (no entra en ningún filtro de margen) si el precio es 0
+MARGEN_SQL = '(precio - precio_costo) * 100 / NULLIF(precio, 0)'
+
+
+# --- Funciones Helper ---
+def registrar_cambio_precio(producto, precio_anterior, costo_anterior, origen, user_id=None):
+    """Agrega al historial el cambio de precio de un producto (si hubo cambio)."""
+    if producto.precio == precio_anterior and producto.precio_costo == costo_anterior:
+        return None
+    cambio = HistorialPrecio(
+        producto_id=producto.id,
+        precio_anterior=precio_anterior,
+        precio_nuevo=producto.precio,
+        precio_costo_anterior=costo_anterior,
+        precio_costo_nuevo=producto.precio_costo,
+        origen=origen,
+        user_id=user_id
+    )
+    db.session.add(cambio)
+    return cambio
+
+
+def _nuevo_valor_sql(columna, aplicar, modo):
+    """Expresión SQL con el nuevo valor de una columna (o la columna sin cambios)."""
+    if not aplicar:
+        return columna
+    if modo == 'porcentaje':
+        return f'round({columna} * (1 + :valor / 100.0), 2)'
+    return f'({columna} + :valor)'
+
+
+def _filtros_sql(actualizacion):
+    """Arma el WHERE (con parámetros) a partir de los filtros de la actualización."""
+    condiciones = ['TRUE']
+    parametros = {}
+    if actualizacion.filtro_nombre:
+        condiciones.append('nombre ILIKE :filtro_nombre')
+        parametros['filtro_nombre'] = f'%{actualizacion.filtro_nombre}%'
+    if actualizacion.margen_min is not None:
+        condiciones.append(f'{MARGEN_SQL} >= :margen_min')
+        parametros['margen_min'] = actualizacion.margen_min
+    if actualizacion.margen_max is not None:
+        condiciones.append(f'{MARGEN_SQL} <= :margen_max')
+        parametros['margen_max'] = actualizacion.margen_max
+    if actualizacion.estado_stock in ESTADOS_STOCK:
+        condiciones.append(ESTADOS_STOCK[actualizacion.estado_stock])
+    return ' AND '.join(condiciones), parametros
+
+
+def aplicar_actualizacion(actualizacion):
+    """
+    Aplica una ActualizacionPrecios en una sola sentencia: bloquea los productos
+    del filtro (en orden de id), los actualiza y agrega cada cambio al historial.
+    Se saltean los productos en los que el resultado dejaría un precio inválido
+    (precio <= 0, costo negativo o costo mayor al precio).
+    """
+    donde, parametros = _filtros_sql(actualizacion)
+    nuevo_precio = _nuevo_valor_sql('precio', actualizacion.campo in ('precio', 'ambos'), actualizacion.modo)
+    nuevo_costo = _nuevo_valor_sql('precio_costo', actualizacion.campo in ('precio_costo', 'ambos'), actualizacion.modo)
+
+    resultado = db.session.execute(text(f"""
+        WITH objetivo AS (
+            SELECT id, precio, precio_costo,
+                   {nuevo_precio} AS precio_nuevo,
+                   {nuevo_costo} AS precio_costo_nuevo
+            FROM producto
+            WHERE {donde}
+            ORDER BY id
+            FOR UPDATE
+        ),
+        cambiados AS (
+            UPDATE producto p
+            SET precio = o.precio_nuevo, precio_costo = o.precio_costo_nuevo
+            FROM objetivo o
+            WHERE p.id = o.id
+              AND o.precio_nuevo > 0
+              AND o.precio_costo_nuevo >= 0
+              AND o.precio_costo_nuevo <= o.precio_nuevo
+              AND (o.precio_nuevo <> o.precio OR o.precio_costo_nuevo <> o.precio_costo)
+            RETURNING p.id, o.precio AS precio_anterior, p.precio AS precio_nuevo,
+                      o.precio_costo AS precio_costo_anterior, p.precio_costo AS precio_costo_nuevo
+        ),
+        historial AS (
+            INSERT INTO historial_precio (
+                fecha, producto_id, precio_anterior, precio_nuevo,
+                precio_costo_anterior, precio_costo_nuevo, origen, actualizacion_id, user_id
+            )
+            SELECT now(), id, precio_anterior, precio_nuevo,
+                   precio_costo_anterior, precio_costo_nuevo, :origen, :actualizacion_id, :user_id
+            FROM cambiados
+        )
+        SELECT (SELECT count(*) FROM objetivo) AS seleccionados,
+               (SELECT count(*) FROM cambiados) AS actualizados
+    """), {
+        **parametros,
+        'valor': actualizacion.valor,
+        'origen': ORIGEN_ACTUALIZACION_MASIVA,
+        'actualizacion_id': actualizacion.id,
+        'user_id': actualizacion.user_id
+    }).one()
+    marcar(db.session, 'producto', 'historial_precio') # el UPDATE con text() no lo ve el ORM
+
+    actualizacion.estado = 'aplicada'
+    actualizacion.aplicada = func.now()
+    actualizacion.productos_afectados = resultado.actualizados
+    db.session.commit()
+    return resultado.seleccionados, resultado.actualizados
+
+
+def aplicar_si_pendiente(actualizacion_id):
+    """
+    Aplica la actualización solo si sigue pendiente. El bloqueo de la fila evita
+    que el worker y el comando de cron la apliquen dos veces, y respeta las
+    cancelaciones hechas mientras esperaba en la cola.
+    """
+    actualizacion = ActualizacionPrecios.query.filter_by(id=actualizacion_id).with_for_update().first()
+    if actualizacion is None or actualizacion.estado != 'pendiente':
+        db.session.rollback()
+        return None
+    return aplicar_actualizacion(actualizacion)
+
+
+@tarea('aplicar_precios', api=True)
+def _tarea_aplicar_precios(trabajo, actualizacion_id):
+    aplicada = aplicar_si_pendiente(actualizacion_id)
+    if aplicada is None:
+        return {'aplicada': False}
+    seleccionados, actualizados = aplicada
+    return {'aplicada': True, 'seleccionados': seleccionados, 'actualizados': actualizados}
+
+
+def aplicar_actualizaciones_pendientes():
+    """Aplica, en orden, las actualizaciones programadas cuya vigencia ya llegó."""
+    ids = db.session.scalars(select(ActualizacionPrecios.id).where(
+        ActualizacionPrecios.estado == 'pendiente',
+        ActualizacionPrecios.vigencia <= func.now()
+    ).order_by(ActualizacionPrecios.vigencia, ActualizacionPrecios.id)).all()
+    aplicadas = []
+    for actualizacion_id in ids:
+        if aplicar_si_pendiente(actualizacion_id) is not None:
+            aplicadas.append(db.session.get(ActualizacionPrecios, actualizacion_id))
+    return aplicadas
+
+
+def precios_al(fecha):
+    """
+    Subconsulta (producto_id, precio, precio_costo) con los precios vigentes a una fecha.
+    El precio a la fecha es el 'anterior' del primer cambio posterior a ella;
+    si no hubo cambios después, es el precio actual del producto.
+    """
+    primer_cambio = select(
+        HistorialPrecio.producto_id,
+        HistorialPrecio.precio_anterior,
+        HistorialPrecio.precio_costo_anterior
+    ).where(
+        HistorialPrecio.fecha > fecha
+    ).order_by(
+        HistorialPrecio.producto_id, HistorialPrecio.fecha, HistorialPrecio.id
+    ).distinct(
+        HistorialPrecio.producto_id
+    ).subquery()
+
+    return select(
+        Producto.id.label('producto_id'),
+        func.coalesce(primer_cambio.c.precio_anterior, Producto.precio).label('precio'),
+        func.coalesce(primer_cambio.c.precio_costo_anterior, Producto.precio_costo).label('precio_costo')
+    ).outerjoin(
+        primer_cambio, primer_cambio.c.producto_id == Producto.id
+    ).subquery()
+
+
+def _decimal_o_none(valor):
+    return decimal.Decimal(valor) if valor not in (None, '') else None
+
+
+# -----------------------------------------------
+# RUTA: ACTUALIZACIÓN MASIVA DE PRECIOS
+# -----------------------------------------------
+@precios_bp.route('/productos/precios', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def actualizar_precios():
+    """Muestra el formulario de cambio masivo de precios y las actualizaciones recientes."""
+
+    if request.method == 'POST':
+        try:
+            campo = request.form.get('campo')
+            modo = request.form.get('modo')
+            valor = decimal.Decimal(request.form.get('valor') or '0')
+            vigencia_str = request.form.get('vigencia')
+
+            if campo not in CAMPOS_VALIDOS or modo not in MODOS_VALIDOS or valor == 0:
+                flash('Datos inválidos. Revisa el campo, el tipo de cambio y el valor.', 'danger')
+                return redirect(url_for('precios.actualizar_precios'))
+
+            vigencia = datetime.datetime.now(datetime.timezone.utc)
+            if vigencia_str:
+                vigencia = datetime.datetime.fromisoformat(vigencia_str).astimezone()
+
+            actualizacion = ActualizacionPrecios(
+                campo=campo,
+                modo=modo,
+                valor=valor,
+                vigencia=vigencia,
+                filtro_nombre=request.form.get('filtro_nombre') or None,
+                margen_min=_decimal_o_none(request.form.get('margen_min')),
+                margen_max=_decimal_o_none(request.form.get('margen_max')),
+                estado_stock=request.form.get('estado_stock') or None,
+                user_id=current_user.id
+            )
+            db.session.add(actualizacion)
+            db.session.flush()
+
+            # La aplica el worker: enseguida, o cuando llegue la vigencia si es programada
+            trabajo = encolar(
+                'aplicar_precios', {'actualizacion_id': actualizacion.id},
+                user_id=current_user.id, disponible_desde=vigencia
+            )
+            db.session.commit()
+            if vigencia <= datetime.datetime.now(datetime.timezone.utc):
+                flash(f'Actualización de precios encolada (trabajo #{trabajo.id}).', 'info')
+            else:
+                flash(f'Actualización programada para el {vigencia.strftime("%d/%m/%Y %H:%M")} '
+                      f'(trabajo #{trabajo.id}).', 'info')
+
+        except (decimal.InvalidOperation, ValueError):
+            db.session.rollback()
+            flash('Formato de número o fecha inválido.', 'danger')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al actualizar precios: {str(e)}', 'danger')
+
+        return redirect(url_for('precios.actualizar_precios'))
+
+    actualizaciones = ActualizacionPrecios.query.options(
+        db.joinedload(ActualizacionPrecios.user)
+    ).order_by(ActualizacionPrecios.id.desc()).limit(20).all()
+    return render_template('actualizar_precios.html', actualizaciones=actualizaciones)
+
+
+@precios_bp.route('/productos/precios/cancelar/<int:actualizacion_id>', methods=['POST'])
+@login_required
+@admin_required
+def cancelar_actualizacion(actualizacion_id):
+    """Cancela una actualización programada que todavía no se aplicó."""
+    actualizacion = ActualizacionPrecios.query.get_or_404(actualizacion_id)
+    if actualizacion.estado != 'pendiente':
+        flash('Solo se pueden cancelar actualizaciones pendientes.', 'warning')
+    else:
+        actualizacion.estado = 'cancelada'
+        db.session.commit()
+        flash(f'Actualización #{actualizacion.id} cancelada.', 'success')
+    return redirect(url_for('precios.actualizar_precios'))
+
+
+# -----------------------------------------------
+# RUTA: API - MÁRGENES A UNA FECHA
+# -----------------------------------------------
+@precios_bp.route('/api/reporte/margenes_al')
+@login_required
+@admin_required
+@condicional('producto', 'historial_precio')
+def api_margenes_al():
+    """Devuelve precio, costo y margen de cada producto según los precios vigentes a una fecha."""
+    from .inventario import parse_fecha_hora # Import local para evitar importación circular
+    try:
+        fecha = parse_fecha_hora(request.args.get('fecha', '', type=str))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida. Use AAAA-MM-DD o AAAA-MM-DDTHH:MM.'}), 400
+
+    precios = precios_al(fecha)
+    filas = db.session.execute(
+        select(Producto.nombre, precios.c.precio, precios.c.precio_costo).join(
+            precios, precios.c.producto_id == Producto.id
+        ).order_by(Producto.nombre)
+    ).all()
+
+    return jsonify(
+        fecha=fecha.isoformat(),
+        productos=[{
+            'nombre': f.nombre,
+            'precio': float(f.precio),
+            'precio_costo': float(f.precio_costo),
+            'margen': float((f.precio - f.precio_costo) * 100 / f.precio) if f.precio else 0.0
+        } for f in filas]
+    )
+
+
+# -----------------------------------------------
+# COMANDOS CLI (ej: desde cron)
+# -----------------------------------------------
+@precios_bp.cli.command('aplicar')
+def aplicar_command():
+    """Aplica las actualizaciones de precios programadas cuya vigencia ya llegó."""
+    aplicadas = aplicar_actualizaciones_pendientes()
+    for a in aplicadas:
+        click.echo(f'Actualización #{a.id}: {a.productos_afectados} productos.')
+    click.echo(f'{len(aplicadas)} actualizaciones aplicadas.')
@@ -0,0 +1,480 @@
+"""
+Recibos en PDF y en ESC/POS (impresoras térmicas), con caché en disco.
+
+Cada venta se arma una sola vez como lista de líneas de ticket (RECIBOS_ANCHO
+columnas) y de ahí salen el PDF (Courier, ancho de rollo) y los bytes ESC/POS.
+Los archivos se guardan en RECIBOS_DIRECTORIO con la clave
+<venta>-<estado>-<cae|sin_cae>-<versión de configuración>: una anulación, el CAE
+de AFIP o un cambio en los datos de la tienda generan un recibo nuevo; una
+reimpresión solo lee el archivo. Con el comprobante aprobado el ticket lleva
+tipo, número, CAE y vencimiento; si no, es un ticket no válido como factura.
+
+El armado corre en un pool de hilos acotado (RECIBOS_HILOS). Después de cada
+venta nueva su recibo se prepara en segundo plano, así que imprimir no espera.
+
+    /venta/recibo/<id>.pdf | .escpos
+    /jornada/<id>/recibos.pdf | .escpos     (todos los recibos de una jornada)
+    flask recibos renderizar <jornada_id>...
+"""
+import json
+import os
+import tempfile
+import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import click
+from flask import (
+    Blueprint, Response, abort, current_app, flash, has_app_context, redirect, send_file, url_for
+)
+from flask_login import current_user, login_required
+from sqlalchemy import event
+
+from .fiscal import TIPOS
+from .models import db, ComprobanteFiscal, Configuracion, DetalleVenta, Jornada, Venta
+from .replicas import SesionEnrutada
+from .trabajos import tarea
+from .versiones import leer
+
+recibos_bp = Blueprint('recibos', __name__)
+
+FORMATOS = {'pdf': 'application/pdf', 'escpos': 'application/octet-stream'}
+
+# Estados de la venta en el orden en que cambian (para saber qué recibo es más viejo)
+ESTADOS_VENTA = ('completada', 'anulada')
+
+# Estilos de línea (se pueden combinar): negrita, centrado, grande (doble alto y ancho)
+NEGRITA, CENTRADO, GRANDE = 'n', 'c', 'g'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# --- Armado del ticket (funciones puras, sin base de datos) ---
+def datos_venta(venta, config):
+    """Todo lo que necesita el recibo, en tipos simples (se arma en otro hilo)."""
+    comprobante = venta.comprobante_fiscal
+    return {
+        'id': venta.id,
+        'fecha': venta.fecha.strftime('%d/%m/%Y %H:%M'),
+        'estado': venta.estado,
+        'metodo_pago': venta.metodo_pago,
+        'usuario': venta.user.username,
+        'cliente': {
+            'nombre': venta.cliente.nombre,
+            'documento': venta.cliente.documento_fiscal or 'N/A',
+            'condicion_iva': venta.cliente.condicion_iva,
+        } if venta.cliente else None,
+        'items': [
+            (d.producto.nombre, d.cantidad, str(d.precio_unitario)) for d in venta.detalles
+        ],
+        'neto': str(venta.total_neto_gravado),
+        'iva': str(venta.total_monto_iva),
+        'total': str(venta.total),
+        'fiscal': {
+            'tipo': TIPOS.get(comprobante.tipo_comprobante, f'Comprobante {comprobante.tipo_comprobante}'),
+            'numero': f'{comprobante.punto_venta:05d}-{comprobante.numero:08d}',
+            'cae': comprobante.cae,
+            'cae_vencimiento': comprobante.cae_vencimiento.strftime('%d/%m/%Y'),
+        } if comprobante and comprobante.estado == 'aprobado' else None,
+        'tienda': {
+            'nombre': config.get('nombre_tienda') or 'Mi Negocio',
+            'domicilio': config.get('domicilio_tienda'),
+            'cuit': config.get('cuit_tienda'),
+            'condicion_iva': config.get('condicion_iva_tienda'),
+        },
+    }
+
+
+def _columnas(izquierda, derecha, ancho):
+    return izquierda[:ancho - len(derecha) - 1].ljust(ancho - len(derecha)) + derecha
+
+
+def _pesos(valor):
+    return f'${Decimal(valor):.2f}'
+
+
+def armar_lineas(d, ancho):
+    """Lista de (texto, estilo) del ticket."""
+    lineas = []
+
+    def agregar(texto='', estilo=''):
+        largo = ancho // 2 if GRANDE in estilo else ancho
+        for parte in textwrap.wrap(texto, largo) or ['']:
+            lineas.append((parte, estilo))
+
+    tienda = d['tienda']
+    agregar(tienda['nombre'], GRANDE + CENTRADO)
+    if tienda['domicilio']:
+        agregar(tienda['domicilio'], CENTRADO)
+    if tienda['cuit']:
+        agregar(f"CUIT: {tienda['cuit']}", CENTRADO)
+    if tienda['condicion_iva']:
+        agregar(f"Cond. IVA: {tienda['condicion_iva']}", CENTRADO)
+    agregar('-' * ancho)
+    fiscal = d.get('fiscal')
+    if fiscal:
+        agregar(fiscal['tipo'].upper(), NEGRITA + CENTRADO)
+        agregar(f"N°: {fiscal['numero']}", NEGRITA + CENTRADO)
+    else:
+        agregar('TICKET NO VÁLIDO COMO FACTURA', NEGRITA + CENTRADO)
+    agregar(f"Recibo N°: {d['id']:08d}")
+    agregar(f"Fecha: {d['fecha']}")
+    agregar(f"Le atendió: {d['usuario']}")
+    agregar(f"Método de pago: {d['metodo_pago']}")
+    if d['estado'] != 'completada':
+        agregar(f"*** VENTA {d['estado'].upper()} ***", NEGRITA + CENTRADO)
+
+    agregar('-' * ancho)
+    if d['cliente']:
+        agregar(f"Cliente: {d['cliente']['nombre']}")
+        agregar(f"CUIT/DNI: {d['cliente']['documento']}")
+        agregar(f"Cond. IVA: {d['cliente']['condicion_iva']}")
+    else:
+        agregar('Consumidor Final')
+    agregar('-' * ancho)
+
+    for nombre, cantidad, precio in d['items']:
+        agregar(nombre)
+        lineas.append((_columnas(
+            f'  {cantidad} x {_pesos(precio)}', _pesos(Decimal(precio) * cantidad), ancho
+        ), ''))
+
+    agregar('-' * ancho)
+    lineas.append((_columnas('Subtotal Neto:', _pesos(d['neto']), ancho), ''))
+    lineas.append((_columnas('IVA:', _pesos(d['iva']), ancho), ''))
+    lineas.append((_columnas('TOTAL:', _pesos(d['total']), ancho), NEGRITA))
+    if fiscal:
+        agregar('-' * ancho)
+        agregar(f"CAE: {fiscal['cae']}")
+        agregar(f"Vto. CAE: {fiscal['cae_vencimiento']}")
+    agregar()
+    agregar('¡Gracias por su compra!', CENTRADO)
+    return lineas
+
+
+# --- Salidas ---
+ESC, GS = b'\x1b', b'\x1d'
+
+
+def a_escpos(tickets):
+    """Bytes ESC/POS (página de códigos PC850) con avance y corte después de cada ticket."""
+    salida = bytearray(ESC + b'@' + ESC + b't\x02')
+    for lineas in tickets:
+        for texto, estilo in lineas:
+            salida += ESC + b'a' + (b'\x01' if CENTRADO in estilo else b'\x00')
+            salida += ESC + b'E' + (b'\x01' if NEGRITA in estilo or GRANDE in estilo else b'\x00')
+            salida += GS + b'!' + (b'\x11' if GRANDE in estilo else b'\x00')
+            salida += texto.encode('cp850', errors='replace') + b'\n'
+        salida += ESC + b'd\x04' + GS + b'V\x00'
+    return bytes(salida)
+
+
+def _texto_pdf(texto):
+    crudo = texto.encode('cp1252', errors='replace')
+    salida = bytearray()
+    for byte in crudo:
+        if byte in b'\\()':
+            salida += b'\\' + bytes([byte])
+        elif byte < 32 or byte > 126:
+            salida += b'\\%03o' % byte
+        else:
+            salida.append(byte)
+    return bytes(salida)
+
+
+def a_pdf(tickets, ancho):
+    """PDF con una página del ancho del rollo por ticket (Courier, sin dependencias)."""
+    tamano = 8
+    ancho_car = 0.6 * tamano  # Courier: 600 unidades por carácter
+    margen = 12
+    interlineado = tamano * 1.25
+    ancho_pagina = ancho * ancho_car + 2 * margen
+
+    # 1 catálogo, 2 páginas, 3 y 4 fuentes; después página y contenido de cada ticket
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    paginas = []
+    for lineas in tickets:
+        alto = sum(interlineado * (2 if GRANDE in e else 1) for _, e in lineas) + 2 * margen
+        contenido = [b'BT']
+        y = alto - margen
+        for texto, estilo in lineas:
+            escala = 2 if GRANDE in estilo else 1
+            y -= interlineado * escala
+            x = margen
+            if CENTRADO in estilo:
+                x += (ancho - len(texto) * escala) * ancho_car / 2
+            fuente = b'/F2' if NEGRITA in estilo or GRANDE in estilo else b'/F1'
+            contenido.append(b'%s %d Tf 1 0 0 1 %.2f %.2f Tm (%s) Tj' % (
+                fuente, tamano * escala, x, y, _texto_pdf(texto)
+            ))
+        contenido.append(b'ET')
+        flujo = b'\n'.join(contenido)
+
+        numero = len(objetos) + 1
+        objetos.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            % (ancho_pagina, alto, numero + 1)
+        )
+        objetos.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(flujo), flujo))
+        paginas.append(numero)
+    objetos[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % n for n in paginas), len(paginas)
+    )
+
+    salida = bytearray(b'%PDF-1.4\n')
+    posiciones = []
+    for numero, cuerpo in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b'%d 0 obj\n%s\nendobj\n' % (numero, cuerpo)
+    inicio_xref = len(salida)
+    salida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b'%010d 00000 n \n' % posicion
+    salida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+def renderizar(datos, ancho):
+    lineas = armar_lineas(datos, ancho)
+    return {
+        'lineas': json.dumps(lineas, ensure_ascii=False).encode('utf-8'),
+        'pdf': a_pdf([lineas], ancho),
+        'escpos': a_escpos([lineas]),
+    }
+
+
+# --- Caché en disco ---
+def directorio_recibos():
+    return current_app.config.get('RECIBOS_DIRECTORIO') or os.path.join(current_app.instance_path, 'recibos')
+
+
+def _ruta(venta_id, clave, extension):
+    return os.path.join(directorio_recibos(), str(venta_id // 1000), f'{clave}.{extension}')
+
+
+def _clave(venta_id, estado, con_cae, version_config):
+    return f'{venta_id}-{estado}-{"cae" if con_cae else "sin_cae"}-{version_config}'
+
+
+def _anterior(clave, otra):
+    """
+    True si `clave` es una versión vieja del recibo de `otra`: estado, CAE y versión
+    de configuración solo avanzan, así que es vieja si ninguna parte es posterior.
+    """
+    partes = []
+    for k in (clave, otra):
+        campos = k.split('-')
+        if len(campos) != 4:
+            return k == clave  # clave sin la parte del CAE: es de antes
+        _, estado, cae, version = campos
+        if estado not in ESTADOS_VENTA:
+            return False
+        partes.append((ESTADOS_VENTA.index(estado), cae == 'cae', int(version)))
+    return clave != otra and all(a <= b for a, b in zip(*partes))
+
+
+def _guardar(venta_id, clave, archivos):
+    carpeta = os.path.dirname(_ruta(venta_id, clave, 'pdf'))
+    os.makedirs(carpeta, exist_ok=True)
+    for extension, datos in archivos.items():
+        # Temporal propio: otro hilo o worker puede estar guardando el mismo recibo
+        descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=f'.{clave}.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                archivo.write(datos)
+            os.replace(temporal, _ruta(venta_id, clave, extension))
+        except BaseException:
+            os.remove(temporal)
+            raise
+    # Borrar las versiones anteriores del mismo recibo (no las que otro guardó con datos más nuevos)
+    for nombre in os.listdir(carpeta):
+        otra = nombre.split('.')[0]
+        if otra.startswith(f'{venta_id}-') and _anterior(otra, clave):
+            try:
+                os.remove(os.path.join(carpeta, nombre))
+            except FileNotFoundError:
+                pass  # la borró otro guardado
+
+
+def pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=current_app.config['RECIBOS_HILOS'], thread_name_prefix='recibos')
+    return _pool
+
+
+def renderizar_ventas(venta_ids, en_pool=True):
+    """
+    Arma y guarda los recibos que falten de las ventas dadas.
+    Devuelve {venta_id: clave de caché}.
+    """
+    version_config = leer(['configuracion'])['configuracion'][0]
+    estados = db.session.query(Venta.id, Venta.estado, ComprobanteFiscal.estado).outerjoin(
+        ComprobanteFiscal, ComprobanteFiscal.venta_id == Venta.id
+    ).filter(Venta.id.in_(venta_ids)).all()
+    claves = {
+        vid: _clave(vid, estado, estado_fiscal == 'aprobado', version_config)
+        for vid, estado, estado_fiscal in estados
+    }
+    faltantes = [vid for vid, clave in claves.items() if not os.path.exists(_ruta(vid, clave, 'escpos'))]
+    if not faltantes:
+        return claves
+
+    config = {c.clave: c.valor for c in Configuracion.query.all()}
+    ventas = Venta.query.options(
+        db.joinedload(Venta.user),
+        db.joinedload(Venta.cliente),
+        db.joinedload(Venta.comprobante_fiscal),
+        db.joinedload(Venta.detalles).joinedload(DetalleVenta.producto)
+    ).filter(Venta.id.in_(faltantes)).all()
+    todos = [datos_venta(v, config) for v in ventas]
+    ancho = current_app.config['RECIBOS_ANCHO']
+
+    if en_pool:
+        resultados = pool().map(renderizar, todos, [ancho] * len(todos))
+    else:
+        resultados = (renderizar(d, ancho) for d in todos)
+    for datos, archivos in zip(todos, resultados):
+        _guardar(datos['id'], claves[datos['id']], archivos)
+    return claves
+
+
+def recibo(venta_id, formato):
+    """Ruta del archivo del recibo, armándolo si no está en caché."""
+    clave = renderizar_ventas([venta_id])[venta_id]
+    return _ruta(venta_id, clave, formato)
+
+
+def recibos_jornada(jornada_id, formato):
+    """Todos los recibos de una jornada en un solo PDF o flujo ESC/POS."""
+    ids = [vid for (vid,) in db.session.query(Venta.id).filter(
+        Venta.jornada_id == jornada_id
+    ).order_by(Venta.id).all()]
+    if not ids:
+        return None
+    claves = renderizar_ventas(ids)
+    if formato == 'escpos':
+        partes = []
+        for vid in ids:
+            with open(_ruta(vid, claves[vid], 'escpos'), 'rb') as archivo:
+                partes.append(archivo.read())
+        return b''.join(partes)
+    tickets = []
+    for vid in ids:
+        with open(_ruta(vid, claves[vid], 'lineas'), encoding='utf-8') as archivo:
+            tickets.append([tuple(l) for l in json.load(archivo)])
+    return a_pdf(tickets, current_app.config['RECIBOS_ANCHO'])
+
+
+@tarea('recibos_jornada', api=True)
+def _tarea_recibos_jornada(trabajo, jornada_id, lote=200):
+    """Deja en caché los recibos de una jornada (ej: antes de reimprimir el lote)."""
+    ids = [vid for (vid,) in db.session.query(Venta.id).filter(
+        Venta.jornada_id == jornada_id
+    ).order_by(Venta.id).all()]
+    for inicio in range(0, len(ids), lote):
+        renderizar_ventas(ids[inicio:inicio + lote], en_pool=False)
+        hechos = min(inicio + lote, len(ids))
+        trabajo.avance(hechos * 100 // len(ids), f'{hechos} de {len(ids)} recibos')
+    return {'recibos': len(ids)}
+
+
+# --- Preparación en segundo plano de las ventas nuevas ---
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _anotar_ventas(session, flush_context):
+    nuevas = [obj.id for obj in session.new if isinstance(obj, Venta)]
+    if nuevas:
+        session.info.setdefault('recibos_pendientes', set()).update(nuevas)
+
+
+@event.listens_for(SesionEnrutada, 'after_commit')
+def _preparar_recibos(session):
+    ids = session.info.pop('recibos_pendientes', None)
+    if not ids or not has_app_context() or not current_app.config['RECIBOS_PRECALENTAR']:
+        return
+    pool().submit(_preparar, current_app._get_current_object(), sorted(ids))
+
+
+@event.listens_for(SesionEnrutada, 'after_rollback')
+def _descartar_recibos(session):
+    session.info.pop('recibos_pendientes', None)
+
+
+def _preparar(app, venta_ids):
+    with app.app_context():
+        try:
+            renderizar_ventas(venta_ids, en_pool=False)
+        except Exception as e:
+            app.logger.warning('No se pudieron preparar los recibos %s: %s', venta_ids, e)
+        finally:
+            db.session.remove()
+
+
+def _enviar(ruta, formato, nombre):
+    respuesta = send_file(
+        ruta, mimetype=FORMATOS[formato], download_name=f'{nombre}.{formato}',
+        as_attachment=formato == 'escpos', conditional=True, max_age=0
+    )
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+# -----------------------------------------------
+# RUTA: RECIBO EN PDF / ESC/POS
+# -----------------------------------------------
+@recibos_bp.route('/venta/recibo/<int:venta_id>.<any(pdf, escpos):formato>')
+@login_required
+def recibo_venta(venta_id, formato):
+    """Recibo listo para imprimir (desde la caché si ya se armó)."""
+    venta = db.session.query(Venta.user_id).filter(Venta.id == venta_id).first()
+    if venta is None:
+        abort(404)
+    if current_user.role != 'admin' and venta.user_id != current_user.id:
+        flash('No tienes permiso para ver este recibo.', 'danger')
+        return redirect(url_for('main.index'))
+    return _enviar(recibo(venta_id, formato), formato, f'recibo_{venta_id:08d}')
+
+
+# -----------------------------------------------
+# RUTA: RECIBOS DE UNA JORNADA (lote)
+# -----------------------------------------------
+@recibos_bp.route('/jornada/<int:jornada_id>/recibos.<any(pdf, escpos):formato>')
+@login_required
+def recibos_de_jornada(jornada_id, formato):
+    """Todos los recibos de una jornada, para reimprimir en lote."""
+    jornada = Jornada.query.get_or_404(jornada_id)
+    if current_user.role != 'admin' and jornada.user_id != current_user.id:
+        flash('No tienes permiso para ver estos recibos.', 'danger')
+        return redirect(url_for('main.index'))
+
+    datos = recibos_jornada(jornada_id, formato)
+    if datos is None:
+        flash('La jornada no tiene ventas.', 'warning')
+        return redirect(url_for('main.historial_jornadas'))
+    return Response(datos, mimetype=FORMATOS[formato], headers={
+        'Content-Disposition': f'{"attachment" if formato == "escpos" else "inline"}; '
+                               f'filename=recibos_jornada_{jornada_id}.{formato}'
+    })
+
+
+# -----------------------------------------------
+# COMANDOS CLI
+# -----------------------------------------------
+@recibos_bp.cli.command('renderizar')
+@click.argument('jornada_ids', nargs=-1, type=int, required=True)
+def renderizar_cmd(jornada_ids):
+    """Arma por adelantado los recibos de las jornadas indicadas."""
+    for jornada_id in jornada_ids:
+        ids = [vid for (vid,) in db.session.query(Venta.id).filter(Venta.jornada_id == jornada_id).all()]
+        if ids:
+            renderizar_ventas(ids)
+        click.echo(f'Jornada {jornada_id}: {len(ids)} recibos.')
@@ -0,0 +1,283 @@
+"""
+Punto de pedido y sugerencia de compra calculados desde el historial de ventas.
+
+Producto.stock_minimo se carga a mano, así que las alertas de bajo stock no
+dicen mucho. Acá se calcula para todo el catálogo, en una sola pasada con
+NumPy sobre las ventas diarias por producto (agrupadas en la base y bajadas
+con COPY):
+
+    venta diaria media (d) y su desvío (s) en los días con historial
+    punto de pedido  = d * L + z * s * raíz(L)     (L: días de entrega)
+    stock objetivo   = punto de pedido + d * R     (R: días entre compras)
+    a comprar        = objetivo - stock, si el stock llegó al punto de pedido
+
+El stock_minimo sugerido es el punto de pedido redondeado para arriba. Corre
+como trabajo ('reposicion') o con `flask reposicion calcular`; con aplicar
+pisa stock_minimo en los productos con historial suficiente.
+"""
+import csv
+import datetime
+import io
+import os
+import statistics
+import time
+
+import click
+import numpy as np
+from flask import Blueprint, current_app, flash, redirect, render_template, request, send_from_directory, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import text
+
+from .models import db, Producto, Trabajo
+from .decorators import admin_required
+from .trabajos import tarea, encolar, directorio_trabajos, timeout_largo
+from .versiones import marcar
+
+reposicion_bp = Blueprint('reposicion', __name__)
+
+DIAS_MINIMOS = 28        # con menos historial se sugiere pero no se aplica
+MAX_FILAS_RESULTADO = 200
+COLUMNAS_REPORTE = [
+    'producto_id', 'nombre', 'stock', 'stock_minimo', 'stock_minimo_sugerido', 'dias_historial',
+    'unidades_vendidas', 'venta_diaria', 'desvio_diario', 'dias_cobertura', 'punto_pedido', 'a_comprar'
+]
+
+SQL_APLICAR = text("""
+    UPDATE producto SET stock_minimo = v.minimo
+    FROM unnest(CAST(:ids AS integer[]), CAST(:minimos AS integer[])) AS v(id, minimo)
+    WHERE producto.id = v.id AND producto.stock_minimo <> v.minimo
+""")
+
+
+def _copy_a_numpy(sql, columnas):
+    """Corre un SELECT con COPY (mucho más rápido que traer filas) y lo devuelve como matriz de enteros."""
+    buffer = io.StringIO()
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+    if not buffer.tell():
+        return np.empty((0, columnas), dtype=np.int64)
+    buffer.seek(0)
+    return np.loadtxt(buffer, delimiter=',', dtype=np.int64, ndmin=2)
+
+
+def calcular(dias=None, hasta=None, dias_entrega=None, dias_revision=None, nivel_servicio=None):
+    """
+    Calcula demanda, punto de pedido y compra sugerida de todos los productos.
+    Devuelve un dict de arrays alineados por producto (ordenados por id).
+    """
+    config = current_app.config
+    dias = dias or config['REPOSICION_DIAS_HISTORIAL']
+    entrega = dias_entrega or config['REPOSICION_DIAS_ENTREGA']
+    revision = dias_revision or config['REPOSICION_DIAS_REVISION']
+    z = statistics.NormalDist().inv_cdf(nivel_servicio or config['REPOSICION_NIVEL_SERVICIO'])
+    hasta = hasta or datetime.date.today()   # el día de hoy (incompleto) no cuenta
+    desde = hasta - datetime.timedelta(days=dias)
+    timeout_largo()  # recorre todo el historial de ventas del período
+
+    productos = db.session.query(
+        Producto.id, Producto.nombre, Producto.stock, Producto.stock_minimo
+    ).order_by(Producto.id).all()
+    ids = np.fromiter((p.id for p in productos), dtype=np.int64, count=len(productos))
+    stock = np.fromiter((p.stock for p in productos), dtype=np.int64, count=len(productos))
+    minimo = np.fromiter((p.stock_minimo for p in productos), dtype=np.int64, count=len(productos))
+
+    # Unidades vendidas por producto y día (día 0 = desde); las fechas son objetos date, no texto del usuario
+    ventas = _copy_a_numpy(f"""
+        SELECT d.producto_id, CAST(v.fecha AS date) - DATE '{desde}', sum(d.cantidad)
+        FROM detalle_venta d JOIN venta v ON v.id = d.venta_id
+        WHERE v.estado <> 'anulada' AND v.fecha >= DATE '{desde}' AND v.fecha < DATE '{hasta}'
+        GROUP BY 1, 2
+    """, 3)
+    # Productos dados de alta dentro de la ventana: su historial empieza con el primer movimiento
+    altas = _copy_a_numpy(f"""
+        SELECT m.producto_id, CAST(min(m.fecha) AS date) - DATE '{desde}'
+        FROM movimiento_stock m
+        WHERE m.fecha >= DATE '{desde}'
+        GROUP BY m.producto_id
+        HAVING NOT EXISTS (
+            SELECT 1 FROM movimiento_stock a WHERE a.producto_id = m.producto_id AND a.fecha < DATE '{desde}'
+        )
+    """, 2)
+    db.session.rollback()
+
+    n = len(ids)
+    posicion = np.searchsorted(ids, ventas[:, 0])
+    cantidad = ventas[:, 2].astype(np.float64)
+    total = np.bincount(posicion, weights=cantidad, minlength=n)
+    cuadrados = np.bincount(posicion, weights=cantidad * cantidad, minlength=n)
+
+    inicio = np.zeros(n, dtype=np.int64)
+    inicio[np.searchsorted(ids, altas[:, 0])] = altas[:, 1]
+    # Una venta anterior al primer movimiento (datos viejos) también marca el inicio
+    primera_venta = np.full(n, dias, dtype=np.int64)
+    np.minimum.at(primera_venta, posicion, ventas[:, 1])
+    inicio = np.clip(np.minimum(inicio, primera_venta), 0, dias)
+    historial = np.maximum(dias - inicio, 1).astype(np.float64)
+
+    # Los días sin ventas cuentan como ceros: solo entran en n, no en las sumas
+    media = total / historial
+    varianza = np.maximum(cuadrados - total * total / historial, 0) / np.maximum(historial - 1, 1)
+    desvio = np.sqrt(varianza)
+    punto = media * entrega + z * desvio * np.sqrt(entrega)
+    objetivo = punto + media * revision
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(media > 0, stock / media, np.inf)
+    a_comprar = np.where(stock <= punto, np.ceil(objetivo - stock), 0).clip(min=0).astype(np.int64)
+
+    return {
+        'desde': desde, 'hasta': hasta, 'dias': dias, 'dias_entrega': entrega, 'dias_revision': revision, 'z': z,
+        'ids': ids, 'nombres': [p.nombre for p in productos], 'stock': stock, 'stock_minimo': minimo,
+        'historial': historial.astype(np.int64), 'vendido': total.astype(np.int64),
+        'media': media, 'desvio': desvio, 'cobertura': cobertura, 'punto': punto,
+        'sugerido': np.ceil(punto).astype(np.int64), 'a_comprar': a_comprar,
+    }
+
+
+def a_aplicar(r):
+    """Máscara de productos cuyo stock_minimo cambiaría (con historial suficiente)."""
+    return (r['historial'] >= DIAS_MINIMOS) & (r['sugerido'] != r['stock_minimo'])
+
+
+def aplicar(r):
+    """Pisa stock_minimo con el sugerido (en la transacción del llamador). Devuelve cuántos cambió."""
+    mascara = a_aplicar(r)
+    if not mascara.any():
+        return 0
+    resultado = db.session.execute(SQL_APLICAR, {
+        'ids': r['ids'][mascara].tolist(), 'minimos': r['sugerido'][mascara].tolist()
+    })
+    marcar(db.session, 'producto')
+    return resultado.rowcount
+
+
+def filas(r, orden=None):
+    """Filas del reporte (en el orden de COLUMNAS_REPORTE)."""
+    indices = range(len(r['ids'])) if orden is None else orden
+    for i in indices:
+        cobertura = r['cobertura'][i]
+        yield [
+            int(r['ids'][i]), r['nombres'][i], int(r['stock'][i]), int(r['stock_minimo'][i]),
+            int(r['sugerido'][i]), int(r['historial'][i]), int(r['vendido'][i]),
+            round(float(r['media'][i]), 3), round(float(r['desvio'][i]), 3),
+            round(float(cobertura), 1) if np.isfinite(cobertura) else None,
+            round(float(r['punto'][i]), 1), int(r['a_comprar'][i]),
+        ]
+
+
+def guardar_csv(r, archivo):
+    writer = csv.writer(archivo)
+    writer.writerow(COLUMNAS_REPORTE)
+    for fila in filas(r):
+        writer.writerow(['' if v is None else v for v in fila])
+
+
+def a_comprar_primero(r, limite=MAX_FILAS_RESULTADO):
+    """Índices de los productos a comprar, de menor a mayor cobertura."""
+    indices = np.flatnonzero(r['a_comprar'] > 0)
+    return indices[np.argsort(r['cobertura'][indices], kind='stable')][:limite]
+
+
+def _archivo_reporte(trabajo_id):
+    return f'reposicion-{trabajo_id}.csv'
+
+
+# --- Trabajo en segundo plano (ver trabajos.py) ---
+@tarea('reposicion', api=True)
+def _tarea_reposicion(trabajo, dias=None, aplicar_minimos=False):
+    trabajo.avance(10, 'Leyendo el historial de ventas.')
+    r = calcular(dias=dias)
+    trabajo.avance(60, 'Guardando el reporte.')
+    with open(os.path.join(directorio_trabajos(), _archivo_reporte(trabajo.id)), 'w', newline='', encoding='utf-8') as f:
+        guardar_csv(r, f)
+    aplicados = 0
+    if aplicar_minimos:
+        trabajo.avance(80, 'Actualizando stock mínimo.')
+        aplicados = aplicar(r)
+        db.session.commit()
+    return {
+        'desde': r['desde'].isoformat(),
+        'hasta': r['hasta'].isoformat(),
+        'productos': len(r['ids']),
+        'con_ventas': int((r['vendido'] > 0).sum()),
+        'a_comprar': int((r['a_comprar'] > 0).sum()),
+        'cambios_minimo': int(a_aplicar(r).sum()),
+        'aplicados': aplicados,
+        'filas': list(filas(r, a_comprar_primero(r))),
+    }
+
+
+# -----------------------------------------------
+# RUTA: REPOSICIÓN Y SUGERENCIA DE COMPRA (Admin)
+# -----------------------------------------------
+@reposicion_bp.route('/admin/reposicion', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def reposicion():
+    """Calcula (en el worker) el stock mínimo sugerido y lo que conviene comprar."""
+    if request.method == 'POST':
+        try:
+            dias = request.form.get('dias', type=int) or None
+            if dias is not None and not 7 <= dias <= 3650:
+                raise ValueError('El historial debe ser de 7 a 3650 días.')
+            trabajo = encolar('reposicion', {
+                'dias': dias, 'aplicar_minimos': request.form.get('aplicar') == '1'
+            }, user_id=current_user.id)
+            db.session.commit()
+            flash(f'Cálculo de reposición encolado (trabajo #{trabajo.id}).', 'info')
+            return redirect(url_for('reposicion.reposicion', trabajo=trabajo.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al encolar el cálculo: {str(e)}', 'danger')
+            return redirect(url_for('reposicion.reposicion'))
+
+    trabajo_id = request.args.get('trabajo', type=int)
+    consulta = Trabajo.query.filter_by(tipo='reposicion')
+    if trabajo_id:
+        trabajo = consulta.filter_by(id=trabajo_id).first()
+    else:
+        trabajo = consulta.filter_by(estado='terminado').order_by(Trabajo.id.desc()).first()
+    return render_template(
+        'reposicion.html',
+        trabajo=trabajo,
+        resultado=trabajo.resultado if trabajo and trabajo.estado == 'terminado' else None,
+        dias_minimos=DIAS_MINIMOS,
+        dias_historial=current_app.config['REPOSICION_DIAS_HISTORIAL']
+    )
+
+
+@reposicion_bp.route('/admin/reposicion/<int:trabajo_id>.csv')
+@login_required
+@admin_required
+def descargar_reporte(trabajo_id):
+    """Reporte completo (todos los productos) de un cálculo terminado."""
+    return send_from_directory(
+        directorio_trabajos(), _archivo_reporte(trabajo_id),
+        as_attachment=True, download_name=f'reposicion_{trabajo_id}.csv', mimetype='text/csv'
+    )
+
+
+# -----------------------------------------------
+# COMANDOS CLI (ej: desde cron)
+# -----------------------------------------------
+@reposicion_bp.cli.command('calcular')
+@click.option('--dias', type=int, help='Días de historial (por defecto REPOSICION_DIAS_HISTORIAL).')
+@click.option('--aplicar', 'aplicar_minimos', is_flag=True, help='Pisa stock_minimo con el valor sugerido.')
+@click.option('--salida', type=click.File('w'), help='Guarda el reporte completo en un CSV.')
+def calcular_command(dias, aplicar_minimos, salida):
+    """Calcula el punto de pedido y la compra sugerida de todo el catálogo."""
+    inicio = time.perf_counter()
+    r = calcular(dias=dias)
+    click.echo(f'{len(r["ids"])} productos, ventas del {r["desde"]:%d/%m/%Y} al {r["hasta"]:%d/%m/%Y} '
+               f'({time.perf_counter() - inicio:.2f} s).')
+    click.echo(f'Con ventas: {int((r["vendido"] > 0).sum())} - '
+               f'A comprar: {int((r["a_comprar"] > 0).sum())} - '
+               f'Stock mínimo a cambiar: {int(a_aplicar(r).sum())}')
+    if salida:
+        guardar_csv(r, salida)
+    if aplicar_minimos:
+        aplicados = aplicar(r)
+        db.session.commit()
+        click.echo(f'Stock mínimo actualizado en {aplicados} productos.')
@@ -0,0 +1,130 @@
+"""
+Compresión y GET condicional de las respuestas dinámicas.
+
+- Toda respuesta HTML/JSON/CSV de más de COMPRESION_MINIMO_BYTES se comprime
+  con brotli (si está instalado) o gzip, según Accept-Encoding.
+- Las vistas decoradas con @condicional('venta', ...) llevan un ETag armado con
+  las versiones de esas tablas (ver versiones.py), y si el navegador ya tiene
+  esa versión se responde 304 sin ejecutar la vista.
+"""
+import datetime
+import gzip
+import hashlib
+import os
+from functools import wraps
+
+from flask import Blueprint, current_app, make_response, request, session
+from flask_login import current_user
+
+from .versiones import leer
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se usa solo gzip
+    brotli = None
+
+respuestas_bp = Blueprint('respuestas', __name__)
+
+COMPRIMIBLES = {'text/html', 'application/json', 'text/csv', 'text/plain'}
+
+_estado = {'sal': None}
+
+
+# --- GET condicional ---
+def clave_dia(*args, **kwargs):
+    """Para reportes relativos a hoy (últimos 30 días, mes actual)."""
+    return datetime.date.today().isoformat()
+
+
+def _sal_despliegue():
+    """Cambia con cada deploy (código o templates nuevos), igual en todos los workers."""
+    if _estado['sal'] is None:
+        mtimes = [
+            os.path.getmtime(os.path.join(raiz, nombre))
+            for raiz, _, nombres in os.walk(current_app.root_path)
+            for nombre in nombres if nombre.endswith(('.py', '.html'))
+        ]
+        _estado['sal'] = f'{max(mtimes, default=0):.0f}-{len(mtimes)}'
+    return _estado['sal']
+
+
+def _etag(extra, versiones):
+    partes = (
+        _sal_despliegue(), request.full_path, current_user.get_id(), extra,
+        sorted((tabla, version) for tabla, (version, _) in versiones.items())
+    )
+    return hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _no_cambio(etag, ultima, usar_fecha):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    # La fecha sola no cubre la clave extra (ej: el día del reporte), así que solo vale sin clave
+    return usar_fecha and ultima is not None and request.if_modified_since is not None \
+        and ultima <= request.if_modified_since
+
+
+def condicional(*tablas, clave=None):
+    """
+    Responde 304 si no cambió ninguna de las tablas desde la versión que tiene
+    el navegador. clave(*args, **kwargs) agrega datos propios de la vista al
+    ETag; si devuelve None, la respuesta no se cachea (ej: 404 o sin permiso).
+    """
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            # Un 304 no consumiría los mensajes flash pendientes
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return f(*args, **kwargs)
+            extra = clave(*args, **kwargs) if clave else ''
+            if extra is None:
+                return f(*args, **kwargs)
+
+            versiones = leer(tablas)
+            etag = _etag(extra, versiones)
+            fechas = [actualizado for _, actualizado in versiones.values() if actualizado is not None]
+            ultima = max(fechas).replace(microsecond=0) if fechas else None
+
+            if _no_cambio(etag, ultima, clave is None):
+                respuesta = current_app.response_class(status=304)
+            else:
+                respuesta = make_response(f(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+            respuesta.set_etag(etag, weak=True)
+            if ultima is not None:
+                respuesta.last_modified = ultima
+            # El navegador guarda la respuesta pero la revalida siempre
+            respuesta.headers['Cache-Control'] = 'private, no-cache'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+# --- Compresión ---
+@respuestas_bp.after_app_request
+def _comprimir(respuesta):
+    config = current_app.config
+    if (not config['COMPRESION_MINIMO_BYTES'] or respuesta.status_code != 200
+            or respuesta.direct_passthrough or respuesta.is_streamed
+            or 'Content-Encoding' in respuesta.headers or respuesta.mimetype not in COMPRIMIBLES):
+        return respuesta
+
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    datos = respuesta.get_data()
+    if codificacion is None or len(datos) < config['COMPRESION_MINIMO_BYTES']:
+        return respuesta
+
+    if codificacion == 'br':
+        datos = brotli.compress(datos, quality=config['COMPRESION_NIVEL_BROTLI'])
+    else:
+        datos = gzip.compress(datos, compresslevel=config['COMPRESION_NIVEL_GZIP'], mtime=0)
+    respuesta.set_data(datos)
+    respuesta.headers['Content-Encoding'] = codificacion
+
+    # Un ETag fuerte identifica bytes exactos: el de la versión comprimida tiene que ser débil
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag, weak=True)
+    return respuesta
@@ -0,0 +1,518 @@
+/*
+ * POS de nueva_venta.html, capaz de vender sin conexión (ver app/pos.py).
+ *
+ * - El catálogo (productos y clientes) se guarda en IndexedDB y se refresca
+ *   desde /api/pos/catalogo cuando hay red.
+ * - "Completar Venta" guarda la venta en IndexedDB con un uuid propio y libera
+ *   la caja enseguida; las ventas pendientes se mandan en lote a
+ *   /api/pos/sincronizar (al vender, al volver la red y cada 30 segundos).
+ * - Con red, antes de guardar la venta se pide el catálogo de nuevo y se exige
+ *   una jornada activa y stock suficiente, como en la venta en línea.
+ * - El stock que se muestra descuenta las ventas que todavía no se sincronizaron.
+ * - Los códigos de barras se resuelven con el catálogo local y, si no están,
+ *   con /api/pos/escanear. Un lector tipo teclado se detecta por la velocidad
+ *   de las teclas, aunque el foco esté en otro campo.
+ */
+(function () {
+    'use strict';
+
+    const BASE = 'pos';
+    const VERSION_BASE = 1;
+    const SINCRONIZAR_CADA_MS = 30000;
+    const LOTE = 50;
+    const VENTAS_VISIBLES = 20;
+    const MS_ENTRE_TECLAS_LECTOR = 30;
+    const LARGO_MINIMO_CODIGO = 4;
+
+    const form = document.getElementById('venta-form');
+    if (!form) {
+        return;
+    }
+    const urls = form.dataset;
+    const tbody = document.getElementById('items-venta-tbody');
+    const template = document.getElementById('fila-producto-template');
+    const btnAgregar = document.getElementById('btn-agregar-item');
+    const btnCompletarVenta = document.getElementById('btn-completar-venta');
+    const totalEnVivoSpan = document.getElementById('total-en-vivo');
+    const selectCliente = document.getElementById('cliente_id');
+    const selectMetodo = document.getElementById('metodo_pago');
+    const estadoConexion = document.getElementById('pos-conexion');
+    const listaVentas = document.getElementById('pos-ventas');
+    const inputCodigo = document.getElementById('pos-codigo');
+    const estadoCodigo = document.getElementById('pos-codigo-estado');
+
+    let productos = [];          // del catálogo, con el stock ya descontado
+    let jornada;                 // la jornada activa según el último catálogo (null: ninguna)
+    let porCodigo = new Map();   // código -> producto
+    let sincronizando = false;
+
+    // --- IndexedDB ---
+    const basePromesa = new Promise((resolve, reject) => {
+        const pedido = indexedDB.open(BASE, VERSION_BASE);
+        pedido.onupgradeneeded = () => {
+            const bd = pedido.result;
+            bd.createObjectStore('catalogo');       // claves: 'productos', 'clientes', 'generado'
+            bd.createObjectStore('ventas', {keyPath: 'uuid'}).createIndex('estado', 'estado');
+        };
+        pedido.onsuccess = () => resolve(pedido.result);
+        pedido.onerror = () => reject(pedido.error);
+    });
+
+    // Corre fn(almacén) en una transacción y devuelve lo que devuelva (o el resultado del pedido)
+    function operacion(almacen, modo, fn) {
+        return basePromesa.then(bd => new Promise((resolve, reject) => {
+            const tx = bd.transaction(almacen, modo);
+            const resultado = fn(tx.objectStore(almacen));
+            tx.oncomplete = () => resolve(resultado instanceof IDBRequest ? resultado.result : resultado);
+            tx.onerror = () => reject(tx.error);
+        }));
+    }
+
+    function nuevoUuid() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        const b = crypto.getRandomValues(new Uint8Array(16));
+        b[6] = (b[6] & 0x0f) | 0x40;
+        b[8] = (b[8] & 0x3f) | 0x80;
+        const h = Array.from(b, x => x.toString(16).padStart(2, '0')).join('');
+        return `${h.slice(0, 8)}-${h.slice(8, 12)}-${h.slice(12, 16)}-${h.slice(16, 20)}-${h.slice(20)}`;
+    }
+
+    // --- Catálogo ---
+    // Devuelve true si el catálogo vino del servidor (y no de lo guardado)
+    async function cargarCatalogo() {
+        let catalogo;
+        let enLinea = true;
+        try {
+            const respuesta = await fetch(urls.urlCatalogo, {credentials: 'same-origin'});
+            if (!respuesta.ok || respuesta.redirected) {
+                throw new Error(`HTTP ${respuesta.status}`);
+            }
+            catalogo = await respuesta.json();
+            jornada = catalogo.jornada;
+            await operacion('catalogo', 'readwrite', almacen => {
+                almacen.put(catalogo.productos, 'productos');
+                almacen.put(catalogo.clientes, 'clientes');
+                almacen.put(catalogo.generado, 'generado');
+            });
+        } catch (error) {
+            // Sin red (o sin sesión): lo último que se guardó
+            const guardados = await operacion('catalogo', 'readonly', almacen => ({
+                productos: almacen.get('productos'),
+                clientes: almacen.get('clientes'),
+            }));
+            catalogo = {productos: guardados.productos.result || [], clientes: guardados.clientes.result || []};
+            enLinea = false;
+        }
+        const pendientes = await operacion('ventas', 'readonly', almacen => almacen.index('estado').getAll('pendiente'));
+        const vendido = {};
+        pendientes.forEach(v => v.items.forEach(i => {
+            vendido[i.producto_id] = (vendido[i.producto_id] || 0) + i.cantidad;
+        }));
+        productos = catalogo.productos.map(p => ({...p, stock: p.stock - (vendido[p.id] || 0)}));
+        porCodigo = new Map();
+        productos.forEach(p => (p.codigos || []).forEach(c => porCodigo.set(c, p)));
+        if (catalogo.clientes.length) {
+            llenarClientes(catalogo.clientes);
+        }
+        if (productos.length) {
+            tbody.querySelectorAll('.product-select').forEach(llenarProductos);
+            llenarProductos(template.content.querySelector('.product-select'));
+        }
+        return enLinea;
+    }
+
+    function opcion(valor, texto) {
+        const o = document.createElement('option');
+        o.value = valor;
+        o.textContent = texto;
+        return o;
+    }
+
+    function llenarProductos(select) {
+        const elegido = select.value;
+        select.replaceChildren(opcion('', '-- Seleccionar producto --'));
+        productos.filter(p => p.stock > 0 || String(p.id) === elegido).forEach(p => {
+            const o = opcion(p.id, `${p.nombre} (Stock: ${p.stock})`);
+            o.dataset.precio = Number(p.precio).toFixed(2);
+            select.appendChild(o);
+        });
+        select.value = elegido;
+    }
+
+    function llenarClientes(clientes) {
+        const elegido = selectCliente.value;
+        selectCliente.replaceChildren(opcion('', '-- Venta de Mostrador (Anónima) --'));
+        clientes.forEach(c => selectCliente.appendChild(opcion(c.id, `${c.nombre} (${c.documento_fiscal || 'Sin Doc'})`)));
+        selectCliente.value = elegido;
+    }
+
+    // --- Carrito ---
+    function actualizarPrecio(selectElement) {
+        const fila = selectElement.closest('tr');
+        const precioInput = fila.querySelector('.precio-unit');
+        const selectedOption = selectElement.options[selectElement.selectedIndex];
+        const precio = (selectedOption && selectedOption.dataset.precio) || '0.00';
+        precioInput.value = `$${precio}`;
+        calcularTotalEnVivo();
+    }
+
+    function calcularTotalEnVivo() {
+        totalEnVivoSpan.textContent = `$${itemsDelCarrito().reduce((t, i) => t + i.precio * i.cantidad, 0).toFixed(2)}`;
+    }
+
+    function itemsDelCarrito() {
+        const items = [];
+        tbody.querySelectorAll('tr').forEach(fila => {
+            const select = fila.querySelector('.product-select');
+            const opcionElegida = select.options[select.selectedIndex];
+            const cantidad = parseInt(fila.querySelector('input[name="cantidad[]"]').value) || 0;
+            if (select.value && opcionElegida && opcionElegida.dataset.precio && cantidad > 0) {
+                items.push({producto_id: parseInt(select.value), cantidad: cantidad,
+                            precio: parseFloat(opcionElegida.dataset.precio), precio_texto: opcionElegida.dataset.precio});
+            }
+        });
+        return items;
+    }
+
+    function setupRowListeners(row) {
+        const btnQuitar = row.querySelector('.btn-quitar-item');
+        if (btnQuitar) {
+            btnQuitar.addEventListener('click', function () { row.remove(); calcularTotalEnVivo(); });
+        }
+        const select = row.querySelector('.product-select');
+        select.addEventListener('change', () => actualizarPrecio(select));
+        row.querySelector('input[name="cantidad[]"]').addEventListener('input', calcularTotalEnVivo);
+        actualizarPrecio(select);
+    }
+
+    function agregarFila() {
+        const nuevaFila = template.content.firstElementChild.cloneNode(true);
+        tbody.appendChild(nuevaFila);
+        setupRowListeners(nuevaFila);
+        return nuevaFila;
+    }
+
+    function vaciarCarrito() {
+        tbody.querySelectorAll('tr').forEach((fila, i) => {
+            if (i > 0) {
+                fila.remove();
+            }
+        });
+        const primera = tbody.querySelector('tr');
+        primera.querySelector('.product-select').value = '';
+        primera.querySelector('input[name="cantidad[]"]').value = 1;
+        selectCliente.value = '';
+        selectMetodo.value = '';
+        actualizarPrecio(primera.querySelector('.product-select'));
+    }
+
+    async function completarVenta() {
+        const items = itemsDelCarrito();
+        if (items.length === 0) {
+            alert('Error: No se han agregado productos a la venta.');
+            return;
+        }
+        if (!selectMetodo.value) {
+            alert('Error: Debe seleccionar un método de pago.');
+            return;
+        }
+        btnCompletarVenta.disabled = true;
+        try {
+            // Con red no hay motivo para vender sin jornada o sin stock: se controla con el catálogo al día
+            if (navigator.onLine && await cargarCatalogo()) {
+                const error = controlarVenta(items);
+                if (error) {
+                    alert(`Error: ${error}`);
+                    return;
+                }
+            }
+            const venta = {
+                uuid: nuevoUuid(),
+                creada: new Date().toISOString(),
+                cliente_id: selectCliente.value || null,
+                metodo_pago: selectMetodo.value,
+                items: items.map(i => ({producto_id: i.producto_id, cantidad: i.cantidad, precio_unitario: i.precio_texto})),
+                total: items.reduce((t, i) => t + i.precio * i.cantidad, 0).toFixed(2),
+                estado: 'pendiente',
+            };
+            try {
+                await operacion('ventas', 'readwrite', almacen => almacen.put(venta));
+            } catch (error) {
+                console.error('No se pudo guardar la venta en el navegador:', error);
+                alert('No se pudo guardar la venta en este navegador.');
+                return;
+            }
+            vaciarCarrito();
+            await cargarCatalogo();
+            await mostrarVentas();
+            sincronizar();
+        } finally {
+            btnCompletarVenta.disabled = false;
+        }
+    }
+
+    function controlarVenta(items) {
+        if (!jornada) {
+            return 'No hay una jornada activa.';
+        }
+        const pedido = {};
+        items.forEach(i => { pedido[i.producto_id] = (pedido[i.producto_id] || 0) + i.cantidad; });
+        const faltantes = productos.filter(p => pedido[p.id] > p.stock)
+            .map(p => `${p.nombre} (pedido: ${pedido[p.id]}, stock: ${p.stock})`);
+        return faltantes.length ? `Stock insuficiente para ${faltantes.join(', ')}.` : null;
+    }
+
+    // --- Lector de códigos ---
+    // El mismo código leído como UPC-A (12 dígitos) o como EAN-13 con un 0 adelante
+    function variantes(codigo) {
+        const lista = [codigo];
+        if (/^\d{12}$/.test(codigo)) {
+            lista.push('0' + codigo);
+        } else if (/^0\d{12}$/.test(codigo)) {
+            lista.push(codigo.slice(1));
+        }
+        return lista;
+    }
+
+    async function resolverCodigo(codigo) {
+        for (const variante of variantes(codigo)) {
+            if (porCodigo.has(variante)) {
+                return porCodigo.get(variante);
+            }
+        }
+        if (!navigator.onLine) {
+            return null;
+        }
+        // Un código cargado después del último catálogo
+        const respuesta = await fetch(`${urls.urlEscanear}?codigo=${encodeURIComponent(codigo)}`, {credentials: 'same-origin'});
+        if (respuesta.status === 404) {
+            return null;
+        }
+        if (!respuesta.ok || respuesta.redirected) {
+            throw new Error(`HTTP ${respuesta.status}`);
+        }
+        const encontrado = (await respuesta.json()).producto;
+        let producto = productos.find(p => p.id === encontrado.id);
+        if (!producto) {
+            producto = {...encontrado, codigos: []};
+            productos.push(producto);
+        }
+        porCodigo.set(encontrado.codigo, producto);
+        return producto;
+    }
+
+    function mostrarEstadoCodigo(texto, clase) {
+        estadoCodigo.className = `small ${clase}`;
+        estadoCodigo.textContent = texto;
+    }
+
+    function agregarProducto(producto) {
+        const filas = Array.from(tbody.querySelectorAll('tr'));
+        let fila = filas.find(f => f.querySelector('.product-select').value === String(producto.id));
+        let cantidad = 1;
+        if (fila) {
+            const input = fila.querySelector('input[name="cantidad[]"]');
+            cantidad = (parseInt(input.value) || 0) + 1;
+            input.value = cantidad;
+            calcularTotalEnVivo();
+        } else {
+            fila = filas.find(f => !f.querySelector('.product-select').value) || agregarFila();
+            const select = fila.querySelector('.product-select');
+            // Los productos sin stock no están en la lista, pero el producto está en la mano
+            if (!select.querySelector(`option[value="${producto.id}"]`)) {
+                const o = opcion(producto.id, `${producto.nombre} (Stock: ${producto.stock})`);
+                o.dataset.precio = Number(producto.precio).toFixed(2);
+                select.appendChild(o);
+            }
+            select.value = producto.id;
+            fila.querySelector('input[name="cantidad[]"]').value = 1;
+            actualizarPrecio(select);
+        }
+        if (producto.stock < cantidad) {
+            mostrarEstadoCodigo(`${producto.nombre} x${cantidad} — stock insuficiente (${producto.stock})`, 'text-warning');
+        } else {
+            mostrarEstadoCodigo(`${producto.nombre} x${cantidad}`, 'text-success');
+        }
+    }
+
+    async function escanear(codigo) {
+        codigo = codigo.replace(/\s+/g, '');
+        if (!codigo) {
+            return;
+        }
+        try {
+            const producto = await resolverCodigo(codigo);
+            if (producto) {
+                agregarProducto(producto);
+            } else {
+                mostrarEstadoCodigo(`Código no encontrado: ${codigo}`, 'text-danger');
+            }
+        } catch (error) {
+            console.warn('Escaneo:', error);
+            mostrarEstadoCodigo(`No se pudo buscar el código ${codigo}`, 'text-danger');
+        }
+    }
+
+    // Un lector tipo teclado "escribe" el código en pocos milisegundos y termina con Enter
+    const rafaga = {texto: '', ultima: 0, campo: null, valorPrevio: null};
+
+    function detectarLector(evento) {
+        if (evento.target === inputCodigo) {
+            return;
+        }
+        const ahora = performance.now();
+        if (evento.key === 'Enter') {
+            if (rafaga.texto.length >= LARGO_MINIMO_CODIGO && ahora - rafaga.ultima < MS_ENTRE_TECLAS_LECTOR * 3) {
+                evento.preventDefault();
+                // Lo que el lector "tipeó" en el campo con foco no era para ese campo
+                if (rafaga.campo) {
+                    rafaga.campo.value = rafaga.valorPrevio;
+                    rafaga.campo.dispatchEvent(new Event(rafaga.campo.tagName === 'SELECT' ? 'change' : 'input', {bubbles: true}));
+                }
+                escanear(rafaga.texto);
+            }
+            rafaga.texto = '';
+            return;
+        }
+        if (evento.key.length !== 1 || evento.ctrlKey || evento.altKey || evento.metaKey) {
+            return;
+        }
+        if (ahora - rafaga.ultima > MS_ENTRE_TECLAS_LECTOR) {
+            const campo = evento.target;
+            rafaga.texto = '';
+            rafaga.campo = ['INPUT', 'SELECT', 'TEXTAREA'].includes(campo.tagName) ? campo : null;
+            rafaga.valorPrevio = rafaga.campo ? rafaga.campo.value : null;
+        }
+        rafaga.texto += evento.key;
+        rafaga.ultima = ahora;
+    }
+
+    // --- Sincronización ---
+    async function sincronizar() {
+        if (sincronizando || !navigator.onLine) {
+            return;
+        }
+        sincronizando = true;
+        let quedanMas = false;
+        try {
+            const pendientes = (await operacion('ventas', 'readonly', almacen => almacen.index('estado').getAll('pendiente'))).slice(0, LOTE);
+            if (!pendientes.length) {
+                return;
+            }
+            const respuesta = await fetch(urls.urlSincronizar, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({ventas: pendientes.map(({estado, total, error, ...datos}) => datos)}),
+            });
+            if (!respuesta.ok || respuesta.redirected) {
+                throw new Error(`HTTP ${respuesta.status}`);
+            }
+            const datos = await respuesta.json();
+            const porUuid = Object.fromEntries(pendientes.map(v => [v.uuid, v]));
+            await operacion('ventas', 'readwrite', almacen => {
+                datos.resultados.forEach(r => {
+                    if (!porUuid[r.uuid]) {
+                        return;
+                    }
+                    if (r.estado === 'reintentar') {
+                        // Sigue pendiente (ej: sin jornada abierta); se muestra el motivo
+                        almacen.put({...porUuid[r.uuid], error: r.error || null});
+                    } else {
+                        almacen.put({...porUuid[r.uuid], estado: r.estado, venta_id: r.venta_id, recibo: r.recibo,
+                                     conflictos: r.conflictos || [], error: r.error || null});
+                    }
+                });
+            });
+            quedanMas = pendientes.length === LOTE;
+            await cargarCatalogo();
+        } catch (error) {
+            console.warn('Sincronización pendiente:', error);
+        } finally {
+            sincronizando = false;
+            mostrarVentas();
+        }
+        if (quedanMas) {
+            sincronizar();
+        }
+    }
+
+    // --- Panel de ventas de esta caja ---
+    const ETIQUETAS = {
+        pendiente: ['bg-warning text-dark', 'Sin sincronizar'],
+        registrada: ['bg-success', 'Registrada'],
+        conflicto: ['bg-info text-dark', 'Registrada, a revisar'],
+        rechazada: ['bg-danger', 'Rechazada'],
+        invalida: ['bg-danger', 'Inválida'],
+    };
+
+    async function mostrarVentas() {
+        const ventas = (await operacion('ventas', 'readonly', almacen => almacen.getAll()))
+            .sort((a, b) => b.creada.localeCompare(a.creada));
+        // Las ya sincronizadas solo se guardan para mostrarlas un rato
+        const viejas = ventas.filter(v => v.estado !== 'pendiente').slice(VENTAS_VISIBLES);
+        if (viejas.length) {
+            await operacion('ventas', 'readwrite', almacen => viejas.forEach(v => almacen.delete(v.uuid)));
+        }
+        const pendientes = ventas.filter(v => v.estado === 'pendiente').length;
+        estadoConexion.className = `badge ${navigator.onLine ? 'bg-success' : 'bg-secondary'}`;
+        estadoConexion.textContent = (navigator.onLine ? 'En línea' : 'Sin conexión') +
+            (navigator.onLine && jornada === null ? ' · sin jornada activa' : '') +
+            (pendientes ? ` · ${pendientes} sin sincronizar` : '');
+
+        listaVentas.replaceChildren(...ventas.slice(0, VENTAS_VISIBLES).map(v => {
+            const li = document.createElement('li');
+            li.className = 'list-group-item d-flex justify-content-between align-items-center';
+            const [clase, texto] = ETIQUETAS[v.estado] || ['bg-secondary', v.estado];
+            const hora = new Date(v.creada).toLocaleTimeString();
+            const detalle = document.createElement('span');
+            detalle.textContent = `${hora} · $${v.total} · ${v.metodo_pago}` + (v.error ? ` · ${v.error}` : '');
+            const derecha = document.createElement('span');
+            const etiqueta = document.createElement('span');
+            etiqueta.className = `badge ${clase} me-2`;
+            etiqueta.textContent = texto;
+            derecha.appendChild(etiqueta);
+            if (v.recibo) {
+                const enlace = document.createElement('a');
+                enlace.href = v.recibo;
+                enlace.className = 'btn btn-sm btn-outline-primary';
+                enlace.innerHTML = '<i class="fas fa-print"></i> Recibo';
+                derecha.appendChild(enlace);
+            }
+            li.append(detalle, derecha);
+            return li;
+        }));
+    }
+
+    // --- Inicio ---
+    // Para otros scripts de la página (ej: lector de códigos)
+    window.POS = {
+        productos: () => productos,
+        agregarFila: agregarFila,
+        actualizarPrecio: actualizarPrecio,
+        filas: () => tbody.querySelectorAll('tr'),
+        escanear: escanear,
+    };
+
+    btnAgregar.addEventListener('click', agregarFila);
+    inputCodigo.addEventListener('keydown', evento => {
+        if (evento.key === 'Enter') {
+            evento.preventDefault();
+            escanear(inputCodigo.value);
+            inputCodigo.value = '';
+        }
+    });
+    document.addEventListener('keydown', detectarLector, true);
+    btnCompletarVenta.addEventListener('click', completarVenta);
+    setupRowListeners(tbody.querySelector('tr'));
+    window.addEventListener('online', () => { cargarCatalogo(); sincronizar(); });
+    window.addEventListener('offline', mostrarVentas);
+    setInterval(sincronizar, SINCRONIZAR_CADA_MS);
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register(urls.urlServiceWorker).catch(error => console.warn('Service worker:', error));
+    }
+    cargarCatalogo().then(mostrarVentas).then(sincronizar);
+})();
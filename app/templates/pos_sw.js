@@ -0,0 +1,101 @@
+// Service worker del POS (ver app/pos.py). Lo genera /ventas/sw.js: cambia con cada build de assets.
+const CACHE = 'pos-{{ version }}';
+const PAGINA = {{ url_for('main.nueva_venta')|tojson }};
+const ASSETS = {{ assets|tojson }};
+const ESPERA_RED_MS = 3000;
+
+self.addEventListener('install', evento => {
+    evento.waitUntil((async () => {
+        const cache = await caches.open(CACHE);
+        await cache.addAll(ASSETS.filter(url => url.startsWith('/')));
+        // Lo que todavía viene de un CDN (sin vendorizar) no impide instalar el POS
+        await Promise.all(ASSETS.filter(url => !url.startsWith('/')).map(url => cache.add(url).catch(() => null)));
+        // La página solo se guarda si hay sesión (sin sesión la respuesta es el login)
+        const pagina = await fetch(PAGINA, {credentials: 'same-origin'}).catch(() => null);
+        if (pagina && pagina.ok && !pagina.redirected) {
+            await cache.put(PAGINA, pagina);
+        }
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', evento => {
+    evento.waitUntil((async () => {
+        for (const nombre of await caches.keys()) {
+            if (nombre.startsWith('pos-') && nombre !== CACHE) {
+                await caches.delete(nombre);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+// La página del POS: red primero, pero si tarda más de ESPERA_RED_MS o no hay red, la guardada
+async function paginaPos(pedido) {
+    const cache = await caches.open(CACHE);
+    const red = fetch(pedido).then(respuesta => {
+        if (respuesta.ok && !respuesta.redirected) {
+            cache.put(PAGINA, respuesta.clone());
+        }
+        return respuesta;
+    });
+    const guardada = await cache.match(PAGINA);
+    if (!guardada) {
+        return red;
+    }
+    const espera = new Promise(resolver => setTimeout(() => resolver(guardada), ESPERA_RED_MS));
+    return Promise.race([red.catch(() => guardada), espera]);
+}
+
+// Bundles con huella (no cambian nunca): caché primero
+async function inmutable(pedido) {
+    const cache = await caches.open(CACHE);
+    const guardada = await cache.match(pedido);
+    if (guardada) {
+        return guardada;
+    }
+    const respuesta = await fetch(pedido);
+    if (respuesta.ok) {
+        cache.put(pedido, respuesta.clone());
+    }
+    return respuesta;
+}
+
+// Otros estáticos (fuentes, íconos, archivos sin construir): red primero, la copia si no hay red
+async function estatico(pedido) {
+    const cache = await caches.open(CACHE);
+    try {
+        const respuesta = await fetch(pedido);
+        if (respuesta.ok) {
+            cache.put(pedido, respuesta.clone());
+        }
+        return respuesta;
+    } catch (error) {
+        const guardada = await cache.match(pedido);
+        if (guardada) {
+            return guardada;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', evento => {
+    const pedido = evento.request;
+    const url = new URL(pedido.url);
+    if (pedido.method !== 'GET') {
+        return;
+    }
+    if (url.origin !== self.location.origin) {
+        if (ASSETS.includes(pedido.url)) {
+            evento.respondWith(estatico(pedido));
+        }
+        return;
+    }
+    if (pedido.mode === 'navigate' && url.pathname === PAGINA) {
+        evento.respondWith(paginaPos(pedido));
+    } else if (url.pathname.startsWith('/static/dist/')) {
+        evento.respondWith(inmutable(pedido));
+    } else if (url.pathname.startsWith('/static/')) {
+        evento.respondWith(estatico(pedido));
+    }
+});
@@ -0,0 +1,409 @@
+"""
+Cola de trabajos en segundo plano sobre PostgreSQL (FOR UPDATE SKIP LOCKED).
+
+Las acciones pesadas (importaciones, conciliación, actualizaciones de precios,
+lotes de recibos) no corren dentro del request: se encolan con encolar() y las
+ejecuta worker.py en otro proceso. La ruta responde enseguida con el id del
+trabajo, que se consulta en /api/trabajos/<id> o en /admin/trabajos.
+
+    @tarea('conciliar_stock', api=True)
+    def _conciliar(trabajo, fuente='stock'):
+        trabajo.avance(50, 'Comparando...')
+        return {'corregidos': 3}      # queda en Trabajo.resultado
+
+Si la tarea lanza una excepción se reintenta con espera exponencial
+(TRABAJOS_BACKOFF_S, el doble en cada intento) hasta max_intentos; después
+queda 'fallido'. ErrorDefinitivo falla sin reintentar, igual que los parámetros
+que no coinciden con la firma de la tarea. Un trabajo 'en_curso' cuyo worker
+dejó de dar señales por TRABAJOS_TIMEOUT_S vuelve a la cola.
+
+Los reportes siguen en el request, salvo la reposición (que recorre un año de
+ventas). Cada reporte es una sola consulta agregada sobre un rango acotado de
+fechas indexadas, y el resultado hace falta en la respuesta. Llevan ETag por
+versión de datos (respuestas.py), así que un reporte se recalcula solo cuando
+cambian sus tablas. Los de /api/reporte/ leen de la réplica si hay, y las
+exportaciones del Libro IVA se mandan en streaming.
+"""
+import inspect
+import json
+import os
+import random
+import select
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+import click
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import func, text, update
+
+from .models import db, Trabajo
+from .decorators import admin_required
+
+trabajos_bp = Blueprint('trabajos', __name__)
+
+CANAL = 'trabajos'  # LISTEN/NOTIFY: despierta a los workers al encolar
+ESTADOS = ('pendiente', 'en_curso', 'terminado', 'fallido', 'cancelado')
+LARGO_MAX_ERROR = 4000
+
+TAREAS = {}  # tipo -> {'funcion', 'max_intentos', 'prioridad', 'api'}
+
+SQL_TOMAR = text("""
+    UPDATE trabajo
+    SET estado = 'en_curso', intentos = intentos + 1, worker = :worker,
+        iniciado = now(), latido = now(), progreso = 0, mensaje = NULL
+    WHERE id = (
+        SELECT id FROM trabajo
+        WHERE estado = 'pendiente'
+          AND disponible_desde <= now()
+          AND (CAST(:tipos AS varchar[]) IS NULL OR tipo = ANY(CAST(:tipos AS varchar[])))
+        ORDER BY prioridad DESC, disponible_desde, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+""")
+
+SQL_RESCATAR = text("""
+    UPDATE trabajo
+    SET estado = CASE WHEN intentos >= max_intentos THEN 'fallido' ELSE 'pendiente' END,
+        terminado = CASE WHEN intentos >= max_intentos THEN now() END,
+        error = 'El worker ' || coalesce(worker, '?') || ' dejó de responder.',
+        worker = NULL
+    WHERE estado = 'en_curso' AND latido < now() - make_interval(secs => :timeout)
+    RETURNING id
+""")
+
+
+class ErrorDefinitivo(Exception):
+    """Error que no se arregla reintentando (ej: un archivo inválido)."""
+    pass
+
+
+def tarea(tipo, max_intentos=None, prioridad=0, api=False):
+    """Registra una función como tipo de trabajo. api=True permite encolarla desde /api/trabajos."""
+    def registrar(funcion):
+        TAREAS[tipo] = {'funcion': funcion, 'max_intentos': max_intentos, 'prioridad': prioridad, 'api': api}
+        return funcion
+    return registrar
+
+
+def validar_parametros(tipo, parametros):
+    """TypeError si la tarea no acepta esos parámetros (nombres faltantes o de más)."""
+    try:
+        inspect.signature(TAREAS[tipo]['funcion']).bind(None, **parametros)
+    except TypeError as e:
+        raise TypeError(f'Parámetros inválidos para {tipo}: {e}')
+
+
+def encolar(tipo, parametros=None, user_id=None, prioridad=None, disponible_desde=None, max_intentos=None):
+    """
+    Agrega un trabajo a la sesión. Los workers lo ven recién cuando se hace
+    commit, así que se puede encolar en la misma transacción que lo origina.
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f'Tipo de trabajo desconocido: {tipo}')
+    validar_parametros(tipo, parametros or {})
+    definicion = TAREAS[tipo]
+    trabajo = Trabajo(
+        tipo=tipo,
+        parametros=parametros or {},
+        user_id=user_id,
+        prioridad=definicion['prioridad'] if prioridad is None else prioridad,
+        max_intentos=max_intentos or definicion['max_intentos'] or current_app.config['TRABAJOS_MAX_INTENTOS'],
+    )
+    if disponible_desde is not None:
+        trabajo.disponible_desde = disponible_desde
+    db.session.add(trabajo)
+    db.session.flush()
+    # La notificación se entrega al hacer commit (y se descarta si hay rollback)
+    db.session.execute(text('SELECT pg_notify(:canal, :id)'), {'canal': CANAL, 'id': str(trabajo.id)})
+    return trabajo
+
+
+def timeout_largo():
+    """
+    Hasta el próximo commit, cambia el statement_timeout de los requests por
+    DB_STATEMENT_TIMEOUT_LARGO_MS (0 = sin límite): para las cargas y cálculos
+    que corren en el worker o por CLI, nunca en un request.
+    """
+    ms = int(current_app.config['DB_STATEMENT_TIMEOUT_LARGO_MS'])
+    db.session.execute(text(f'SET LOCAL statement_timeout = {ms}'))
+
+
+def directorio_trabajos():
+    """Archivos subidos que esperan a un worker (ej: CSV a importar)."""
+    directorio = current_app.config.get('TRABAJOS_DIRECTORIO') or os.path.join(current_app.instance_path, 'trabajos')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def trabajo_a_dict(trabajo):
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'intentos': trabajo.intentos,
+        'max_intentos': trabajo.max_intentos,
+        'resultado': trabajo.resultado,
+        'error': trabajo.error.strip().splitlines()[-1] if trabajo.error else None,
+        'creado': trabajo.creado.isoformat() if trabajo.creado else None,
+        'iniciado': trabajo.iniciado.isoformat() if trabajo.iniciado else None,
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None,
+        'url': url_for('trabajos.estado_trabajo', trabajo_id=trabajo.id),
+    }
+
+
+# --- Ejecución ---
+class EnCurso:
+    """Lo que recibe la función de la tarea: el id, el usuario y cómo informar el avance."""
+    def __init__(self, trabajo):
+        self.id = trabajo.id
+        self.user_id = trabajo.user_id
+        self.intento = trabajo.intentos
+
+    def avance(self, progreso, mensaje=None):
+        # En su propia transacción: se ve mientras el trabajo sigue corriendo
+        with db.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE trabajo SET progreso = :progreso, mensaje = coalesce(:mensaje, mensaje), latido = now()
+                WHERE id = :id
+            """), {'progreso': max(0, min(int(progreso), 100)), 'mensaje': mensaje and mensaje[:200], 'id': self.id})
+
+
+def espera_reintento(intento, base, maximo):
+    """Backoff exponencial con un poco de azar para que los reintentos no coincidan."""
+    return min(base * 2 ** (intento - 1), maximo) * random.uniform(1, 1.25)
+
+
+class Worker:
+    """Toma trabajos de la cola de a uno hasta que se pide detenerlo."""
+    def __init__(self, app, nombre, tipos=None):
+        self.app = app
+        self.nombre = nombre
+        self.tipos = list(tipos) if tipos else None
+        self.detener = threading.Event()
+        self._escucha = None
+
+    def correr(self):
+        config = self.app.config
+        with self.app.app_context():
+            self._escuchar()
+            ultimo_rescate = 0.0
+            self.app.logger.info('Worker %s esperando trabajos.', self.nombre)
+            while not self.detener.is_set():
+                if time.monotonic() - ultimo_rescate > config['TRABAJOS_TIMEOUT_S'] / 2:
+                    self.rescatar()
+                    ultimo_rescate = time.monotonic()
+                if not self.procesar_uno():
+                    self._esperar(config['TRABAJOS_INTERVALO_S'])
+            if self._escucha is not None:
+                self._escucha.close()
+
+    def rescatar(self):
+        ids = db.session.execute(SQL_RESCATAR, {'timeout': self.app.config['TRABAJOS_TIMEOUT_S']}).scalars().all()
+        db.session.commit()
+        if ids:
+            self.app.logger.warning('Trabajos sin worker devueltos a la cola: %s', ids)
+
+    def procesar_uno(self):
+        """Toma y corre el próximo trabajo. Devuelve False si la cola estaba vacía."""
+        trabajo_id = db.session.execute(SQL_TOMAR, {'worker': self.nombre, 'tipos': self.tipos}).scalar()
+        db.session.commit()
+        if trabajo_id is None:
+            return False
+
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        tipo, parametros = trabajo.tipo, trabajo.parametros
+        en_curso = EnCurso(trabajo)
+        definicion = TAREAS.get(tipo)
+        fin_latido = threading.Event()
+        latido = threading.Thread(target=self._latir, args=(trabajo_id, fin_latido), daemon=True)
+        latido.start()
+        inicio = time.perf_counter()
+        try:
+            if definicion is None:
+                raise ErrorDefinitivo(f'Tipo de trabajo desconocido: {tipo}')
+            try:
+                validar_parametros(tipo, parametros)
+            except TypeError as e:
+                raise ErrorDefinitivo(str(e))
+            resultado = definicion['funcion'](en_curso, **parametros)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._fallo(trabajo_id, e)
+        else:
+            self._terminar(trabajo_id, resultado)
+            self.app.logger.info('Trabajo #%s (%s) terminado en %.1f s.', trabajo_id, tipo,
+                                 time.perf_counter() - inicio)
+        finally:
+            fin_latido.set()
+            latido.join()
+            db.session.remove()
+        return True
+
+    def _terminar(self, trabajo_id, resultado):
+        # Lo que no sea JSON (fechas, Decimal) se guarda como texto
+        resultado = json.loads(json.dumps(resultado, default=str)) if resultado is not None else None
+        db.session.execute(update(Trabajo).where(Trabajo.id == trabajo_id).values(
+            estado='terminado', progreso=100, resultado=resultado, error=None, terminado=func.now()
+        ))
+        db.session.commit()
+
+    def _fallo(self, trabajo_id, error):
+        config = self.app.config
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        detalle = traceback.format_exc()[-LARGO_MAX_ERROR:]
+        if isinstance(error, ErrorDefinitivo) or trabajo.intentos >= trabajo.max_intentos:
+            trabajo.estado = 'fallido'
+            trabajo.terminado = func.now()
+            self.app.logger.error('Trabajo #%s (%s) fallido: %s', trabajo_id, trabajo.tipo, error)
+        else:
+            espera = espera_reintento(trabajo.intentos, config['TRABAJOS_BACKOFF_S'], config['TRABAJOS_BACKOFF_MAX_S'])
+            trabajo.estado = 'pendiente'
+            trabajo.disponible_desde = func.now() + timedelta(seconds=espera)
+            self.app.logger.warning('Trabajo #%s (%s) falló (intento %s), se reintenta en %.0f s: %s',
+                                    trabajo_id, trabajo.tipo, trabajo.intentos, espera, error)
+        trabajo.error = detalle
+        trabajo.worker = None
+        db.session.commit()
+
+    def _latir(self, trabajo_id, fin):
+        """Mientras corre el trabajo, avisa que el worker sigue vivo."""
+        intervalo = max(self.app.config['TRABAJOS_TIMEOUT_S'] / 4, 1)
+        with self.app.app_context():
+            while not fin.wait(intervalo):
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(text('UPDATE trabajo SET latido = now() WHERE id = :id'), {'id': trabajo_id})
+                except Exception as e:
+                    self.app.logger.warning('No se pudo registrar el latido del trabajo #%s: %s', trabajo_id, e)
+
+    def _escuchar(self):
+        """Conexión aparte con LISTEN para despertar apenas se encola algo (si no, se sondea)."""
+        try:
+            crudo = db.engine.raw_connection()
+            crudo.detach()  # queda fuera del pool: se usa en autocommit durante toda la vida del worker
+            conexion = crudo.driver_connection
+            conexion.autocommit = True
+            with conexion.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL}')
+            self._escucha = crudo
+        except Exception as e:
+            self.app.logger.warning('Sin LISTEN/NOTIFY, se sondea la cola cada %s s: %s',
+                                    self.app.config['TRABAJOS_INTERVALO_S'], e)
+            self._escucha = None
+
+    def _esperar(self, segundos):
+        if self._escucha is None:
+            self.detener.wait(segundos)
+            return
+        conexion = self._escucha.driver_connection
+        if select.select([conexion], [], [], segundos)[0]:
+            conexion.poll()
+            conexion.notifies.clear()
+
+
+# -----------------------------------------------
+# RUTAS: API DE TRABAJOS
+# -----------------------------------------------
+@trabajos_bp.route('/api/trabajos', methods=['POST'])
+@login_required
+@admin_required
+def api_encolar():
+    """Encola un trabajo: {"tipo": ..., "parametros": {...}, "prioridad": 0}. Responde 202 con su id."""
+    datos = request.get_json(silent=True) or {}
+    tipo = datos.get('tipo')
+    if tipo not in TAREAS or not TAREAS[tipo]['api']:
+        return jsonify({'success': False, 'error': f'Tipo de trabajo inválido: {tipo}'}), 400
+    if not isinstance(datos.get('parametros', {}), dict):
+        return jsonify({'success': False, 'error': 'Los parámetros deben ser un objeto.'}), 400
+    try:
+        trabajo = encolar(
+            tipo, datos.get('parametros'), user_id=current_user.id,
+            prioridad=int(datos['prioridad']) if 'prioridad' in datos else None
+        )
+        db.session.commit()
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Error al encolar: {str(e)}'}), 500
+    return jsonify(success=True, **trabajo_a_dict(trabajo)), 202
+
+
+@trabajos_bp.route('/api/trabajos/<int:trabajo_id>')
+@login_required
+def estado_trabajo(trabajo_id):
+    """Estado, progreso y resultado de un trabajo (para consultar hasta que termine)."""
+    trabajo = Trabajo.query.get_or_404(trabajo_id)
+    if current_user.role != 'admin' and trabajo.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'No tienes permiso para ver este trabajo.'}), 403
+    respuesta = jsonify(trabajo_a_dict(trabajo))
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+# -----------------------------------------------
+# RUTA: TRABAJOS (Admin)
+# -----------------------------------------------
+@trabajos_bp.route('/admin/trabajos')
+@login_required
+@admin_required
+def trabajos():
+    """Últimos trabajos de la cola, con filtro por estado."""
+    estado = request.args.get('estado', '', type=str)
+    query = Trabajo.query.options(db.joinedload(Trabajo.user))
+    if estado in ESTADOS:
+        query = query.filter(Trabajo.estado == estado)
+    lista = query.order_by(Trabajo.id.desc()).limit(100).all()
+    resumen = dict(db.session.query(Trabajo.estado, func.count(Trabajo.id)).group_by(Trabajo.estado).all())
+    return render_template('trabajos.html', trabajos=lista, resumen=resumen, estados=ESTADOS, estado_filtro=estado)
+
+
+@trabajos_bp.route('/admin/trabajos/<int:trabajo_id>/<any(cancelar, reintentar):accion>', methods=['POST'])
+@login_required
+@admin_required
+def cambiar_trabajo(trabajo_id, accion):
+    """Cancela un trabajo pendiente o vuelve a encolar uno fallido."""
+    try:
+        trabajo = Trabajo.query.filter_by(id=trabajo_id).with_for_update().first_or_404()
+        if accion == 'cancelar' and trabajo.estado == 'pendiente':
+            trabajo.estado = 'cancelado'
+            trabajo.terminado = func.now()
+            flash(f'Trabajo #{trabajo.id} cancelado.', 'success')
+        elif accion == 'reintentar' and trabajo.estado in ('fallido', 'cancelado'):
+            trabajo.estado = 'pendiente'
+            trabajo.intentos = 0
+            trabajo.disponible_desde = func.now()
+            trabajo.terminado = None
+            db.session.execute(text('SELECT pg_notify(:canal, :id)'), {'canal': CANAL, 'id': str(trabajo.id)})
+            flash(f'Trabajo #{trabajo.id} encolado de nuevo.', 'success')
+        else:
+            flash(f'El trabajo #{trabajo.id} está {trabajo.estado}: no se puede {accion}.', 'warning')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al modificar el trabajo: {str(e)}', 'danger')
+    return redirect(url_for('trabajos.trabajos'))
+
+
+# -----------------------------------------------
+# COMANDOS CLI
+# -----------------------------------------------
+@trabajos_bp.cli.command('purgar')
+@click.option('--dias', type=int, default=30, help='Antigüedad mínima de los trabajos a borrar.')
+def purgar_cmd(dias):
+    """Borra los trabajos terminados o cancelados hace más de --dias días."""
+    borrados = Trabajo.query.filter(
+        Trabajo.estado.in_(['terminado', 'cancelado']),
+        Trabajo.terminado < func.now() - timedelta(days=dias)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{borrados} trabajos borrados.')
@@ -0,0 +1,232 @@
+from flask import Blueprint, redirect, render_template, url_for, flash, request
+from flask_login import login_required, current_user
+from sqlalchemy import func, select, insert, update, literal
+import click
+import csv
+import os
+import uuid
+
+from .models import db, Venta, DetalleVenta, Producto, MovimientoStock, Trabajo, User
+from .decorators import admin_required
+from .fiscal import anular_comprobantes
+from .importacion import importar_ventas_csv, ErrorImportacion, MAX_ERRORES_MOSTRADOS
+from .libro_iva import PeriodoCerrado, ventas_en_periodo_cerrado
+from .trabajos import tarea, encolar, directorio_trabajos, ErrorDefinitivo
+
+ventas_bp = Blueprint('ventas', __name__)
+
+TIPO_MOV_ANULACION = 'Anulación Venta'
+
+
+# --- Funciones Helper ---
+def anular_ventas(user_id, venta_ids=None, jornada_id=None):
+    """
+    Anula en una sola transacción las ventas indicadas (por id o todas las de una
+    jornada) y devuelve el stock de todas ellas con un único UPDATE agregado.
+    Los bloqueos se toman en orden de id (ventas y luego productos), el mismo
+    orden en que una venta nueva actualiza el stock, para no generar deadlocks.
+    Devuelve la lista de ids efectivamente anulados (las ya anuladas se ignoran).
+    Falla con PeriodoCerrado si alguna es de un mes cerrado en el Libro IVA, y con
+    AnulacionFiscal si alguna ya tiene (o puede tener) CAE.
+    """
+    filtro = select(Venta.id).where(Venta.estado == 'completada')
+    if venta_ids is not None:
+        filtro = filtro.where(Venta.id.in_(venta_ids))
+    if jornada_id is not None:
+        filtro = filtro.where(Venta.jornada_id == jornada_id)
+
+    # 1. Bloquear las ventas (si otra anulación las tomó antes, quedan afuera)
+    ids = db.session.execute(
+        filtro.order_by(Venta.id).with_for_update()
+    ).scalars().all()
+    if not ids:
+        return []
+    # Anular cambiaría un Libro IVA ya presentado
+    cerradas = ventas_en_periodo_cerrado(ids)
+    if cerradas:
+        raise PeriodoCerrado(
+            f'{len(cerradas)} de las ventas (ej: #{cerradas[0]}) son de un mes cerrado en el Libro IVA.'
+        )
+    # Que el worker no les pida CAE
+    anular_comprobantes(ids)
+
+    # 2. Cantidades a devolver, agrupadas por producto
+    devoluciones = select(
+        DetalleVenta.producto_id,
+        func.sum(DetalleVenta.cantidad).label('cantidad')
+    ).where(
+        DetalleVenta.venta_id.in_(ids)
+    ).group_by(
+        DetalleVenta.producto_id
+    ).subquery()
+
+    # 3. Bloquear los productos en orden de id y devolver el stock con un solo UPDATE
+    db.session.execute(
+        select(Producto.id).where(
+            Producto.id.in_(select(devoluciones.c.producto_id))
+        ).order_by(Producto.id).with_for_update()
+    )
+    db.session.execute(
+        update(Producto).where(
+            Producto.id == devoluciones.c.producto_id
+        ).values(
+            stock=Producto.stock + devoluciones.c.cantidad
+        ).execution_options(synchronize_session=False)
+    )
+
+    # 4. Un movimiento por cada línea anulada (igual que la anulación individual)
+    db.session.execute(
+        insert(MovimientoStock).from_select(
+            ['producto_id', 'cantidad', 'tipo', 'user_id'],
+            select(
+                DetalleVenta.producto_id,
+                DetalleVenta.cantidad,
+                literal(TIPO_MOV_ANULACION),
+                literal(user_id)
+            ).where(
+                DetalleVenta.venta_id.in_(ids)
+            ).order_by(DetalleVenta.id)
+        )
+    )
+
+    # 5. Marcar las ventas como anuladas
+    db.session.execute(
+        update(Venta).where(
+            Venta.id.in_(ids)
+        ).values(
+            estado='anulada'
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return ids
+
+
+# --- Trabajo en segundo plano (ver trabajos.py) ---
+def _borrar(rutas):
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+@tarea('importar_ventas')
+def _tarea_importar_ventas(trabajo, ventas, detalles, descontar_stock=False, solo_validar=False):
+    rutas = [os.path.join(directorio_trabajos(), os.path.basename(a)) for a in (ventas, detalles)]
+    trabajo.avance(10, 'Cargando y validando los archivos.')
+    try:
+        with open(rutas[0], 'rb') as f_ventas, open(rutas[1], 'rb') as f_detalles:
+            resultado = importar_ventas_csv(
+                f_ventas, f_detalles, trabajo.user_id, descontar_stock=descontar_stock, solo_validar=solo_validar
+            )
+    except ErrorImportacion as e:
+        _borrar(rutas)
+        raise ErrorDefinitivo(str(e))
+    # Si falla por otra cosa los archivos quedan para el reintento
+    _borrar(rutas)
+    resultado['errores'] = [dict(e._mapping) for e in resultado['errores']]
+    return resultado
+
+
+# -----------------------------------------------
+# RUTA: ANULAR VENTAS EN LOTE
+# -----------------------------------------------
+@ventas_bp.route('/ventas/anular', methods=['POST'])
+@login_required
+@admin_required
+def anular_ventas_lote():
+    """Anula las ventas seleccionadas o todas las ventas de una jornada."""
+    venta_ids = request.form.getlist('venta_ids', type=int)
+    jornada_id = request.form.get('jornada_id', type=int)
+
+    if not venta_ids and not jornada_id:
+        flash('No se seleccionó ninguna venta para anular.', 'warning')
+        return redirect(request.referrer or url_for('main.ver_ventas'))
+
+    try:
+        anuladas = anular_ventas(
+            current_user.id,
+            venta_ids=venta_ids or None,
+            jornada_id=jornada_id
+        )
+        if anuladas:
+            flash(f'{len(anuladas)} ventas anuladas exitosamente. El stock ha sido restaurado.', 'success')
+        else:
+            flash('Las ventas seleccionadas ya estaban anuladas.', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al anular las ventas: {str(e)}', 'danger')
+
+    return redirect(request.referrer or url_for('main.ver_ventas'))
+
+
+# -----------------------------------------------
+# RUTA: IMPORTACIÓN DE VENTAS HISTÓRICAS (CSV)
+# -----------------------------------------------
+@ventas_bp.route('/ventas/importar', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def importar_ventas():
+    """Carga ventas del sistema anterior desde dos CSV (ventas y detalles); lo procesa el worker."""
+    if request.method == 'POST':
+        archivos = [request.files.get('ventas'), request.files.get('detalles')]
+        if not all(a and a.filename for a in archivos):
+            flash('Debe seleccionar los dos archivos CSV (ventas y detalles).', 'danger')
+            return redirect(url_for('ventas.importar_ventas'))
+        nombres = [f'{uuid.uuid4().hex}.csv' for _ in archivos]
+        try:
+            for archivo, nombre in zip(archivos, nombres):
+                archivo.save(os.path.join(directorio_trabajos(), nombre))
+            trabajo = encolar('importar_ventas', {
+                'ventas': nombres[0],
+                'detalles': nombres[1],
+                'descontar_stock': bool(request.form.get('descontar_stock')),
+                'solo_validar': bool(request.form.get('solo_validar')),
+            }, user_id=current_user.id)
+            db.session.commit()
+            return redirect(url_for('ventas.importar_ventas', trabajo=trabajo.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error al encolar la importación: {str(e)}', 'danger')
+            return redirect(url_for('ventas.importar_ventas'))
+
+    trabajo = None
+    trabajo_id = request.args.get('trabajo', None, type=int)
+    if trabajo_id:
+        trabajo = Trabajo.query.filter_by(id=trabajo_id, tipo='importar_ventas').first()
+
+    return render_template(
+        'importar_ventas.html',
+        trabajo=trabajo,
+        resultado=trabajo.resultado if trabajo and trabajo.estado == 'terminado' else None,
+        max_errores=MAX_ERRORES_MOSTRADOS
+    )
+
+
+# -----------------------------------------------
+# COMANDOS CLI
+# -----------------------------------------------
+@ventas_bp.cli.command('importar')
+@click.argument('ventas', type=click.File('rb'))
+@click.argument('detalles', type=click.File('rb'))
+@click.option('--usuario', required=True, help='Usuario al que quedan asignadas las ventas.')
+@click.option('--descontar-stock', is_flag=True, help='Descuenta del stock actual lo vendido.')
+@click.option('--solo-validar', is_flag=True, help='Valida los archivos sin importar nada.')
+@click.option('--errores', type=click.File('w'), help='Guarda los primeros errores en un CSV.')
+def importar_command(ventas, detalles, usuario, descontar_stock, solo_validar, errores):
+    """Importa ventas históricas (ventas.csv y detalles.csv unidos por la referencia)."""
+    user = User.query.filter_by(username=usuario).first()
+    if not user:
+        raise click.ClickException(f'No existe el usuario "{usuario}".')
+    try:
+        resultado = importar_ventas_csv(
+            ventas, detalles, user.id, descontar_stock=descontar_stock, solo_validar=solo_validar
+        )
+    except ErrorImportacion as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f'Ventas leídas: {resultado["total_ventas"]} ({resultado["ventas_con_errores"]} con errores)')
+    click.echo(f'Líneas leídas: {resultado["total_lineas"]} ({resultado["lineas_con_errores"]} con errores)')
+    click.echo(f'Importadas: {resultado["importadas"]} ventas, {resultado["lineas_importadas"]} líneas')
+    if errores:
+        writer = csv.writer(errores)
+        writer.writerow(['archivo', 'fila', 'referencia', 'error'])
+        writer.writerows(resultado['errores'])
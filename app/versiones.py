@@ -0,0 +1,81 @@
+"""
+Versiones de datos por tabla, para armar ETag/Last-Modified sin consultar los datos.
+
+Cada commit que modificó filas de una tabla (por la unidad de trabajo del ORM o
+por un insert/update/delete ejecutado con la sesión) incrementa la fila de esa
+tabla en version_datos. Las sentencias con text() o COPY no se detectan solas:
+después de ejecutarlas hay que llamar a marcar(db.session, 'tabla', ...).
+
+El incremento se hace después del commit y en su propia transacción corta,
+para que las ventas concurrentes no se serialicen sobre la misma fila.
+"""
+from flask import current_app
+from sqlalchemy import event, text
+
+from .models import db, VersionDatos
+from .replicas import SesionEnrutada
+
+CLAVE = 'tablas_modificadas'
+
+SQL_INCREMENTAR = text("""
+    INSERT INTO version_datos (nombre, version, actualizado)
+    SELECT nombre, 1, now() FROM unnest(CAST(:nombres AS varchar[])) AS nombre
+    ON CONFLICT (nombre) DO UPDATE
+    SET version = version_datos.version + 1, actualizado = excluded.actualizado
+""")
+
+
+def marcar(session, *tablas):
+    """Anota tablas modificadas por SQL que el ORM no ve (text(), COPY)."""
+    session.info.setdefault(CLAVE, set()).update(tablas)
+
+
+def leer(tablas):
+    """{tabla: (version, actualizado)}; las tablas que nunca cambiaron valen (0, None)."""
+    filas = db.session.query(
+        VersionDatos.nombre, VersionDatos.version, VersionDatos.actualizado
+    ).filter(VersionDatos.nombre.in_(tablas)).all()
+    versiones = {t: (0, None) for t in tablas}
+    versiones.update({f.nombre: (f.version, f.actualizado) for f in filas})
+    return versiones
+
+
+def incrementar(tablas, engine=None):
+    with (engine or db.engine).begin() as conn:
+        conn.execute(SQL_INCREMENTAR, {'nombres': sorted(tablas)})
+
+
+# --- Eventos de la sesión ---
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _anotar_flush(session, flush_context):
+    tablas = {
+        obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)
+        if obj.__table__.name != VersionDatos.__tablename__
+    }
+    if tablas:
+        marcar(session, *tablas)
+
+
+@event.listens_for(SesionEnrutada, 'do_orm_execute')
+def _anotar_sentencia(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = getattr(estado.statement, 'table', None)
+        if tabla is not None and getattr(tabla, 'name', None):
+            marcar(estado.session, tabla.name)
+
+
+@event.listens_for(SesionEnrutada, 'after_commit')
+def _incrementar_versiones(session):
+    tablas = session.info.pop(CLAVE, None)
+    if not tablas:
+        return
+    try:
+        incrementar(tablas)
+    except Exception as e:
+        # Los datos ya se guardaron; a lo sumo algún cliente ve una respuesta cacheada vieja
+        current_app.logger.error('No se pudieron incrementar las versiones de %s: %s', sorted(tablas), e)
+
+
+@event.listens_for(SesionEnrutada, 'after_rollback')
+def _descartar_versiones(session):
+    session.info.pop(CLAVE, None)
@@ -0,0 +1,271 @@
+"""
+Escenarios de carga contra una instancia corriendo de la app.
+
+Cada escenario corre durante --duracion segundos con --usuarios hilos, cada uno
+con su propia sesión (login como los usuarios de generar_datos.py; --usuarios no
+puede superar la cantidad de empleados generados). Al final se
+escribe un JSON con latencias p50/p95/p99 y throughput por escenario y por
+operación, para comparar corridas entre sí.
+
+    python bench/escenarios.py --url http://localhost:5000
+    python bench/escenarios.py --escenarios checkout,reportes --duracion 60 --usuarios 20
+    python bench/escenarios.py --comparar bench/resultados/anterior.json
+
+Escenarios:
+    checkout    ventas concurrentes sobre los productos calientes (mismas filas de stock)
+    dashboard   tormenta de refrescos de la pantalla de inicio
+    reportes    llamadas a las APIs de reportes
+    cierre      abrir jornada, vender, cerrar caja
+    historial   páginas largas: ventas, historial de jornadas y movimientos de stock
+"""
+import argparse
+import datetime
+import http.cookiejar
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+PASSWORD = 'bench'
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+# --- Cliente HTTP con sesión ---
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Sesion:
+    """Un usuario virtual: cookies propias, sin seguir redirecciones (se mide cada request)."""
+    def __init__(self, url_base, timeout):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedirecciones()
+        )
+
+    def pedir(self, metodo, ruta, form=None, json_body=None):
+        """Devuelve (código HTTP, segundos)."""
+        datos, headers = None, {}
+        if form is not None:
+            datos = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            datos = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        pedido = urllib.request.Request(self.url_base + ruta, data=datos, headers=headers, method=metodo)
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(pedido, timeout=self.timeout) as respuesta:
+                respuesta.read()
+                codigo = respuesta.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            codigo = e.code
+        except (urllib.error.URLError, OSError):
+            codigo = 0
+        return codigo, time.perf_counter() - inicio
+
+    def login(self, username):
+        codigo, _ = self.pedir('POST', '/login', form={'username': username, 'password': PASSWORD})
+        if codigo != 302:
+            raise RuntimeError(f'No se pudo iniciar sesión como {username} (HTTP {codigo}).')
+
+
+# --- Escenarios: cada uno es (usuario, preparación, paso) ---
+def _vender(sesion, rng, calientes, cantidad_items=2):
+    ids = rng.sample(range(1, calientes + 1), cantidad_items)
+    return sesion.pedir('POST', '/ventas/nueva', json_body={
+        'producto_ids': ids, 'cantidades': [1] * cantidad_items, 'metodo_pago': 'Efectivo', 'cliente_id': None
+    })
+
+
+def preparar_con_jornada(sesion, rng, args):
+    sesion.pedir('GET', '/jornada/iniciar')
+
+
+def paso_checkout(sesion, rng, args):
+    yield 'nueva_venta', _vender(sesion, rng, args.calientes)
+
+
+def paso_dashboard(sesion, rng, args):
+    yield 'index', sesion.pedir('GET', '/')
+
+
+def paso_reportes(sesion, rng, args):
+    fecha = (datetime.date.today() - datetime.timedelta(days=rng.randrange(1, 365))).isoformat()
+    rutas = [
+        ('ventas_diarias_30d', '/api/reporte/ventas_diarias_30d'),
+        ('ventas_por_empleado_mes', '/api/reporte/ventas_por_empleado_mes'),
+        ('productos_top_5_mes', '/api/reporte/productos_top_5_mes'),
+        ('stock_al', f'/api/reporte/stock_al?fecha={fecha}'),
+    ]
+    nombre, ruta = rng.choice(rutas)
+    yield nombre, sesion.pedir('GET', ruta)
+
+
+def paso_cierre(sesion, rng, args):
+    yield 'iniciar_jornada', sesion.pedir('GET', '/jornada/iniciar')
+    for _ in range(3):
+        yield 'nueva_venta', _vender(sesion, rng, args.calientes)
+    yield 'form_cierre', sesion.pedir('GET', '/jornada/finalizar')
+    yield 'cerrar_caja', sesion.pedir('POST', '/jornada/finalizar', form={'notas_cierre': 'bench'})
+
+
+def paso_historial(sesion, rng, args):
+    opciones = [
+        ('ventas', '/ventas'),
+        ('historial_jornadas', f'/jornadas/historial?page={rng.randrange(1, 50)}'),
+        ('movimientos_stock', f'/reportes/inventario?page={rng.randrange(1, 500)}'),
+    ]
+    nombre, ruta = rng.choice(opciones)
+    yield nombre, sesion.pedir('GET', ruta)
+
+
+ESCENARIOS = {
+    'checkout': ('empleado', preparar_con_jornada, paso_checkout),
+    'dashboard': ('empleado', None, paso_dashboard),
+    'reportes': ('admin', None, paso_reportes),
+    'cierre': ('empleado', None, paso_cierre),
+    'historial': ('admin', None, paso_historial),
+}
+
+
+# --- Ejecución y resultados ---
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def resumir(muestras, duracion):
+    latencias = sorted(segundos for _, segundos in muestras)
+    errores = sum(1 for codigo, _ in muestras if codigo == 0 or codigo >= 500)
+    return {
+        'requests': len(muestras),
+        'errores': errores,
+        'throughput_rps': round(len(muestras) / duracion, 2),
+        'p50_ms': _ms(percentil(latencias, 50)),
+        'p95_ms': _ms(percentil(latencias, 95)),
+        'p99_ms': _ms(percentil(latencias, 99)),
+        'max_ms': _ms(latencias[-1] if latencias else None),
+    }
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 2)
+
+
+def correr_escenario(nombre, args):
+    rol, preparar, paso = ESCENARIOS[nombre]
+    muestras = {}  # operación -> [(código, segundos)]
+    lock = threading.Lock()
+    fin = time.monotonic() + args.duracion
+
+    def trabajador(indice):
+        rng = random.Random(args.semilla * 1000 + indice)
+        sesion = Sesion(args.url, args.timeout)
+        sesion.login('bench_admin' if rol == 'admin' else f'empleado_{indice + 1:03d}')
+        if preparar:
+            preparar(sesion, rng, args)
+        propias = []
+        while time.monotonic() < fin:
+            for operacion, resultado in paso(sesion, rng, args):
+                propias.append((operacion, resultado))
+        with lock:
+            for operacion, resultado in propias:
+                muestras.setdefault(operacion, []).append(resultado)
+
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(args.usuarios)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.monotonic() - inicio
+
+    todas = [m for lista in muestras.values() for m in lista]
+    resultado = resumir(todas, duracion)
+    resultado['duracion_s'] = round(duracion, 2)
+    resultado['operaciones'] = {op: resumir(lista, duracion) for op, lista in sorted(muestras.items())}
+    return resultado
+
+
+def _commit_actual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(resultados, anteriores=None):
+    print(f'\n{"Escenario":28} {"req":>7} {"err":>5} {"rps":>8} {"p50":>8} {"p95":>8} {"p99":>8}')
+    for nombre, r in resultados['escenarios'].items():
+        filas = [(nombre, r)] + [(f'  {op}', ro) for op, ro in r['operaciones'].items()]
+        for etiqueta, datos in filas:
+            linea = (f'{etiqueta:28} {datos["requests"]:>7} {datos["errores"]:>5} {datos["throughput_rps"]:>8} '
+                     f'{datos["p50_ms"]!s:>8} {datos["p95_ms"]!s:>8} {datos["p99_ms"]!s:>8}')
+            previo = (anteriores or {}).get('escenarios', {}).get(nombre)
+            if previo and etiqueta == nombre and previo.get('p95_ms') and datos['p95_ms']:
+                linea += f'   p95 {100 * (datos["p95_ms"] / previo["p95_ms"] - 1):+.1f}%'
+            print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos por escenario.')
+    parser.add_argument('--usuarios', type=int, default=10, help='Usuarios concurrentes por escenario.')
+    parser.add_argument('--calientes', type=int, default=20, help='Igual que en generar_datos.py.')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto en bench/resultados/).')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para mostrar la variación.')
+    args = parser.parse_args()
+
+    nombres = [n.strip() for n in args.escenarios.split(',') if n.strip()]
+    desconocidos = [n for n in nombres if n not in ESCENARIOS]
+    if desconocidos:
+        parser.error(f'Escenarios desconocidos: {", ".join(desconocidos)}')
+
+    resultados = {
+        'fecha': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'url': args.url,
+        'parametros': {k: getattr(args, k) for k in ('duracion', 'usuarios', 'calientes', 'semilla')},
+        'escenarios': {},
+    }
+    for nombre in nombres:
+        print(f'Corriendo {nombre} ({args.usuarios} usuarios, {args.duracion:.0f}s)...')
+        resultados['escenarios'][nombre] = correr_escenario(nombre, args)
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f'{datetime.datetime.now():%Y%m%d_%H%M%S}_{resultados["commit"] or "sin_git"}.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anteriores = json.load(archivo)
+    imprimir(resultados, anteriores)
+    print(f'\nResultados en {salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Esquema inicial (el que creaba db.create_all())
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'configuracion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clave', sa.String(length=50), nullable=False),
+        sa.Column('valor', sa.String(length=200), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('clave')
+    )
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'cliente',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=150), nullable=False),
+        sa.Column('documento_fiscal', sa.String(length=20), nullable=True),
+        sa.Column('telefono', sa.String(length=50), nullable=True),
+        sa.Column('email', sa.String(length=120), nullable=True),
+        sa.Column('condicion_iva', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('documento_fiscal')
+    )
+    op.create_table(
+        'producto',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=100), nullable=False),
+        sa.Column('descripcion', sa.Text(), nullable=True),
+        sa.Column('precio', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('precio_costo', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.Column('stock_minimo', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nombre')
+    )
+    op.create_table(
+        'jornada',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hora_inicio', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('hora_fin', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('activa', sa.Boolean(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notas_cierre', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'movimiento_stock',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['producto_id'], ['producto.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'cierre_metodo_pago',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jornada_id', sa.Integer(), nullable=False),
+        sa.Column('metodo_pago', sa.String(length=50), nullable=False),
+        sa.Column('monto_esperado', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('monto_real_contado', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('diferencia', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['jornada_id'], ['jornada.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'venta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('ganancia_bruta_total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total_neto_gravado', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total_monto_iva', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('metodo_pago', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('jornada_id', sa.Integer(), nullable=True),
+        sa.Column('cliente_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['cliente_id'], ['cliente.id']),
+        sa.ForeignKeyConstraint(['jornada_id'], ['jornada.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'detalle_venta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('precio_unitario', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('precio_costo_unitario', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('neto_gravado', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('monto_iva', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('venta_id', sa.Integer(), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['producto_id'], ['producto.id']),
+        sa.ForeignKeyConstraint(['venta_id'], ['venta.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('detalle_venta')
+    op.drop_table('venta')
+    op.drop_table('cierre_metodo_pago')
+    op.drop_table('movimiento_stock')
+    op.drop_table('jornada')
+    op.drop_table('producto')
+    op.drop_table('cliente')
+    op.drop_table('user')
+    op.drop_table('configuracion')
@@ -0,0 +1,109 @@
+"""Cortes de stock, actualizaciones e historial de precios, índices por fecha
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'corte_stock',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('ultimo_movimiento_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'snapshot_stock',
+        sa.Column('corte_id', sa.Integer(), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['corte_id'], ['corte_stock.id']),
+        sa.ForeignKeyConstraint(['producto_id'], ['producto.id']),
+        sa.PrimaryKeyConstraint('corte_id', 'producto_id')
+    )
+    op.create_table(
+        'actualizacion_precios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('creada', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('vigencia', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('aplicada', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('campo', sa.String(length=20), nullable=False),
+        sa.Column('modo', sa.String(length=20), nullable=False),
+        sa.Column('valor', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('filtro_nombre', sa.String(length=100), nullable=True),
+        sa.Column('margen_min', sa.Numeric(precision=6, scale=2), nullable=True),
+        sa.Column('margen_max', sa.Numeric(precision=6, scale=2), nullable=True),
+        sa.Column('estado_stock', sa.String(length=20), nullable=True),
+        sa.Column('productos_afectados', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'historial_precio',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.Column('precio_anterior', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('precio_nuevo', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('precio_costo_anterior', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('precio_costo_nuevo', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('origen', sa.String(length=50), nullable=False),
+        sa.Column('actualizacion_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['actualizacion_id'], ['actualizacion_precios.id']),
+        sa.ForeignKeyConstraint(['producto_id'], ['producto.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_movimiento_stock_fecha', 'movimiento_stock', ['fecha'])
+    op.create_index('ix_movimiento_stock_producto_fecha', 'movimiento_stock', ['producto_id', 'fecha'])
+    op.create_index('ix_corte_stock_fecha', 'corte_stock', ['fecha'])
+    op.create_index('ix_historial_precio_producto_fecha', 'historial_precio', ['producto_id', 'fecha'])
+    op.create_index('ix_historial_precio_fecha', 'historial_precio', ['fecha'])
+
+    # El historial de precios es de solo inserción
+    op.execute("""
+        CREATE OR REPLACE FUNCTION historial_precio_solo_insercion() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'historial_precio es de solo inserción';
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER historial_precio_inmutable
+            BEFORE UPDATE OR DELETE ON historial_precio
+            FOR EACH ROW EXECUTE FUNCTION historial_precio_solo_insercion()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS historial_precio_inmutable ON historial_precio')
+    op.execute('DROP FUNCTION IF EXISTS historial_precio_solo_insercion()')
+
+    op.drop_index('ix_historial_precio_fecha', table_name='historial_precio')
+    op.drop_index('ix_historial_precio_producto_fecha', table_name='historial_precio')
+    op.drop_index('ix_corte_stock_fecha', table_name='corte_stock')
+    op.drop_index('ix_movimiento_stock_producto_fecha', table_name='movimiento_stock')
+    op.drop_index('ix_movimiento_stock_fecha', table_name='movimiento_stock')
+
+    op.drop_table('historial_precio')
+    op.drop_table('actualizacion_precios')
+    op.drop_table('snapshot_stock')
+    op.drop_table('corte_stock')
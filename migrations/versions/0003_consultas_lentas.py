@@ -0,0 +1,37 @@
+"""Registro de consultas lentas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'consulta_lenta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('huella', sa.String(length=32), nullable=False),
+        sa.Column('sql', sa.Text(), nullable=False),
+        sa.Column('parametros', sa.Text(), nullable=True),
+        sa.Column('duracion_ms', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('endpoint', sa.String(length=100), nullable=True),
+        sa.Column('plan', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_consulta_lenta_huella_fecha', 'consulta_lenta', ['huella', 'fecha'])
+
+
+def downgrade():
+    op.drop_index('ix_consulta_lenta_huella_fecha', table_name='consulta_lenta')
+    op.drop_table('consulta_lenta')
@@ -0,0 +1,52 @@
+"""Cola de trabajos en segundo plano
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'trabajo',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('parametros', sa.JSON(), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('prioridad', sa.Integer(), nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('max_intentos', sa.Integer(), nullable=False),
+        sa.Column('disponible_desde', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('progreso', sa.Integer(), nullable=False),
+        sa.Column('mensaje', sa.String(length=200), nullable=True),
+        sa.Column('resultado', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('creado', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('iniciado', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('terminado', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('latido', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_trabajo_pendientes', 'trabajo',
+        [sa.text('prioridad DESC'), 'disponible_desde', 'id'],
+        postgresql_where=sa.text("estado = 'pendiente'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_trabajo_pendientes', table_name='trabajo')
+    op.drop_table('trabajo')
@@ -0,0 +1,62 @@
+"""Facturación electrónica: comprobantes fiscales y numeradores
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'numerador_fiscal',
+        sa.Column('punto_venta', sa.Integer(), nullable=False),
+        sa.Column('tipo_comprobante', sa.Integer(), nullable=False),
+        sa.Column('ultimo_numero', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('punto_venta', 'tipo_comprobante')
+    )
+    op.create_table(
+        'comprobante_fiscal',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('venta_id', sa.Integer(), nullable=False),
+        sa.Column('punto_venta', sa.Integer(), nullable=False),
+        sa.Column('tipo_comprobante', sa.Integer(), nullable=False),
+        sa.Column('numero', sa.Integer(), nullable=True),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('doc_tipo', sa.Integer(), nullable=False),
+        sa.Column('doc_nro', sa.BigInteger(), nullable=False),
+        sa.Column('importe_total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('importe_neto', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('importe_iva', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('cae', sa.String(length=14), nullable=True),
+        sa.Column('cae_vencimiento', sa.Date(), nullable=True),
+        sa.Column('observaciones', sa.Text(), nullable=True),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('creado', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('aprobado', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['venta_id'], ['venta.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('venta_id'),
+        sa.UniqueConstraint('punto_venta', 'tipo_comprobante', 'numero', name='uq_comprobante_fiscal_numero')
+    )
+    op.create_index(
+        'ix_comprobante_fiscal_por_enviar', 'comprobante_fiscal',
+        ['punto_venta', 'tipo_comprobante', 'id'],
+        postgresql_where=sa.text("estado IN ('pendiente', 'numerado')")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_comprobante_fiscal_por_enviar', table_name='comprobante_fiscal')
+    op.drop_table('comprobante_fiscal')
+    op.drop_table('numerador_fiscal')
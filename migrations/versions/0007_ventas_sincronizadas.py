@@ -0,0 +1,46 @@
+"""POS sin conexión: ventas sincronizadas
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'venta_sincronizada',
+        sa.Column('uuid', sa.String(length=36), nullable=False),
+        sa.Column('venta_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('creada', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('recibida', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('datos', sa.JSON(), nullable=False),
+        sa.Column('conflictos', sa.JSON(), nullable=True),
+        sa.Column('revisada_por_id', sa.Integer(), nullable=True),
+        sa.Column('revisada', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['venta_id'], ['venta.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['revisada_por_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('uuid'),
+        sa.UniqueConstraint('venta_id')
+    )
+    op.create_index(
+        'ix_venta_sincronizada_por_revisar', 'venta_sincronizada', ['recibida'],
+        postgresql_where=sa.text("estado IN ('conflicto', 'rechazada')")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_venta_sincronizada_por_revisar', table_name='venta_sincronizada')
+    op.drop_table('venta_sincronizada')
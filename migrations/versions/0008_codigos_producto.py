@@ -0,0 +1,69 @@
+"""Códigos de barras / SKU por producto y NOTIFY de cambios del catálogo
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = {
+    'producto': ('producto_catalogo_alta', 'producto_catalogo_cambio', 'producto_catalogo_baja'),
+    'codigo_producto': ('codigo_producto_catalogo_alta', 'codigo_producto_catalogo_cambio',
+                        'codigo_producto_catalogo_baja'),
+}
+
+
+def upgrade():
+    op.create_table(
+        'codigo_producto',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('codigo', sa.String(length=64), nullable=False),
+        sa.Column('producto_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['producto_id'], ['producto.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('codigo')
+    )
+    op.create_index('ix_codigo_producto_producto', 'codigo_producto', ['producto_id'])
+
+    # Avisan qué productos cambiaron, una vez por sentencia (el índice en memoria escucha 'catalogo')
+    for columna, tabla in (('id', 'producto'), ('producto_id', 'codigo_producto')):
+        funcion = 'catalogo_notificar_producto' if tabla == 'producto' else 'catalogo_notificar_codigo'
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {funcion}() RETURNS trigger AS $$
+            DECLARE ids text;
+            BEGIN
+                SELECT string_agg(DISTINCT {columna}::text, ',') INTO ids FROM filas;
+                IF ids IS NOT NULL THEN
+                    PERFORM pg_notify('catalogo', CASE WHEN length(ids) > 7000 THEN '*' ELSE ids END);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        alta, cambio, baja = TRIGGERS[tabla]
+        for nombre, evento, transicion in ((alta, 'INSERT', 'NEW'), (cambio, 'UPDATE', 'NEW'), (baja, 'DELETE', 'OLD')):
+            op.execute(f"""
+                CREATE TRIGGER {nombre} AFTER {evento} ON {tabla}
+                    REFERENCING {transicion} TABLE AS filas
+                    FOR EACH STATEMENT EXECUTE FUNCTION {funcion}()
+            """)
+
+
+def downgrade():
+    for tabla, nombres in TRIGGERS.items():
+        for nombre in nombres:
+            op.execute(f'DROP TRIGGER IF EXISTS {nombre} ON {tabla}')
+    op.execute('DROP FUNCTION IF EXISTS catalogo_notificar_producto()')
+    op.execute('DROP FUNCTION IF EXISTS catalogo_notificar_codigo()')
+
+    op.drop_index('ix_codigo_producto_producto', table_name='codigo_producto')
+    op.drop_table('codigo_producto')
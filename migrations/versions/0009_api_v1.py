@@ -0,0 +1,113 @@
+"""API v1: tokens, columna actualizado y registro de bajas
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 21:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+TABLAS_ACTUALIZADO = ('producto', 'cliente', 'venta', 'jornada')
+TABLAS_BAJA = ('producto', 'cliente')
+
+
+def upgrade():
+    op.create_table(
+        'token_api',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=100), nullable=False),
+        sa.Column('prefijo', sa.String(length=12), nullable=False),
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('creado', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('creado_por_id', sa.Integer(), nullable=True),
+        sa.Column('ultimo_uso', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('revocado', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['creado_por_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hash')
+    )
+    op.create_table(
+        'registro_baja',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tabla', sa.String(length=30), nullable=False),
+        sa.Column('registro_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_registro_baja_fecha', 'registro_baja', ['fecha', 'id'])
+
+    # Las filas existentes quedan con la hora de la migración: la primera sincronización las trae todas
+    for tabla in TABLAS_ACTUALIZADO:
+        op.add_column(tabla, sa.Column(
+            'actualizado', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False
+        ))
+        op.create_index(f'ix_{tabla}_actualizado', tabla, ['actualizado', 'id'])
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION api_tocar_actualizado() RETURNS trigger AS $$
+        BEGIN
+            NEW.actualizado := now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION api_tocar_producto_de_codigo() RETURNS trigger AS $$
+        BEGIN
+            UPDATE producto SET actualizado = now() WHERE id IN (SELECT producto_id FROM filas);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION api_registrar_baja() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO registro_baja (tabla, registro_id) SELECT TG_TABLE_NAME, id FROM filas;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for tabla in TABLAS_ACTUALIZADO:
+        op.execute(f"""
+            CREATE TRIGGER {tabla}_api_actualizado BEFORE UPDATE ON {tabla}
+                FOR EACH ROW EXECUTE FUNCTION api_tocar_actualizado()
+        """)
+    for nombre, evento, transicion in (('alta', 'INSERT', 'NEW'), ('cambio', 'UPDATE', 'NEW'), ('baja', 'DELETE', 'OLD')):
+        op.execute(f"""
+            CREATE TRIGGER codigo_producto_api_{nombre} AFTER {evento} ON codigo_producto
+                REFERENCING {transicion} TABLE AS filas
+                FOR EACH STATEMENT EXECUTE FUNCTION api_tocar_producto_de_codigo()
+        """)
+    for tabla in TABLAS_BAJA:
+        op.execute(f"""
+            CREATE TRIGGER {tabla}_api_baja AFTER DELETE ON {tabla}
+                REFERENCING OLD TABLE AS filas
+                FOR EACH STATEMENT EXECUTE FUNCTION api_registrar_baja()
+        """)
+
+
+def downgrade():
+    for tabla in TABLAS_BAJA:
+        op.execute(f'DROP TRIGGER IF EXISTS {tabla}_api_baja ON {tabla}')
+    for nombre in ('alta', 'cambio', 'baja'):
+        op.execute(f'DROP TRIGGER IF EXISTS codigo_producto_api_{nombre} ON codigo_producto')
+    for tabla in TABLAS_ACTUALIZADO:
+        op.execute(f'DROP TRIGGER IF EXISTS {tabla}_api_actualizado ON {tabla}')
+    op.execute('DROP FUNCTION IF EXISTS api_registrar_baja()')
+    op.execute('DROP FUNCTION IF EXISTS api_tocar_producto_de_codigo()')
+    op.execute('DROP FUNCTION IF EXISTS api_tocar_actualizado()')
+
+    for tabla in TABLAS_ACTUALIZADO:
+        op.drop_index(f'ix_{tabla}_actualizado', table_name=tabla)
+        op.drop_column(tabla, 'actualizado')
+    op.drop_index('ix_registro_baja_fecha', table_name='registro_baja')
+    op.drop_table('registro_baja')
+    op.drop_table('token_api')
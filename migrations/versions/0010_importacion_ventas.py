@@ -0,0 +1,26 @@
+"""Referencia externa de las ventas importadas del sistema anterior
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 23:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venta', sa.Column('referencia_externa', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('venta_referencia_externa_key', 'venta', ['referencia_externa'])
+
+
+def downgrade():
+    op.drop_constraint('venta_referencia_externa_key', 'venta', type_='unique')
+    op.drop_column('venta', 'referencia_externa')
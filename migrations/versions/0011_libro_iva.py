@@ -0,0 +1,60 @@
+"""Libro IVA Ventas: períodos cerrados y sus renglones
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-20 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'periodo_iva',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('periodo', sa.Date(), nullable=False),
+        sa.Column('cerrado', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('neto', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('iva', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('total', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('periodo')
+    )
+    op.create_table(
+        'renglon_libro_iva',
+        sa.Column('periodo_id', sa.Integer(), nullable=False),
+        sa.Column('venta_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('condicion_iva', sa.String(length=50), nullable=False),
+        sa.Column('tipo_comprobante', sa.Integer(), nullable=False),
+        sa.Column('punto_venta', sa.Integer(), nullable=True),
+        sa.Column('numero', sa.Integer(), nullable=True),
+        sa.Column('cae', sa.String(length=14), nullable=True),
+        sa.Column('doc_tipo', sa.Integer(), nullable=False),
+        sa.Column('doc_nro', sa.BigInteger(), nullable=False),
+        sa.Column('cliente', sa.String(length=150), nullable=False),
+        sa.Column('neto', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('iva', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['periodo_id'], ['periodo_iva.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venta_id'], ['venta.id']),
+        sa.PrimaryKeyConstraint('periodo_id', 'venta_id')
+    )
+    op.create_index('ix_venta_fecha', 'venta', ['fecha'])
+
+
+def downgrade():
+    op.drop_index('ix_venta_fecha', table_name='venta')
+    op.drop_table('renglon_libro_iva')
+    op.drop_table('periodo_iva')
@@ -0,0 +1,33 @@
+"""Alícuota de IVA por producto y por línea de venta, importe exento del comprobante
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-20 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hasta ahora todo se liquidaba al 21 %: las filas existentes quedan con esa alícuota
+    op.add_column('producto', sa.Column('alicuota_iva', sa.String(length=10), server_default='21', nullable=False))
+    op.add_column('detalle_venta', sa.Column('alicuota_iva', sa.String(length=10), server_default='21', nullable=False))
+    op.add_column('comprobante_fiscal', sa.Column(
+        'importe_exento', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False
+    ))
+    op.create_index('ix_detalle_venta_venta', 'detalle_venta', ['venta_id'])
+
+
+def downgrade():
+    op.drop_index('ix_detalle_venta_venta', table_name='detalle_venta')
+    op.drop_column('comprobante_fiscal', 'importe_exento')
+    op.drop_column('detalle_venta', 'alicuota_iva')
+    op.drop_column('producto', 'alicuota_iva')
@@ -0,0 +1,36 @@
+"""Un solo envío fiscal sin empezar en la cola de trabajos
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-21 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hasta ahora cada venta encolaba su envío: se deja el más antiguo de los que no empezaron
+    op.execute("""
+        UPDATE trabajo SET estado = 'cancelado', terminado = now()
+        WHERE tipo = 'fiscal_enviar' AND estado = 'pendiente' AND intentos = 0
+          AND id <> (
+              SELECT min(id) FROM trabajo
+              WHERE tipo = 'fiscal_enviar' AND estado = 'pendiente' AND intentos = 0
+          )
+    """)
+    op.create_index(
+        'ux_trabajo_fiscal_enviar', 'trabajo', ['tipo'], unique=True,
+        postgresql_where=sa.text("tipo = 'fiscal_enviar' AND estado = 'pendiente' AND intentos = 0")
+    )
+
+
+def downgrade():
+    op.drop_index('ux_trabajo_fiscal_enviar', table_name='trabajo')
@@ -0,0 +1,53 @@
+"""API v1: actualizado con la hora de la escritura, no la del inicio de la transacción
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-21 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+TABLAS_ACTUALIZADO = ('producto', 'cliente', 'venta', 'jornada')
+
+
+def _funciones(hora):
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION api_tocar_actualizado() RETURNS trigger AS $$
+        BEGIN
+            NEW.actualizado := {hora};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION api_tocar_producto_de_codigo() RETURNS trigger AS $$
+        BEGIN
+            UPDATE producto SET actualizado = {hora} WHERE id IN (SELECT producto_id FROM filas);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def upgrade():
+    # now() es el inicio de la transacción: una transacción larga dejaba filas con una hora
+    # anterior a updated_until que recién se veían después (ver api.listar)
+    for tabla in TABLAS_ACTUALIZADO:
+        op.alter_column(tabla, 'actualizado', server_default=sa.text('clock_timestamp()'))
+    op.alter_column('registro_baja', 'fecha', server_default=sa.text('clock_timestamp()'))
+    _funciones('clock_timestamp()')
+
+
+def downgrade():
+    _funciones('now()')
+    op.alter_column('registro_baja', 'fecha', server_default=sa.text('now()'))
+    for tabla in TABLAS_ACTUALIZADO:
+        op.alter_column(tabla, 'actualizado', server_default=sa.text('now()'))
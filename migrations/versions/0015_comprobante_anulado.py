@@ -0,0 +1,28 @@
+"""Comprobantes fiscales de ventas anuladas fuera de la cola de envío
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-23 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los 'numerado' quedan para el worker: AFIP puede haberlos autorizado
+    op.execute("""
+        UPDATE comprobante_fiscal cf SET estado = 'anulado', numero = NULL
+        FROM venta v
+        WHERE v.id = cf.venta_id AND v.estado = 'anulada' AND cf.estado IN ('pendiente', 'rechazado')
+    """)
+
+
+def downgrade():
+    op.execute("UPDATE comprobante_fiscal SET estado = 'rechazado' WHERE estado = 'anulado'")
@@ -0,0 +1,32 @@
+"""API v1: movimientos de stock paginados por la hora de la escritura
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-23 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # fecha es now() (inicio de la transacción) y la sigue usando el inventario; la API
+    # necesita la hora del INSERT, como el resto de los recursos (ver 0014)
+    op.add_column('movimiento_stock', sa.Column('actualizado', sa.DateTime(timezone=True), nullable=True))
+    op.execute('UPDATE movimiento_stock SET actualizado = fecha')
+    op.alter_column(
+        'movimiento_stock', 'actualizado', nullable=False, server_default=sa.text('clock_timestamp()')
+    )
+    op.create_index('ix_movimiento_stock_actualizado', 'movimiento_stock', ['actualizado', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_movimiento_stock_actualizado', table_name='movimiento_stock')
+    op.drop_column('movimiento_stock', 'actualizado')
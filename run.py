@@ -1,11 +1,8 @@
 from app import create_app
 
-# Creamos la instancia de la app llamando a la "factory"
-app = create_app()
+# Creamos la instancia de la app llamando a la "factory".
+# `python run.py` es el servidor de desarrollo: arranca en DEBUG.
+app = create_app({'DEBUG': True} if __name__ == '__main__' else None)
 
 if __name__ == '__main__':
-<<<<<<< HEAD
     app.run(debug=True, port=5000)
-=======
-    app.run(debug=True, port=5000)      
->>>>>>> 3469ee7 (Actualizo código con nuevas funciones)
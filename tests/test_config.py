@@ -0,0 +1,17 @@
+"""Validación de la configuración al arrancar (config.validar). No usa base de datos."""
+import pytest
+
+from app import create_app
+from app.config import BASE_DESARROLLO
+
+
+def test_produccion_sin_secretos_no_arranca():
+    with pytest.raises(RuntimeError, match='DATABASE_URL, SECRET_KEY'):
+        create_app({'DEBUG': False, 'TESTING': False, 'SQLALCHEMY_DATABASE_URI': '', 'SECRET_KEY': ''})
+
+
+def test_desarrollo_completa_valores_locales():
+    app = create_app({'DEBUG': True, 'SQLALCHEMY_DATABASE_URI': '', 'SECRET_KEY': ''})
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == BASE_DESARROLLO
+    assert len(app.config['SECRET_KEY']) == 64
+    assert create_app({'DEBUG': True, 'SECRET_KEY': ''}).config['SECRET_KEY'] != app.config['SECRET_KEY']
@@ -0,0 +1,58 @@
+"""
+Worker de la cola de trabajos (ver app/trabajos.py).
+
+    python worker.py                         # un proceso
+    python worker.py --procesos 4            # cuatro procesos independientes
+    python worker.py --tipos importar_productos,aplicar_precios
+
+Con SIGTERM o Ctrl+C cada proceso termina el trabajo en curso y sale.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+
+
+def correr(tipos):
+    # Cada proceso arma su propia app (y su propio pool de conexiones)
+    from app import create_app
+    from app.trabajos import Worker
+
+    app = create_app()
+    worker = Worker(app, f'{socket.gethostname()}:{os.getpid()}', tipos)
+    signal.signal(signal.SIGTERM, lambda *_: worker.detener.set())
+    signal.signal(signal.SIGINT, lambda *_: worker.detener.set())
+    worker.correr()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procesos', type=int, default=1)
+    parser.add_argument('--tipos', help='Solo estos tipos de trabajo (separados por coma).')
+    args = parser.parse_args()
+    tipos = [t.strip() for t in args.tipos.split(',') if t.strip()] if args.tipos else None
+
+    if args.procesos <= 1:
+        correr(tipos)
+        return
+
+    contexto = multiprocessing.get_context('spawn')
+    procesos = [
+        contexto.Process(target=correr, args=(tipos,), name=f'worker-{i}') for i in range(args.procesos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+
+    def terminar(*_):
+        for proceso in procesos:
+            proceso.terminate()  # SIGTERM: cada uno termina su trabajo actual
+
+    signal.signal(signal.SIGTERM, terminar)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C ya les llega a los hijos
+    for proceso in procesos:
+        proceso.join()
+
+
+if __name__ == '__main__':
+    main()